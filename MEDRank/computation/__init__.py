@@ -9,6 +9,7 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 
 __all__=['graph', 'graph_builder', 'node', 'link', 'link_matrix', 
          'mapped_link_matrix', 'mapped_ranker', 
+         'sparse_link_matrix', 'sparse_mapped_link_matrix',
          'metamap_cooccurrence_graph_builder', 
          'pageranker',
          'semrep_cooccurrence_graph_builder',
@@ -20,4 +21,6 @@ __all__=['graph', 'graph_builder', 'node', 'link', 'link_matrix',
          'base_matrix',
          'base_hits_ranker',
          'bidirectional_search',
+         'breadth_first_distances',
+         'ranker_ensemble',
          '_distmat']
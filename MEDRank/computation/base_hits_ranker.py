@@ -8,9 +8,9 @@ Copyright (c) 2008 University of Texas - Houston. All rights reserved.
 """
 
 from MEDRank.utility.logger import logging, ULTRADEBUG
-import operator
 import time
-from MEDRank.computation.ranker import (Ranker, RankerStats)
+from itertools import (chain, izip)
+from MEDRank.computation.ranker import (Ranker, RankerStats, JACOBI)
 
 # Disable warnings about spaces before operators (they drive me crazy)
 # pylint: disable-msg=C0322
@@ -21,7 +21,15 @@ from MEDRank.computation.ranker import (Ranker, RankerStats)
 
 class HITSRanker(Ranker):
     """Computes HITS as described in Kleinberg's seminal paper. 
-    See Kleinberg, JM. Authoritative Sources in a Hyperlinked Environment"""
+    See Kleinberg, JM. Authoritative Sources in a Hyperlinked Environment
+    
+    The weights are renormalized after every iteration, so only the JACOBI
+    convergence mode is supported, and there's no error bound with which to
+    stop early for the top ranks. It always starts from scratch, so it can't
+    be warm-started either."""
+    convergence_modes=(JACOBI,)
+    top_ranks_supported=False
+    warm_start_supported=False
     @staticmethod
     def normalize_weights(weights):
         """Normalizes a numerical list, returning a copy of it."""
@@ -32,44 +40,39 @@ class HITSRanker(Ranker):
     def i_operation(self, link_matrix, y_weights):
         """Computes Kleinberg's I operation on a vector of y-weights.
         It produces an x-vector that depends on the incoming links."""
-        # Iterate over every incoming link for every node
+        # Visit every link once; each one carries the weight of its origin
+        # to its destination
         x_weights=[0.0] * len(link_matrix)
-        for each_x in xrange(len(link_matrix)):
-            this_x_weight=0.0
-            for each_y in xrange(len(link_matrix)):
-                if link_matrix[each_y, each_x]!=0:
-                    this_x_weight+=y_weights[each_y]
-            x_weights[each_x]=this_x_weight
+        for each_y, each_x in link_matrix.links():
+            x_weights[each_x]+=y_weights[each_y]
         return x_weights
     def o_operation(self, link_matrix, x_weights):
         """Computes Kleinberg's O operation on a vector of x-weights.
         It produces a y-vector that depends on the outgoing links."""
         y_weights=[0.0] * len(link_matrix)
-        for each_y in xrange(len(link_matrix)):
-            this_y_weight=0.0
-            for each_x in xrange(len(link_matrix)):
-                if link_matrix[each_y, each_x]!=0:
-                    this_y_weight+=x_weights[each_x]
-            y_weights[each_y]=this_y_weight
+        for each_y, each_x in link_matrix.links():
+            y_weights[each_y]+=x_weights[each_x]
         return y_weights
     def evaluate(self, link_matrix):
-        """Perform an iterative computation of HITS"""
+        """Perform an iterative computation of HITS. Returns a tuple with the
+        authority and hub scores."""
         logging.debug("Setting up to compute HITS on %r", link_matrix)
         # Sanity check
         if len(link_matrix)==0:
             raise ValueError("Attempting to HITS-rank an empty link matrix.")
         start=time.clock()
-        logging.log(ULTRADEBUG, "Normalizing the link matrix.")
-        # Perform actual computations on a normalized matrix
-        try:
-            normatrix=link_matrix.normalize()
-        except ZeroDivisionError:
+        # HITS only cares about which links exist, not their weight, so 
+        # there's no need to build a normalized matrix. The matrix would fail
+        # to normalize if its maximum was zero, though, and so do we.
+        if link_matrix.max()==0:
             raise ZeroDivisionError("Aberrant matrix: There are no links.")
-        logging.log(ULTRADEBUG, "Iterating for HITS.")
+        logging.log(ULTRADEBUG, "Iterating for HITS over %d links.",
+                    len(link_matrix.links()))
         # Set up the iteration variables
         accumulator=2*self._e
         iterations=0
-        x_w=[1.0]*len(normatrix)
+        residuals=[]
+        x_w=[1.0]*len(link_matrix)
         y_w=x_w[:]
         start_iter=time.clock() # Benchmarking
         while (accumulator>self._e):
@@ -78,18 +81,21 @@ class HITSRanker(Ranker):
                 "HITS computation prematurely.", self._max_iter)
                 break
             accumulator=0.0
-            new_x_w=self.i_operation(normatrix, y_w)
-            new_y_w=self.o_operation(normatrix, new_x_w)
+            new_x_w=self.i_operation(link_matrix, y_w)
+            new_y_w=self.o_operation(link_matrix, new_x_w)
             iterations+=1
             new_x_w=self.normalize_weights(new_x_w)
             new_y_w=self.normalize_weights(new_y_w)
-            delta=zip(x_w, new_x_w) + zip(y_w, new_y_w)
-            accumulator=reduce(operator.add, (abs(x[0]-x[1]) for x in delta))
+            accumulator=sum(abs(old-new) for (old, new) in 
+                            chain(izip(x_w, new_x_w), izip(y_w, new_y_w)))
+            residuals.append(accumulator)
             x_w=new_x_w
             y_w=new_y_w
         logging.log(ULTRADEBUG, "Iteration done.")
         finished_iter=time.clock()
-        self._latest_stats=RankerStats(iterations, accumulator, start,
-                                        start_iter, finished_iter)
+        self._latest_stats=self.make_stats(iterations, accumulator, start,
+                                           start_iter, finished_iter,
+                                           residuals=residuals,
+                                           matrix=link_matrix)
         return (x_w, y_w)
         
@@ -9,30 +9,63 @@ Created by Jorge Herskovic on 2008-06-19.
 Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
-import operator
+from array import array
+import ctypes
 from MEDRank.utility.logger import logging
+try:
+    import numpy
+    numpy_available=True
+except ImportError:
+    numpy_available=False
 # Disable warnings about spaces before operators (they drive me crazy)
 # pylint: disable-msg=C0322
 
-# Ignore message about unused loop variable in the constructor of Matrix 
-# pylint: disable-msg=W0612
+# The typecodes of the arrays a Matrix can store its cells in
+DOUBLE_PRECISION='d'
+SINGLE_PRECISION='f'
+# The ctypes and NumPy types of each typecode's cells
+CTYPES_TYPES={DOUBLE_PRECISION: ctypes.c_double, 
+              SINGLE_PRECISION: ctypes.c_float}
+NUMPY_TYPES={DOUBLE_PRECISION: 'float64', SINGLE_PRECISION: 'float32'}
 
 class Matrix(object):
-    """Represents a generic matrix."""
-    def __init__(self, matrix_size):
+    """Represents a generic square matrix of numbers.
+    
+    The cells are stored row after row in a single typed array; of C 
+    doubles by default, or of C floats if the matrix is created with 
+    typecode=SINGLE_PRECISION, which takes half the memory but only keeps 
+    about 7 significant digits. Either way, cells always read back as 
+    Python floats, and get_row returns a copy of the row.
+    
+    C routines and vectorized code can read and write the cells in place,
+    without copying them, through buffer_info(), as_ctypes() or as_numpy().
+    The storage is never reallocated, so those views remain valid as long
+    as the matrix exists. Changes made through them bypass __setitem__, so
+    a LinkMatrix's cached indexes must be discarded afterwards by calling
+    its cells_changed() method."""
+    def __init__(self, matrix_size, typecode=DOUBLE_PRECISION):
+        if typecode not in (DOUBLE_PRECISION, SINGLE_PRECISION):
+            raise ValueError("A Matrix can't store its cells as %r." % 
+                             typecode)
         self.__n=matrix_size
-        one_row=[0] * self.__n
-        # Append a new copy of each row for self.__n times
-        self.__m=[one_row[:] for i in xrange(self.__n)]
+        self.__typecode=typecode
+        self.__m=array(typecode, [0.0])*(matrix_size**2)
         return
     def __len__(self):
         return self.__n
     def __getitem__(self, key):
         i, j=key
-        return self.__m[i][j]
+        # Without this check, (0, n) would silently read (1, 0)
+        if not (0<=i<self.__n and 0<=j<self.__n):
+            raise IndexError("(%r, %r) is outside of a %dx%d matrix" %
+                             (i, j, self.__n, self.__n))
+        return self.__m[i*self.__n+j]
     def __setitem__(self, key, value):
         i, j=key
-        self.__m[i][j]=value
+        if not (0<=i<self.__n and 0<=j<self.__n):
+            raise IndexError("(%r, %r) is outside of a %dx%d matrix" %
+                             (i, j, self.__n, self.__n))
+        self.__m[i*self.__n+j]=value
     def __repr__(self):
         return "<%dx%d %s>" % (self.__n, self.__n, self.__class__.__name__)
     def __eq__(self, other):
@@ -46,28 +79,48 @@ class Matrix(object):
                                   i, j, self[i,j], other[i,j])
                     return False
         return True
+    def typecode_fget(self):
+        "Getter for the typecode property"
+        return self.__typecode
+    typecode=property(typecode_fget)
+    def _row_slice(self, i):
+        """The slice of the storage array that holds row i."""
+        if not (0<=i<self.__n):
+            raise IndexError("Row %r is outside of a %dx%d matrix" % 
+                             (i, self.__n, self.__n))
+        return slice(i*self.__n, (i+1)*self.__n)
+    def _column_slice(self, j):
+        """The (extended) slice of the storage array that holds column 
+        j."""
+        if not (0<=j<self.__n):
+            raise IndexError("Column %r is outside of a %dx%d matrix" % 
+                             (j, self.__n, self.__n))
+        return slice(j, None, self.__n)
     def rowsum(self, i):
         """Returns the sum of a matrix row"""
-        return reduce(operator.add, self.__m[i])
+        return sum(self.__m[self._row_slice(i)])
     def colsum(self, j):
         """Returns the sum of a matrix column"""
-        return reduce(operator.add, (x[j] for x in self.__m))
+        return sum(self.__m[self._column_slice(j)])
     def row_nonzero(self, i):
         """Returns the number of nonzero elements in a matrix row"""
-        return reduce(operator.add, (1 if x!=0.0 else 0 for x in self.__m[i]))
+        return self.__n-self.__m[self._row_slice(i)].count(0.0)
     def col_nonzero(self, j):
         """Returns the number of nonzero elements in a matrix column"""
-        return reduce(operator.add, (1 if x!=0.0 else 0 for x in
-                                       (y[j] for y in self.__m)))
+        return self.__n-self.__m[self._column_slice(j)].count(0.0)
     def get_row(self, i):
-        """Returns a single matrix row as a list."""
-        return self.__m[i]
+        """Returns a copy of a single matrix row as a list. Modifying it
+        won't change the matrix."""
+        return self.__m[self._row_slice(i)].tolist()
     def set_row(self, i, row):
         """Sets an entire matrix row at once."""
-        self.__m[i]=row
+        if len(row)!=self.__n:
+            raise ValueError("A row of a %dx%d matrix can't have %d "
+                             "elements." % (self.__n, self.__n, len(row)))
+        self.__m[self._row_slice(i)]=array(self.__typecode, row)
     def max(self):
         """Returns the single highest value in the entire matrix"""
-        return reduce(max, (reduce(max, x) for x in self.__m))
+        return max(self.__m)
     def iter_rows(self):
         """Iterator that works through rows, one at a time."""
         for i in xrange(len(self)):
@@ -75,7 +128,8 @@ class Matrix(object):
         return
     def normalize(self, suggested_type=None):
         """Returns a normalized version of the matrix. Does not modify the
-        matrix in place (that's unpythonic!)"""
+        matrix in place (that's unpythonic!) - see normalize_in_place for
+        that."""
         # This may fail if everything's 0, but I want it to fail loudly, not
         # do something "clever"
         if suggested_type is None:
@@ -85,40 +139,89 @@ class Matrix(object):
         result=suggested_type(len(self)) # Build a new instance of whatever
                                         # descendant actually invoked this.
         for i in xrange(len(self)):
-            new_row=[0.0] * len(self)
-            this_row=self.get_row(i)
-            for j in xrange(len(self)):
-                new_row[j]=this_row[j]/my_max
-            result.set_row(i, new_row)
+            result.set_row(i, [x/my_max for x in self.get_row(i)])
         return result
+    def normalize_in_place(self):
+        """Divides every cell by the highest value in the matrix, without
+        making a copy of it. Only one row's worth of temporary memory is
+        used."""
+        my_max=float(self.max())
+        if my_max==0.0:
+            raise ZeroDivisionError("Can't normalize a matrix whose maximum "
+                                    "is 0.")
+        for i in xrange(self.__n):
+            row=self._row_slice(i)
+            self.__m[row]=array(self.__typecode, 
+                                [x/my_max for x in self.__m[row]])
     def transpose(self, suggested_type=None):
-        """Returns a transposed copy of the matrix. It is, unfortunately, a
-        slow operation. It requires traversing the entire matrix..."""
+        """Returns a transposed copy of the matrix - see transpose_in_place
+        to avoid the copy."""
         if suggested_type is None:
             suggested_type=Matrix
         transposed=suggested_type(len(self))
         for i in xrange(len(self)):
             # The i-th row of the new matrix must equal the i-th column of
             # the original one
-            transposed.set_row(i, [x[i] for x in self.__m])
+            transposed.set_row(i, self.__m[self._column_slice(i)].tolist())
         return transposed
+    def transpose_in_place(self):
+        """Transposes the matrix without making a copy of it, by swapping
+        the part of each row to the right of the diagonal with the part of
+        the corresponding column below it."""
+        matrix_size=self.__n
+        for i in xrange(matrix_size-1):
+            right=slice(i*matrix_size+i+1, (i+1)*matrix_size)
+            below=slice((i+1)*matrix_size+i, None, matrix_size)
+            (self.__m[right], self.__m[below])=(self.__m[below], 
+                                                self.__m[right])
+    def buffer_info(self):
+        """Returns the (address, number of cells) of the storage array. The
+        cells are C doubles or floats (see typecode), row after row."""
+        return self.__m.buffer_info()
+    def as_ctypes(self):
+        """Returns a ctypes array of c_double (or c_float) that shares its
+        memory with the matrix; no cells are copied. Pass it (or byref() 
+        of it) to C routines that expect a flat, row-major matrix."""
+        c_type=CTYPES_TYPES[self.__typecode]*len(self.__m)
+        return c_type.from_buffer(self.__m)
+    def as_numpy(self):
+        """Returns a writable (n x n) NumPy array that shares its memory 
+        with the matrix; no cells are copied. Requires NumPy."""
+        if not numpy_available:
+            raise RuntimeError("NumPy is not available.")
+        return numpy.frombuffer(self.__m, 
+                                dtype=NUMPY_TYPES[self.__typecode]).reshape(
+                                                    (self.__n, self.__n))
     def as_binary_c_matrix(self):
         """Returns a C array containing the matrix data. It will return one
         long, one-dimensional array with all the contents. C pointer magic 
         will be needed to use it reasonably.
         """
-        import ctypes
         matrix_size=len(self)
         my_array_type=ctypes.c_int * (matrix_size**2)
         c_array=my_array_type()
-        for i in xrange(matrix_size):
-            for j in xrange(matrix_size):
-                c_array[i*matrix_size+j]=int(self[i,j]>0)
+        if numpy_available:
+            # Compare and convert all the cells at once, straight into the
+            # C array
+            binary=numpy.frombuffer(c_array, dtype=numpy.intc)
+            binary[:]=numpy.frombuffer(self.__m, 
+                                       dtype=NUMPY_TYPES[self.__typecode])>0
+        else:
+            for position, value in enumerate(self.__m):
+                if value>0:
+                    c_array[position]=1
         return c_array
     def fill_from_c_matrix(self, c_matrix):
-        """Fills in data from a matrix handled by the C routines."""
-        matrix_size=len(self)
-        for i in xrange(matrix_size):
-            for j in xrange(matrix_size):
-                self[i, j]=int(c_matrix[i*matrix_size+j])
+        """Fills in data from a matrix handled by the C routines (a flat,
+        row-major ctypes array of numbers)."""
+        if len(c_matrix)!=len(self.__m):
+            raise ValueError("A %dx%d matrix can't be filled from %d "
+                             "cells." % (self.__n, self.__n, len(c_matrix)))
+        # The array is overwritten in place, not replaced, so that any
+        # views of it remain valid
+        if numpy_available:
+            numpy.frombuffer(self.__m, dtype=NUMPY_TYPES[self.__typecode])[:]=\
+                numpy.ctypeslib.as_array(c_matrix).ravel()
+        else:
+            self.__m[:]=array(self.__typecode, c_matrix)
         return
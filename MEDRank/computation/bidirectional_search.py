@@ -21,8 +21,9 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 def search(matrix, transposed, point_a, point_b):
     """Performs a bidirectional search on a LinkMatrix to obtain the shortest 
        distance between two concepts. Returns a list containing the route. 
-       You must pre-transpose the matrix to give this a chance of completing
-       some day."""
+       transposed is the transposed matrix; pass None to use the matrix's 
+       own cached in-neighborhoods instead (which is cheaper, and lets
+       repeated searches on the same matrix share the work)."""
     def build_next_level(paths, previous_level, successor_generator):
         """Constructs the next search level."""
         new_level=[]
@@ -34,6 +35,12 @@ def search(matrix, transposed, point_a, point_b):
         return new_level
     
     # Setup computation
+    forward=matrix.out_neighbors()
+    if transposed is None:
+        backward=matrix.in_neighbors()
+    else:
+        backward=transposed.out_neighbors()
+    
     paths_a={ point_a: None }
     paths_b={ point_b: None }
     
@@ -48,9 +55,9 @@ def search(matrix, transposed, point_a, point_b):
         if middle_nodes:
             break # solution found!
         if len(a_nodes)<=len(b_nodes):
-            last_a=build_next_level(paths_a, last_a, matrix.neighbors)
+            last_a=build_next_level(paths_a, last_a, forward.__getitem__)
         else:
-            last_b=build_next_level(paths_b, last_b, transposed.neighbors)
+            last_b=build_next_level(paths_b, last_b, backward.__getitem__)
     else:
         return [] # Empty solution
         
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+breadth_first_distances.py
+
+Computes the distance between every pair of nodes in a LinkMatrix with
+breadth-first searches over the links that exist. The distances are returned
+in a single contiguous array (row-major, so the distance from i to j is at
+i*len(matrix)+j) of the smallest integer type that can hold them.
+
+If NumPy is available the searches for a block of sources advance together,
+one frontier level at a time; otherwise each source gets its own search.
+Either way the work depends on the number of links, not on the number of
+cells in the matrix.
+"""
+
+from array import array
+# Disable warnings about spaces before operators (they drive me crazy)
+# pylint: disable-msg=C0322
+
+try:
+    import numpy
+    numpy_available=True
+except ImportError:
+    numpy_available=False
+
+# How many sources are searched at once by the NumPy engine. Bounds the
+# memory used by each frontier expansion to SOURCES_PER_BLOCK*number of links
+# bytes.
+SOURCES_PER_BLOCK=256
+
+def distance_typecode(matrix_size, unreachable_distance):
+    """Returns the array typecode of the smallest integer type that can hold
+    every distance in a matrix of this size, plus the unreachable
+    distance."""
+    largest=max(matrix_size, unreachable_distance)
+    if unreachable_distance<0:
+        if unreachable_distance>=-32768 and largest<=32767:
+            return 'h'
+    elif largest<=65535:
+        return 'H'
+    return 'i'
+
+def all_pairs_distances(link_matrix, unreachable_distance):
+    """Returns an array with the length of the shortest path from every node
+    to every other node of link_matrix, following the links with a positive
+    value. Nodes are at distance 0 from themselves, and pairs without a path
+    between them are at unreachable_distance."""
+    if numpy_available:
+        return _numpy_distances(link_matrix, unreachable_distance)
+    return _python_distances(link_matrix, unreachable_distance)
+
+def _python_distances(link_matrix, unreachable_distance):
+    """One breadth-first search per source, in pure Python."""
+    matrix_size=len(link_matrix)
+    out_neighbors=link_matrix.out_neighbors()
+    distances=array(distance_typecode(matrix_size, unreachable_distance),
+                    [unreachable_distance])*(matrix_size**2)
+    for source in xrange(matrix_size):
+        row_start=source*matrix_size
+        distances[row_start+source]=0
+        visited=bytearray(matrix_size)
+        visited[source]=1
+        frontier=[source]
+        level=0
+        while frontier:
+            level+=1
+            next_frontier=[]
+            for each_node in frontier:
+                for candidate in out_neighbors[each_node]:
+                    if not visited[candidate]:
+                        visited[candidate]=1
+                        distances[row_start+candidate]=level
+                        next_frontier.append(candidate)
+            frontier=next_frontier
+    return distances
+
+def _numpy_distances(link_matrix, unreachable_distance):
+    """Breadth-first searches from a block of sources at a time. The
+    frontiers of the whole block are a boolean (sources x nodes) matrix, and
+    each level is expanded by gathering the frontier at the origin of every
+    link and OR-reducing it at the links' destinations."""
+    matrix_size=len(link_matrix)
+    typecode=distance_typecode(matrix_size, unreachable_distance)
+    # The links, grouped by destination
+    in_neighbors=link_matrix.in_neighbors()
+    link_origins=numpy.fromiter((x for neighborhood in in_neighbors
+                                 for x in neighborhood), dtype=numpy.intp)
+    destinations=numpy.array([x for x in xrange(matrix_size)
+                              if len(in_neighbors[x])>0], dtype=numpy.intp)
+    group_sizes=numpy.array([len(in_neighbors[x]) for x in destinations],
+                            dtype=numpy.intp)
+    group_starts=numpy.concatenate(([0], numpy.cumsum(group_sizes)[:-1]))
+
+    distances=numpy.empty((matrix_size, matrix_size),
+                          dtype=numpy.dtype(typecode))
+    distances.fill(unreachable_distance)
+    for first in xrange(0, matrix_size, SOURCES_PER_BLOCK):
+        sources=numpy.arange(first, min(first+SOURCES_PER_BLOCK,
+                                        matrix_size))
+        block_rows=numpy.arange(len(sources))
+        block=distances[first:first+len(sources)] # A view, not a copy
+        block[block_rows, sources]=0
+        reached=numpy.zeros((len(sources), matrix_size), dtype=bool)
+        reached[block_rows, sources]=True
+        frontier=reached.copy()
+        level=0
+        while len(link_origins)>0 and frontier.any():
+            level+=1
+            expanded=numpy.zeros_like(frontier)
+            expanded[:, destinations]=numpy.logical_or.reduceat(
+                                        frontier[:, link_origins],
+                                        group_starts, axis=1)
+            frontier=expanded & ~reached
+            block[frontier]=level
+            reached|=frontier
+    result=array(typecode)
+    result.fromstring(distances.tostring())
+    return result
@@ -13,21 +13,36 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 from MEDRank.utility.logger import logging, ULTRADEBUG
 import os.path
 import sys
-from MEDRank.computation.base_matrix import Matrix
-from ctypes import cdll, CDLL, byref
+from array import array
+from ctypes import cdll, CDLL, byref, c_int
+from MEDRank.computation.breadth_first_distances import all_pairs_distances
+try:
+    import numpy
+    numpy_available=True
+except ImportError:
+    numpy_available=False
 # Disable warnings about spaces before operators (they drive me crazy)
 # pylint: disable-msg=C0322
-try:
-    LIBRARY_LOCATION=os.path.join(sys.exec_prefix, 'lib', 
-                                  'python'+sys.version[:3],
-                                  'site-packages', 'MEDRank', 'computation',
-                                  '_distmat.so')
-    cdll.LoadLibrary(LIBRARY_LOCATION)
-    DISTLIB=CDLL(LIBRARY_LOCATION)
-except:
-    DISTLIB=None
-    logging.warn("_distmat.so is not available; attempts to compute graph "
-                 "metrics will result in an exception.")
+
+# The optional C library gets built next to this module by setup.py. Older
+# installs put it in the site-packages directory of the running Python.
+DISTLIB=None
+for LIBRARY_LOCATION in (os.path.join(os.path.dirname(
+                                      os.path.abspath(__file__)),
+                                      '_distmat.so'),
+                         os.path.join(sys.exec_prefix, 'lib', 
+                                      'python'+sys.version[:3],
+                                      'site-packages', 'MEDRank', 
+                                      'computation', '_distmat.so')):
+    try:
+        cdll.LoadLibrary(LIBRARY_LOCATION)
+        DISTLIB=CDLL(LIBRARY_LOCATION)
+        break
+    except:
+        continue
+if DISTLIB is None:
+    logging.log(ULTRADEBUG, "_distmat.so is not available; distance "
+                "matrices will be computed in Python.")
                  
 class DistanceMatrix(object):
     """Represents a distance matrix, in which each C[i, j] encodes the 
@@ -36,43 +51,101 @@ class DistanceMatrix(object):
     constructor. If you omit it, it will default to the link matrix's size
     (reasonable in most cases).
     
+    By default the distances are computed by breadth-first searches over the
+    link matrix's links (see breadth_first_distances). Pass 
+    use_c_library=True to use the _distmat.so library instead, if it was 
+    built.
+    
     The distance matrix is meant to compute stats on, so it's immutable by
     design.
     """
-    def __init__(self, a_link_matrix, unreachable_distance=None):
-        self._matrix=Matrix(len(a_link_matrix))
+    def __init__(self, a_link_matrix, unreachable_distance=None,
+                 use_c_library=False):
+        self._n=len(a_link_matrix)
         if unreachable_distance is None:
             unreachable_distance=len(a_link_matrix)
         self._unreachable=unreachable_distance
+        if use_c_library:
+            self._distances=self._c_distances(a_link_matrix)
+        else:
+            logging.log(ULTRADEBUG, "Computing distances by breadth-first "
+                        "search.")
+            self._distances=all_pairs_distances(a_link_matrix,
+                                                self._unreachable)
+        self._converted_distance=None
+        self._sums=None
+    def _c_distances(self, a_link_matrix):
+        """Computes the distances with the C library."""
+        if DISTLIB is None:
+            raise RuntimeError("_distmat.so is not available.")
         logging.log(ULTRADEBUG, "Getting C versions of the matrices.")
-        transposed=a_link_matrix.transpose()
-        transposed_c=transposed.as_binary_c_matrix()
+        # The link matrix builds both C arrays from its cached 
+        # neighborhoods; there's no need to transpose it.
+        transposed_c=a_link_matrix.as_binary_c_matrix(transposed=True)
         c_link_matrix=a_link_matrix.as_binary_c_matrix()
-        to_fill_in=self._matrix.as_binary_c_matrix()
+        # The C library fills in the distances array directly
+        distances=array('i', [0])*(self._n**2)
+        to_fill_in=(c_int * (self._n**2)).from_buffer(distances)
         logging.log(ULTRADEBUG, "Going into C to perform the search.")
         DISTLIB.fill_distance_matrix(byref(to_fill_in), byref(c_link_matrix), 
-                                     byref(transposed_c), len(a_link_matrix),
+                                     byref(transposed_c), self._n,
                                      self._unreachable)
-        logging.log(ULTRADEBUG, "Back from C. Filling the matrix in.")
-        self._matrix.fill_from_c_matrix(to_fill_in)
-        self._converted_distance=None
+        logging.log(ULTRADEBUG, "Back from C.")
+        return distances
     def __getitem__(self, key):
-        return self._matrix[key]
+        i, j=key
+        if not (0<=i<self._n and 0<=j<self._n):
+            raise IndexError("(%r, %r) is outside of the distance matrix" %
+                             (i, j))
+        return self._distances[i*self._n+j]
     def __len__(self):
-        return len(self._matrix)
+        return self._n
+    def _compute_sums(self):
+        """Computes, in a single pass over the distances, every row and 
+        column sum the graph metrics need: out-distances, in-distances, and
+        the status and contrastatus of each node (row and column sums that
+        ignore unreachable pairs). Uses NumPy if it's available."""
+        if self._sums is not None:
+            return self._sums
+        matrix_size=self._n
+        if numpy_available:
+            # A view on the array, not a copy
+            distances=numpy.frombuffer(self._distances, 
+                                       dtype=numpy.dtype(
+                                         self._distances.typecode))
+            distances=distances.reshape((matrix_size, matrix_size))
+            reachable=numpy.where(distances==self._unreachable, 0, 
+                                  distances)
+            sums=(distances.sum(axis=1, dtype=numpy.int64).tolist(),
+                  distances.sum(axis=0, dtype=numpy.int64).tolist(),
+                  reachable.sum(axis=1, dtype=numpy.int64).tolist(),
+                  reachable.sum(axis=0, dtype=numpy.int64).tolist())
+        else:
+            out_distances=[0]*matrix_size
+            in_distances=[0]*matrix_size
+            status=[0]*matrix_size
+            contrastatus=[0]*matrix_size
+            for i in xrange(matrix_size):
+                row=self._distances[i*matrix_size:(i+1)*matrix_size]
+                out_distances[i]=sum(row)
+                for j, value in enumerate(row):
+                    in_distances[j]+=value
+                    if value!=self._unreachable:
+                        status[i]+=value
+                        contrastatus[j]+=value
+            sums=(out_distances, in_distances, status, contrastatus)
+        self._sums=sums
+        return sums
     def out_distance(self, i):
         """The out-distance of a term i."""
-        return self._matrix.rowsum(i)
+        return self._compute_sums()[0][i]
     def in_distance(self, j):
         """The in-distance of a term j."""
-        return self._matrix.colsum(j)
+        return self._compute_sums()[1][j]
     def compute_converted_distance(self):
         """Calculate the converted distance, for the internal use of other 
         functions."""
-        total=0.0
-        for i in xrange(len(self)):
-            total+=self.out_distance(i)
-        self._converted_distance=total
+        self._converted_distance=float(sum(self._compute_sums()[0]))
     def relative_out_centrality(self, i):
         """Computes relative out centrality."""
         if self._converted_distance is None:
@@ -102,17 +175,43 @@ class DistanceMatrix(object):
         "Measures the linearity of the graph"
         lap=(len(self)**3)/4.0 if len(self)%2==0 \
                                else (len(self)**3-len(self))/4.0
-        total=0.0
-        for i in xrange(len(self)):
-            # We can't use the regular implementations, because we must
-            # invalidate the unconnected nodes.
-            status=0.0
-            contrastatus=0.0
-            for j in xrange(len(self)):
-                rowval=self._matrix[i, j]
-                colval=self._matrix[j, i]
-                status+=0.0 if rowval==self._unreachable else rowval
-                contrastatus+=0.0 if colval==self._unreachable else colval
-            total+=abs(status-contrastatus)
+        # Status and contrastatus can't use the regular out- and 
+        # in-distances, because we must invalidate the unconnected nodes.
+        status, contrastatus=self._compute_sums()[2:]
+        total=float(sum(abs(x-y) for x, y in zip(status, contrastatus)))
         return total/lap
-    
\ No newline at end of file
+    def compute_measures(self):
+        """Computes every metric at once, and returns them as a 
+        DistanceMeasures object. Raises ZeroDivisionError if a centrality is
+        undefined (i.e. some node is at distance 0 from everything)."""
+        if self._converted_distance is None:
+            self.compute_converted_distance()
+        out_distances, in_distances=self._compute_sums()[:2]
+        converted=self._converted_distance
+        rocs=[converted/float(x) for x in out_distances]
+        rics=[converted/float(x) for x in in_distances]
+        return DistanceMeasures(rocs, rics, self.compactness(), 
+                                self.stratum())
+
+class DistanceMeasures(object):
+    """The graph metrics computed by DistanceMatrix.compute_measures. The
+    average_* attributes are what Graph.compute_measures reports."""
+    def __init__(self, relative_out_centralities, relative_in_centralities,
+                 compactness, stratum):
+        self.relative_out_centralities=relative_out_centralities
+        self.relative_in_centralities=relative_in_centralities
+        self.average_relative_out_centrality=\
+            sum(relative_out_centralities)/float(len(
+                                            relative_out_centralities))
+        self.average_relative_in_centrality=\
+            sum(relative_in_centralities)/float(len(
+                                            relative_in_centralities))
+        self.compactness=compactness
+        self.stratum=stratum
+    def __repr__(self):
+        return "<%s: out centrality %1.5f in centrality %1.5f " \
+               "compactness %1.5f stratum %1.5f>" % (
+               self.__class__.__name__,
+               self.average_relative_out_centrality,
+               self.average_relative_in_centrality,
+               self.compactness, self.stratum)
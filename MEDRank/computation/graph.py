@@ -16,6 +16,8 @@ import traceback
 from MEDRank.computation.link import AdirectionalLink
 from MEDRank.computation.link import Link
 from MEDRank.computation.mapped_link_matrix import MappedLinkMatrix
+from MEDRank.computation.sparse_mapped_link_matrix import \
+                                                SparseMappedLinkMatrix
 from MEDRank.computation.node import Node
 from MEDRank.evaluation.result import Result
 from MEDRank.evaluation.result_set import ResultSet
@@ -66,14 +68,66 @@ class GraphStratum(GraphMeasure):
     """Represents the Stratum of the graph"""
     pass
     
+# Measures that only need a pass over the links
+CHEAP_GRAPH_MEASURES=(GraphNumberLinks, GraphNumberNodes, GraphLinkDegree,
+                      GraphAverageNodeWeight, GraphAverageLinkWeight)
+# Measures that need the distances between every pair of nodes. They are
+# much more expensive (in time and memory) than the others.
+DISTANCE_GRAPH_MEASURES=(GraphRelativeOutCentrality, 
+                         GraphRelativeInCentrality,
+                         GraphCompactness, GraphStratum)
+ALL_GRAPH_MEASURES=CHEAP_GRAPH_MEASURES+DISTANCE_GRAPH_MEASURES
+
+# How the weights of repeated links between the same nodes are combined
+# when a graph is consolidated: keep the strongest link, add up their 
+# weights, or average them.
+MAX_LINK_WEIGHT='max'
+SUM_LINK_WEIGHTS='sum'
+MEAN_LINK_WEIGHT='mean'
+LINK_WEIGHT_REDUCERS=(MAX_LINK_WEIGHT, SUM_LINK_WEIGHTS, MEAN_LINK_WEIGHT)
+
 class Graph(object):
     """Describes a link-node graph. In these graphs, there can be only one
     instance of a node and only one link between pairs of nodes. This second
     restriction is to force explicit resolution of the issue of multiple
-    links, instead of making assumptions."""
-    def __init__(self):
-        self._relationships=set([])
+    links, instead of making assumptions.
+    
+    Every node id is interned to a dense integer the first time a link 
+    mentions it, and the first Node object seen with that id becomes the
+    canonical one (see node_table). Repeated links are merged by 
+    consolidate_graph according to link_weight_reducer (one of 
+    LINK_WEIGHT_REDUCERS, MAX_LINK_WEIGHT by default), in a single pass 
+    over the links. Subclasses that override relationship_collision_handler
+    get it called for every group of links instead.
+    
+    Graph builders can also add weighted edges between nodes with add_edge,
+    which doesn't create Link objects at all. The weights are accumulated
+    per key with the same reducer, and the Links are only built when 
+    someone asks for them (relationships, or the exports); as_mapped_link_
+    matrix and compute_measures work straight from the weights."""
+    link_weight_reducer=MAX_LINK_WEIGHT
+    def __init__(self, link_weight_reducer=None):
+        if link_weight_reducer is not None:
+            self.link_weight_reducer=link_weight_reducer
+        if self.link_weight_reducer not in LINK_WEIGHT_REDUCERS:
+            raise ValueError("Unknown link weight reducer %r. Use one of "
+                             "%r." % (self.link_weight_reducer, 
+                                      LINK_WEIGHT_REDUCERS))
+        # Consolidated links by key (see _edge_key), with the total weight
+        # and number of links merged into each of them
+        self._links={}
+        self._link_totals={}
+        # Consolidated edges that haven't been turned into Links yet, as
+        # key->weight. A key is never in both _links and _edge_weights.
+        self._edge_weights={}
+        # Links waiting to be consolidated, grouped by key
         self._temp_relationships={}
+        # Edges waiting to be consolidated, as key->[highest weight, total
+        # weight, count]
+        self._temp_edges={}
+        # node_id->integer, and integer->canonical node
+        self._node_index={}
+        self._node_table=[]
         # self._entities=set([])
 
     # @staticmethod
@@ -104,21 +158,101 @@ class Graph(object):
         return just one.
         Reasonable operations would be adding the weights, choosing the
         largest, etc.
-        The default collision_handler returns the strongest relationship."""
+        The default collision_handler returns the strongest relationship.
+        
+        As long as it isn't overridden, consolidate_graph doesn't actually
+        call it; it merges the links itself according to 
+        link_weight_reducer."""
         # Use the D-S-U pattern
         sorted_relationships=[(x.weight, x) for x in list_of_relationships]
         sorted_relationships.sort(reverse=True)
         return sorted_relationships[0][1]
+    def _intern_node(self, node):
+        """Returns the integer that stands for the node's id, and the
+        canonical node with that id."""
+        try:
+            position=self._node_index[node.node_id]
+        except KeyError:
+            position=len(self._node_table)
+            self._node_index[node.node_id]=position
+            self._node_table.append(node)
+            return (position, node)
+        return (position, self._node_table[position])
+    @staticmethod
+    def _edge_key(position1, position2, adirectional):
+        """Returns the key that identifies a link: the integers of its 
+        nodes (sorted, if it's adirectional) and whether it's 
+        adirectional."""
+        if adirectional and position1>position2:
+            return (position2, position1, True)
+        return (position1, position2, adirectional)
+    def _link_key(self, relationship):
+        """Interns the link's nodes, points the link at the canonical nodes,
+        and returns the key that identifies the link."""
+        (position1, relationship.node1)=self._intern_node(relationship.node1)
+        (position2, relationship.node2)=self._intern_node(relationship.node2)
+        return self._edge_key(position1, position2, 
+                              isinstance(relationship, AdirectionalLink))
     def add_relationship(self, relationship):
         """Takes a Link and adds it to the set of relationships. This is just
         an intermediate step; consolidate_graph should be called before
         actually using the graph for anything.
         """
-        relhash=hash(relationship)
-        if relhash in self._temp_relationships:
-            self._temp_relationships[relhash].append(relationship)
+        key=self._link_key(relationship)
+        if key in self._temp_relationships:
+            self._temp_relationships[key].append(relationship)
         else:
-            self._temp_relationships[relhash]=[relationship]
+            self._temp_relationships[key]=[relationship]
+    def add_edge(self, node1, node2, weight, adirectional=True):
+        """Adds a link of the given weight between node1 and node2 without
+        building a Link; it will be built only if it's ever needed. Like
+        add_relationship, it's an intermediate step before 
+        consolidate_graph. If relationship_collision_handler is overridden
+        the handler needs actual Links, so one is built right away."""
+        if self._has_custom_collision_handler():
+            if adirectional:
+                self.add_relationship(AdirectionalLink(node1, node2, weight))
+            else:
+                self.add_relationship(Link(node1, node2, weight))
+            return
+        key=self._edge_key(self._intern_node(node1)[0], 
+                           self._intern_node(node2)[0], adirectional)
+        pending=self._temp_edges.get(key)
+        if pending is None:
+            self._temp_edges[key]=[weight, weight, 1]
+        else:
+            if weight>pending[0]:
+                pending[0]=weight
+            pending[1]+=weight
+            pending[2]+=1
+    def _materialize_link(self, key):
+        """Builds the Link for a consolidated edge."""
+        (position1, position2, adirectional)=key
+        if adirectional:
+            link_type=AdirectionalLink
+        else:
+            link_type=Link
+        self._links[key]=link_type(self._node_table[position1], 
+                                   self._node_table[position2],
+                                   self._edge_weights.pop(key))
+    def _relationships_fget(self):
+        """The consolidated links, as a list. Builds the Links for the edges
+        that don't have one yet."""
+        for key in self._edge_weights.keys():
+            self._materialize_link(key)
+        return self._links.values()
+    _relationships=property(_relationships_fget)
+    def _link_weights(self):
+        """Iterates through the consolidated links as (key, weight) tuples,
+        without building any Links."""
+        for key, a_relation in self._links.iteritems():
+            yield (key, a_relation.weight)
+        for key_and_weight in self._edge_weights.iteritems():
+            yield key_and_weight
+        return
+    def _link_count(self):
+        """The number of consolidated links."""
+        return len(self._links)+len(self._edge_weights)
     # The relationships property.
     def relationships_fget(self):
         "Getter for the relationships property."
@@ -128,40 +262,109 @@ class Graph(object):
     def nodes_fget(self):
         """Returns a node_id->node dictionary containing the same nodes as the actual
         graph."""
-        result={}
-        for r in self._relationships:
-            n1, n2=r.node1, r.node2
-            if n1.node_id not in result:
-                result[n1.node_id]=n1
-            if n2.node_id not in result:
-                result[n2.node_id]=n2
-        return result
+        self._consolidate_if_necessary()
+        return dict((x.node_id, x) for x in self._node_table)
     nodes=property(nodes_fget)
+    def node_table_fget(self):
+        """Returns the list of canonical nodes. A node's position in it is
+        the integer its id was interned to. Don't modify it."""
+        self._consolidate_if_necessary()
+        return self._node_table
+    node_table=property(node_table_fget)
+    def _has_custom_collision_handler(self):
+        """Does this graph override relationship_collision_handler?"""
+        return type(self).relationship_collision_handler is not \
+               Graph.relationship_collision_handler
     def consolidate_graph(self):
-        """Turns the relationships stored temporarily into an actual graph.
-        collision_handler specifies a callback that will be called if the 
-        relationship is already in the set. The prototype should be:
-        def collision_handler(already_in_set, candidate):
-            return just_the_link_that_should_be_in_the_set
-        Reasonable operations would be adding the weights, choosing the
-        largest, etc.
-        The default collision_handler ignores the newcomer."""
-        
-        for relset in self._temp_relationships.itervalues():
-            # We will keep just one relationship from each set with the same
-            # hash, by using relationship_collision_handler to reduce the 
-            # list. When the list has a single element reduce() doesn't call
-            # the handler function, which makes it perfect for our purposes.
-            self._relationships.add(self.relationship_collision_handler(
-                                        relset))
-        self._temp_relationships={} # Delete the tempset
-        # Consolidate nodes by node_id, so there will only be one unique node 
-        # object per node_id in the graph.
-        canonical_nodes=self.nodes
-        for r in self._relationships:
-            n1, n2=r.node1, r.node2
-            r.node1=canonical_nodes[n1.node_id]
-            r.node2=canonical_nodes[n2.node_id]
+        """Turns the relationships stored temporarily into an actual graph,
+        merging the links between the same nodes (including the ones 
+        consolidated before) into one. By default their weights are 
+        combined according to link_weight_reducer into a new link like the
+        first one; if relationship_collision_handler is overridden, it 
+        chooses the link instead."""
+        if self._has_custom_collision_handler():
+            self._consolidate_with_handler()
+        else:
+            self._reduce_links()
+            self._reduce_edges()
+        self._temp_relationships={} # Delete the tempsets
+        self._temp_edges={}
+    def _consolidate_with_handler(self):
+        """Merges each group of links with relationship_collision_handler."""
+        for key, relset in self._temp_relationships.iteritems():
+            if key in self._edge_weights:
+                self._materialize_link(key)
+            if key in self._links:
+                relset=[self._links[key]]+relset
+            chosen=self.relationship_collision_handler(relset)
+            # The handler may have built a new link
+            self._link_key(chosen)
+            self._links[key]=chosen
+    @staticmethod
+    def _reweighted_link(link, weight):
+        """Returns a new link like the one given, but with another weight.
+        The links passed to add_relationship still belong to the caller, so
+        the reduced weights never get written into them."""
+        return type(link)(link.node1, link.node2, weight, link.name)
+    def _reduce_links(self):
+        """Merges each group of links with the link weight reducer."""
+        keep_strongest=self.link_weight_reducer==MAX_LINK_WEIGHT
+        links=self._links
+        totals=self._link_totals
+        for key, relset in self._temp_relationships.iteritems():
+            if key in self._edge_weights:
+                self._materialize_link(key)
+            if keep_strongest:
+                strongest=links.get(key)
+                for relationship in relset:
+                    if strongest is None or \
+                       relationship.weight>strongest.weight:
+                        strongest=relationship
+                links[key]=strongest
+                continue
+            if key in links:
+                (total, count)=totals[key]
+                first=links[key]
+            else:
+                first=relset[0]
+                (total, count)=(0.0, 0)
+            for relationship in relset:
+                total+=relationship.weight
+            count+=len(relset)
+            totals[key]=(total, count)
+            if self.link_weight_reducer==SUM_LINK_WEIGHTS:
+                links[key]=self._reweighted_link(first, total)
+            else:
+                links[key]=self._reweighted_link(first, total/count)
+    def _reduce_edges(self):
+        """Merges the pending edges into the consolidated links and edges
+        with the link weight reducer."""
+        keep_strongest=self.link_weight_reducer==MAX_LINK_WEIGHT
+        totals=self._link_totals
+        for key, (strongest, total, count) in self._temp_edges.iteritems():
+            a_relation=self._links.get(key)
+            if a_relation is not None:
+                current=a_relation.weight
+            else:
+                current=self._edge_weights.get(key)
+            if keep_strongest:
+                if current is not None and current>=strongest:
+                    continue
+                new_weight=strongest
+            else:
+                if current is not None:
+                    (previous_total, previous_count)=totals[key]
+                    total+=previous_total
+                    count+=previous_count
+                totals[key]=(total, count)
+                if self.link_weight_reducer==SUM_LINK_WEIGHTS:
+                    new_weight=total
+                else:
+                    new_weight=total/count
+            if a_relation is not None:
+                self._links[key]=self._reweighted_link(a_relation, new_weight)
+            else:
+                self._edge_weights[key]=new_weight
         
     def __repr__(self):
         return "<Graph: %r>" % self._relationships
@@ -171,65 +374,95 @@ class Graph(object):
     def _consolidate_if_necessary(self):
         """Consolidates the graph if it's necessary, ignores the call 
         otherwise"""
-        if len(self._temp_relationships)>0:
+        if len(self._temp_relationships)>0 or len(self._temp_edges)>0:
             logging.debug("The graph needs to be consolidated. There are "
                           "relationships in temp storage. Consolidating now.")
             self.consolidate_graph()
-    def as_mapped_link_matrix(self):
-        """Turns a graph into a MappedLinkMatrix"""
+    def as_mapped_link_matrix(self, matrix_type=SparseMappedLinkMatrix):
+        """Turns a graph into a MappedLinkMatrix. By default the matrix is a
+        SparseMappedLinkMatrix, which only stores the links that exist; pass
+        matrix_type=MappedLinkMatrix if you really want a dense one."""
         self._consolidate_if_necessary()
-        # Build a set of all the known nodes
         logging.log(ULTRADEBUG, "Transforming Graph %r into a MappedLinkMatrix",
                     self)
-        nodes=set([x.node1 for x in self._relationships])
-        nodes|=set([x.node2 for x in self._relationships])
-        # Create a MappedLinkMatrix with these as terms
-        new_matrix=MappedLinkMatrix(nodes)
-        # Iterates through the relationships, adding each one to the 
+        # The canonical node table has every known node, and a node's 
+        # position in it is its interned integer, so it's also its position
+        # in the matrix.
+        new_matrix=matrix_type(self._node_table)
+        # Iterates through the link weights, adding each one to the 
         # MappedLinkMatrix 
-        for a_relation in self._relationships:
-            from_coordinate=new_matrix.get_term_position(a_relation.node1)
-            to_coordinate=new_matrix.get_term_position(a_relation.node2)
+        for (from_coordinate, to_coordinate, adirectional), weight in \
+                self._link_weights():
             # If the relation is adirectional, we must add it in both
             # from->to and to->from positions
-            new_matrix[from_coordinate, to_coordinate]=a_relation.weight
-            if isinstance(a_relation, AdirectionalLink):
-                new_matrix[to_coordinate, from_coordinate]=a_relation.weight
+            new_matrix[from_coordinate, to_coordinate]=weight
+            if adirectional:
+                new_matrix[to_coordinate, from_coordinate]=weight
                 
         logging.log(ULTRADEBUG, "MappedLinkMatrix %r built", new_matrix)
         return new_matrix
-    def compute_measures(self):
-        """Computes graph metrics for the current object."""
+    def compute_measures(self, link_matrix=None, 
+                         measures=ALL_GRAPH_MEASURES):
+        """Computes graph metrics for the current object. measures is a list
+        of the GraphMeasure classes you want; only those are computed, and
+        the distance matrix is only built if one of the 
+        DISTANCE_GRAPH_MEASURES is requested. If you already have the graph's
+        mapped link matrix, pass it as link_matrix to avoid building it 
+        again."""
+        measures=set(measures)
+        unknown=measures-set(ALL_GRAPH_MEASURES)
+        if len(unknown)>0:
+            raise ValueError("Unknown graph measures: %r" % list(unknown))
+        graph_measures=ResultSet()
+        if len(measures)==0:
+            return graph_measures
         self._consolidate_if_necessary()
         logging.log(ULTRADEBUG, "Computing graph metrics for %r", self)
-        graph_measures=ResultSet()
-        graph_measures.add(GraphNumberLinks(len(self._relationships)))
-        unique_nodes=set()
-        for a_relation in self._relationships:
-            unique_nodes.add(a_relation.node1)
-            unique_nodes.add(a_relation.node2)
-        graph_measures.add(GraphNumberNodes(len(unique_nodes)))
-        graph_measures.add(GraphAverageNodeWeight(reduce(operator.add,
-                                    [x.weight for x in unique_nodes])/
+        if GraphNumberLinks in measures:
+            graph_measures.add(GraphNumberLinks(self._link_count()))
+        if measures & set([GraphNumberNodes, GraphAverageNodeWeight, 
+                           GraphLinkDegree]):
+            unique_positions=set()
+            for (position1, position2, adirectional), weight in \
+                    self._link_weights():
+                unique_positions.add(position1)
+                unique_positions.add(position2)
+            unique_nodes=[self._node_table[x] for x in unique_positions]
+            if GraphNumberNodes in measures:
+                graph_measures.add(GraphNumberNodes(len(unique_nodes)))
+            if GraphAverageNodeWeight in measures:
+                graph_measures.add(GraphAverageNodeWeight(
+                                    reduce(operator.add,
+                                           [x.weight for x in unique_nodes])/
+                                    float(len(unique_nodes))))
+            if GraphLinkDegree in measures:
+                graph_measures.add(GraphLinkDegree(
+                                    float(self._link_count())/
                                     float(len(unique_nodes))))
-        graph_measures.add(GraphAverageLinkWeight(reduce(operator.add,
-                                    [x.weight for x in self._relationships])/
-                                    float(len(self._relationships))))
-        graph_measures.add(GraphLinkDegree(float(len(self._relationships))/
-                                           float(len(unique_nodes))))
-        logging.log(ULTRADEBUG, "Starting computation of the distance matrix.")
-        distmat=DistanceMatrix(self.as_mapped_link_matrix())
-        logging.log(ULTRADEBUG, "Distance matrix obtained. Computing stats.")
-        rocs=[distmat.relative_out_centrality(x) for x in 
-              xrange(len(distmat))]
-        rics=[distmat.relative_in_centrality(x) for x in 
-              xrange(len(distmat))]
-        avrocs=reduce(operator.add, rocs)/float(len(distmat))
-        avrics=reduce(operator.add, rics)/float(len(distmat))
-        graph_measures.add(GraphRelativeOutCentrality(avrocs))
-        graph_measures.add(GraphRelativeInCentrality(avrics))
-        graph_measures.add(GraphStratum(distmat.stratum()))
-        graph_measures.add(GraphCompactness(distmat.compactness()))
+        if GraphAverageLinkWeight in measures:
+            graph_measures.add(GraphAverageLinkWeight(reduce(operator.add,
+                                    [x[1] for x in self._link_weights()])/
+                                    float(self._link_count())))
+        if measures & set(DISTANCE_GRAPH_MEASURES):
+            logging.log(ULTRADEBUG, 
+                        "Starting computation of the distance matrix.")
+            if link_matrix is None:
+                link_matrix=self.as_mapped_link_matrix()
+            distmat=DistanceMatrix(link_matrix)
+            logging.log(ULTRADEBUG, 
+                        "Distance matrix obtained. Computing stats.")
+            distance_measures=distmat.compute_measures()
+            if GraphRelativeOutCentrality in measures:
+                graph_measures.add(GraphRelativeOutCentrality(
+                    distance_measures.average_relative_out_centrality))
+            if GraphRelativeInCentrality in measures:
+                graph_measures.add(GraphRelativeInCentrality(
+                    distance_measures.average_relative_in_centrality))
+            if GraphStratum in measures:
+                graph_measures.add(GraphStratum(distance_measures.stratum))
+            if GraphCompactness in measures:
+                graph_measures.add(GraphCompactness(
+                                        distance_measures.compactness))
         logging.log(ULTRADEBUG, "Finished computing graph metrics.")
         return graph_measures
     def as_ncol_file(self):
@@ -49,12 +49,19 @@ class GraphBuilder(object):
     
     You can also specify whether to add the nodes that don't belong to a link
     back to the graph as nodes linked to themselves upon consolidation via the
-    add_orphan_nodes parameter (it defaults to True)."""
+    add_orphan_nodes parameter (it defaults to True).
+    
+    With accumulate_edges=True, builders that support it add the weights of
+    their links straight to the graph (see Graph.add_edge) instead of 
+    building a Link object for each of them. The filtering and the merging
+    of repeated links are the same; the Links are only built if the graph
+    is exported."""
     def __init__(self, type_of_graph_to_build=Graph, 
                  node_weight_threshold=0.0,
                  link_weight_threshold=0.0,
                  tf_idf_provider=None,
-                 add_orphan_nodes=True):
+                 add_orphan_nodes=True,
+                 accumulate_edges=False):
         """Accepts a type of Graph to build (so we can use Graph subclasses
         without creating a separate hierarchy of GraphBuilder subclasses)"""
         self._type_of_graph_to_build=type_of_graph_to_build
@@ -65,6 +72,7 @@ class GraphBuilder(object):
         self._line_set_id=None
         self._node_cache=set([])
         self._add_orphan_nodes=add_orphan_nodes
+        self._accumulate_edges=accumulate_edges
         self._measurements=ResultSet()
     #Although at first glance the methods seem to be good candidates for
     #static methods, it's possible that descendants will want to take instance
@@ -108,6 +116,40 @@ class GraphBuilder(object):
     def _adirectional_link_factory(self, node1, node2, weight, name=None):
         """Generates a new adirectional link."""
         return AdirectionalLink(node1, node2, weight, name)
+    def _add_adirectional_link(self, graph, node1, node2, weight):
+        """Adds an adirectional link between node1 and node2 to the graph, 
+        if include_link accepts it. When accumulating edges, the Link is 
+        only built if include_link was overridden and needs one to look 
+        at."""
+        self._add_filtered_link(graph, node1, node2, weight, True)
+    def _add_link(self, graph, node1, node2, weight):
+        """Adds a link from node1 to node2 to the graph, if include_link
+        accepts it. See _add_adirectional_link."""
+        self._add_filtered_link(graph, node1, node2, weight, False)
+    def _add_filtered_link(self, graph, node1, node2, weight, adirectional):
+        """Does the actual work of _add_link and _add_adirectional_link."""
+        if adirectional:
+            link_factory=self._adirectional_link_factory
+        else:
+            link_factory=self._link_factory
+        if not self._accumulate_edges:
+            new_link=link_factory(node1, node2, weight)
+            if self.include_link(new_link):
+                graph.add_relationship(new_link)
+            else:
+                logging.log(ULTRADEBUG, "Excluding link %r from the graph",
+                            new_link)
+            return
+        if type(self).include_link.im_func is \
+           GraphBuilder.include_link.im_func:
+            included=weight>=self._link_weight_threshold
+        else:
+            included=self.include_link(link_factory(node1, node2, weight))
+        if included:
+            graph.add_edge(node1, node2, weight, adirectional)
+        else:
+            logging.log(ULTRADEBUG, "Excluding link %r-%r from the graph",
+                        node1, node2)
     def _create_graph(self, list_of_lines):
         """Actually build the graph (default implementation does nothing and
         returns an empty graph). Override in subclasses."""
@@ -122,13 +164,15 @@ class GraphBuilder(object):
                                  # accidentally
         if self._add_orphan_nodes:
             added=0
-            rels=built_graph.relationships
-            known_nodes=set([x.node1 for x in rels] + [x.node2 for x in rels])
+            known_nodes=set(built_graph.node_table)
             for n in self._node_cache:
                 if n not in known_nodes:
                     added+=1
-                    built_graph.add_relationship(
-                            AdirectionalLink(n, n, n.weight))
+                    if self._accumulate_edges:
+                        built_graph.add_edge(n, n, n.weight)
+                    else:
+                        built_graph.add_relationship(
+                                AdirectionalLink(n, n, n.weight))
             built_graph.consolidate_graph()
             logging.log(ULTRADEBUG, "Added %d orphan nodes", added)
         self._node_cache=set([])
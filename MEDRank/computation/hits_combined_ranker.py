@@ -12,6 +12,7 @@ By default it outputs the authority score.
 Created by Jorge Herskovic on 2008-06-18.
 Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
+from itertools import izip
 from base_hits_ranker import HITSRanker
 # Disable warnings about spaces before and after operators (they drive me crazy)
 # pylint: disable-msg=C0322, C0323
@@ -39,8 +40,9 @@ class HITSCombinedRanker(HITSRanker):
         HITSRanker.__init__(self, damping_factor, max_iterations, epsilon)
         self._combination_function=combination_function
     def evaluate(self, link_matrix):
-        """Performs the actual ranking."""
+        """Performs the actual ranking. A single HITS run computes both the
+        authority and the hub scores."""
         (auth_scores, hub_scores)=HITSRanker.evaluate(self, link_matrix)
-        final_scores=[self._combination_function(x[0], x[1]) for x in
-                      zip(auth_scores, hub_scores)]
+        final_scores=[self._combination_function(authority, hub) 
+                      for (authority, hub) in izip(auth_scores, hub_scores)]
         return final_scores
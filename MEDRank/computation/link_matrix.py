@@ -8,19 +8,64 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
 import operator
-from MEDRank.computation.base_matrix import Matrix
+from MEDRank.computation.base_matrix import Matrix, DOUBLE_PRECISION
 
 # pylint: disable-msg=C0111,E0211,C0111,W0212,W0612
 class LinkMatrix(Matrix):
     """Represents a set of links from one node to another. Actually stores the
     count of links from one node to another in each cell, such that m[i, j] is
-    the number of links from i to j."""
-    def __init__(self, matrix_size):
-        Matrix.__init__(self, matrix_size)
+    the number of links from i to j.
+    
+    The adjacency indexes every ranker needs (out- and in-neighbors, 
+    out-degrees, row sums, the maximum value) are computed once and kept 
+    until the matrix is modified through __setitem__, set_row, 
+    fill_from_c_matrix or one of the in-place operations. Call 
+    cells_changed() after modifying it through as_ctypes() or 
+    as_numpy()."""
+    def __init__(self, matrix_size, typecode=DOUBLE_PRECISION):
+        Matrix.__init__(self, matrix_size, typecode)
+        self._indexes={}
+    def _invalidate(self):
+        """Discards the cached indexes after a modification."""
+        self._indexes={}
+    def cells_changed(self):
+        """Tells the matrix that its cells were modified behind its back
+        (e.g. through a view returned by as_numpy), so that it discards 
+        the indexes it computed from them."""
+        self._invalidate()
+    def _cached(self, index_name, builder):
+        """Returns the cached index index_name, calling builder() to compute
+        it if necessary."""
+        try:
+            return self._indexes[index_name]
+        except KeyError:
+            value=builder()
+            self._indexes[index_name]=value
+            return value
+    def __setitem__(self, key, value):
+        self._invalidate()
+        Matrix.__setitem__(self, key, value)
+    def set_row(self, i, row):
+        """Sets an entire matrix row at once."""
+        self._invalidate()
+        Matrix.set_row(self, i, row)
+    def normalize_in_place(self):
+        """Divides every cell by the highest value in the matrix, without
+        making a copy of it."""
+        Matrix.normalize_in_place(self)
+        self._invalidate()
+    def fill_from_c_matrix(self, c_matrix):
+        """Fills in data from a matrix handled by the C routines."""
+        Matrix.fill_from_c_matrix(self, c_matrix)
+        self._invalidate()
     def transpose(self):
         # Needs a special transpose operation because it must return a 
         # LinkMatrix
         return Matrix.transpose(self, LinkMatrix)
+    def transpose_in_place(self):
+        """Transposes the matrix without making a copy of it."""
+        Matrix.transpose_in_place(self)
+        self._invalidate()
     def neighbors(self, i):
         """Returns the list of neighbors of a node i (this is the list of
         non-zero indexes for the i-th row of the matrix)"""
@@ -30,3 +75,75 @@ class LinkMatrix(Matrix):
     def all_neighbors(self):
         """Returns all the neighbors of each node."""
         return [self.neighbors(x) for x in xrange(len(self))]
+    def out_neighbors(self):
+        """Returns the (cached) neighbors of each node, i.e. the nodes each
+        node links to. Don't modify the result."""
+        return self._cached('out_neighbors', self.all_neighbors)
+    def in_neighbors(self):
+        """Returns the (cached) list of nodes that link TO each node. It's 
+        the same as transpose().all_neighbors(), but it doesn't have to 
+        build the transposed matrix. Don't modify the result."""
+        return self._cached('in_neighbors', self._compute_in_neighbors)
+    def _compute_in_neighbors(self):
+        """Inverts the out-neighborhoods. Since we traverse the nodes in
+        order, each in-neighborhood comes out sorted."""
+        result=[[] for i in xrange(len(self))]
+        for i, neighborhood in enumerate(self.out_neighbors()):
+            for j in neighborhood:
+                result[j].append(i)
+        return result
+    def out_degree(self):
+        """Returns the (cached) number of non-zero cells in each row, i.e.
+        the number of outgoing links of each node. Don't modify the 
+        result."""
+        return self._cached('out_degree', 
+                            lambda: [self.row_nonzero(x) 
+                                     for x in xrange(len(self))])
+    def links(self):
+        """Returns the (cached) list of every non-zero cell (including the
+        negative ones) as a sorted list of (i, j) tuples. Don't modify the
+        result."""
+        return self._cached('links',
+                            lambda: sorted((i, j) for (i, j, value) 
+                                           in self.iter_nonzero()))
+    def row_sums(self):
+        """Returns the (cached) sum of each row. Don't modify the result."""
+        return self._cached('row_sums', 
+                            lambda: [self.rowsum(x) 
+                                     for x in xrange(len(self))])
+    def normalized(self):
+        """Returns the (cached) result of normalize(), so that every ranker
+        run on the same matrix shares it. Don't modify the result."""
+        return self._cached('normalized', self.normalize)
+    def max(self):
+        """Returns the (cached) single highest value in the entire matrix"""
+        return self._cached('max', self._compute_max)
+    def _compute_max(self):
+        """Actually computes the highest value in the matrix."""
+        return Matrix.max(self)
+    def iter_nonzero(self):
+        """Iterates through the non-zero cells as (i, j, value) tuples."""
+        for i in xrange(len(self)):
+            row=self.get_row(i)
+            for j in xrange(len(row)):
+                if row[j]!=0:
+                    yield (i, j, row[j])
+        return
+    def as_binary_c_matrix(self, transposed=False):
+        """Returns a C array containing a 1 wherever there's a link, and a 0
+        elsewhere (see Matrix.as_binary_c_matrix). It's built from the 
+        cached neighborhoods, so only the links are visited. If transposed
+        is True, the array describes the transposed matrix."""
+        import ctypes
+        matrix_size=len(self)
+        my_array_type=ctypes.c_int * (matrix_size**2)
+        c_array=my_array_type() # ctypes zero-fills it
+        if transposed:
+            neighborhoods=self.in_neighbors()
+        else:
+            neighborhoods=self.out_neighbors()
+        for i, neighborhood in enumerate(neighborhoods):
+            row_start=i*matrix_size
+            for j in neighborhood:
+                c_array[row_start+j]=1
+        return c_array
@@ -8,22 +8,36 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
 from MEDRank.computation.link_matrix import LinkMatrix
+from MEDRank.computation.base_matrix import DOUBLE_PRECISION
 
 class MappedLinkMatrix(LinkMatrix):
     """Represents a link matrix that keeps an association with a vocabulary.
     Instead of number of terms, the matrix receives the set of items to
     associate with matrix rows and mantains the association internally.
     
-    The term set must have an iterator."""
-    def __init__(self, terms):
-        LinkMatrix.__init__(self, len(terms))
+    The term set must have an iterator. The cells are stored with the
+    precision given by typecode (see Matrix)."""
+    def __init__(self, terms, typecode=DOUBLE_PRECISION):
+        LinkMatrix.__init__(self, len(terms), typecode)
+        self._set_terms(terms)
+    def _set_terms(self, terms):
+        """Stores the terms, and indexes their positions."""
         self._term_set=[x for x in terms] # Make a list-copy that will define
                                           # the order of the terms and
                                           # allow the matrix to be addressed
                                           # by term instead of by position
+        # Index the positions so get_term_position doesn't have to search 
+        # the list. If a term is repeated, list.index would find the first
+        # one, and so do we.
+        self._term_positions={}
+        for position, term in enumerate(self._term_set):
+            self._term_positions.setdefault(term, position)
     def get_term_position(self, a_term):
         """Returns the index position that corresponds to a certain term."""
-        return self._term_set.index(a_term)
+        try:
+            return self._term_positions[a_term]
+        except KeyError:
+            raise ValueError("%r is not a term in this matrix" % a_term)
     # The terms property.
     def terms_fget(self):
         "Getter for the terms property"
@@ -10,13 +10,23 @@ Created by Jorge Herskovic on 2008-05-20.
 Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
+from MEDRank.utility.logger import logging
 from MEDRank.computation.pageranker import PageRanker
 from MEDRank.computation.mapped_link_matrix import MappedLinkMatrix
 
+def node_key(term):
+    """The key used for a term in the initial score mappings: its node id if
+    it's a Node, the term itself otherwise."""
+    return getattr(term, 'node_id', term)
+
 class RankerResultSet(object):
     """Describes a set of ranking results as sorted term->score pairings.
-    Please iterate through the RankerResultSet to use it."""
-    def __init__(self, original_mapped_matrix, ranking_scores):
+    Please iterate through the RankerResultSet to use it. 
+    
+    If the ranker's unnormalized scores are passed as raw_scores, they are
+    what as_initial_scores returns."""
+    def __init__(self, original_mapped_matrix, ranking_scores, 
+                 raw_scores=None):
         # Sanity check
         if len(original_mapped_matrix.terms)!=len(ranking_scores):
             raise ValueError("The mapped matrix does not have the same"
@@ -25,10 +35,23 @@ class RankerResultSet(object):
                                 len(ranking_scores)))
         self._scored_terms=zip(ranking_scores, original_mapped_matrix.terms)
         self._scored_terms.sort(reverse=True)
+        self._score_index=None
+        if raw_scores is None:
+            raw_scores=ranking_scores
+        self._raw_scores=zip(original_mapped_matrix.terms, raw_scores)
     def __getitem__(self, key):
-        # The preferred access route for this result set is the iterator
-        termkey=[x[1] for x in self._scored_terms].index(key)
-        return self._scored_terms[termkey][0]
+        # The preferred access route for this result set is the iterator,
+        # but random access is cheap too: the scores are indexed by term the
+        # first time they're needed.
+        if self._score_index is None:
+            self._score_index={}
+            for score, term in self._scored_terms:
+                # Keep the first (i.e. highest) score of repeated terms
+                self._score_index.setdefault(term, score)
+        try:
+            return self._score_index[key]
+        except KeyError:
+            raise ValueError("%r is not in the result set" % key)
     def __iter__(self):
         """The default iterator works on keys and values"""
         for score, term in self._scored_terms:
@@ -36,17 +59,73 @@ class RankerResultSet(object):
         return
     def __repr__(self):
         return "<%s: %r>" % (self.__class__.__name__, self._scored_terms)
+    def as_initial_scores(self):
+        """Returns the scores as a dictionary keyed by node id, suitable for
+        warm-starting the ranking of a similar graph (see 
+        MappedRanker.evaluate)."""
+        initial_scores={}
+        for term, score in self._raw_scores:
+            initial_scores.setdefault(node_key(term), score)
+        return initial_scores
     
 class MappedRanker(object):
     """Wraps a Ranker so that it returns a RankerResultSet, that always pairs
     terms with their scores correctly."""
     def __init__(self, ranker):
         self._my_ranker=ranker
-    def evaluate(self, matrix, *other_args):
-        """Run the ranker and return the result as a RankerResultSet."""
-        scores=self._my_ranker.evaluate(matrix, *other_args)
-        result=RankerResultSet(matrix, scores)
+    def evaluate(self, matrix, *other_args, **kwargs):
+        """Run the ranker and return the result as a RankerResultSet.
+        
+        Pass initial_scores=a dictionary of node id->score (such as the one
+        returned by RankerResultSet.as_initial_scores) to warm-start the
+        ranker: the nodes in it start from their previous scores instead of
+        from scratch. Nodes that aren't in it start as usual. Rankers that
+        can't be warm-started (their warm_start_supported is False) raise a
+        ValueError if they're given initial_scores."""
+        initial_scores=kwargs.pop('initial_scores', None)
+        if len(kwargs)>0:
+            raise TypeError("Unexpected keyword arguments: %r" % 
+                            kwargs.keys())
+        if initial_scores is not None and \
+           not getattr(self._my_ranker, 'warm_start_supported', False):
+            raise ValueError("%r can't be warm-started with initial_scores."
+                             % self._my_ranker)
+        if initial_scores is None:
+            scores=self._my_ranker.evaluate(matrix, *other_args)
+        else:
+            initial_values=[initial_scores.get(node_key(x)) 
+                            for x in matrix.terms]
+            scores=self._my_ranker.evaluate(matrix, *other_args,
+                                            initial_values=initial_values)
+        # Keep the unnormalized scores around for warm starts
+        raw_scores=getattr(self._my_ranker, 'latest_values', None)
+        if raw_scores is not None and len(raw_scores)!=len(scores):
+            raw_scores=None
+        result=RankerResultSet(matrix, scores, raw_scores)
         return result
+    def evaluate_batch(self, matrices, *other_args):
+        """Rank many matrices at once and return a list with one 
+        RankerResultSet per matrix (or None, for the matrices that couldn't
+        be ranked). other_args must be sequences parallel to matrices; i.e.
+        the e_vectors for a PageRanker would be passed as a list with one
+        e_vector per matrix.
+        
+        Rankers that know how to rank batches efficiently (they have an
+        evaluate_batch method) are asked to do so; the rest just rank one
+        matrix at a time."""
+        if hasattr(self._my_ranker, 'evaluate_batch'):
+            all_scores=self._my_ranker.evaluate_batch(matrices, *other_args)
+        else:
+            all_scores=[]
+            for position, matrix in enumerate(matrices):
+                try:
+                    all_scores.append(self._my_ranker.evaluate(matrix, 
+                                        *[x[position] for x in other_args]))
+                except (ValueError, ZeroDivisionError), exc:
+                    logging.info("Can't rank %r: %s", matrix, exc)
+                    all_scores.append(None)
+        return [None if scores is None else RankerResultSet(matrix, scores)
+                for matrix, scores in zip(matrices, all_scores)]
     def __repr__(self):
         return "<%s for %r>" % (self.__class__.__name__, self._my_ranker)
     def __getattr__(self, attr):
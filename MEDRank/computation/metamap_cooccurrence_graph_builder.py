@@ -90,12 +90,7 @@ class MetamapCooccurrenceGraphBuilder(GraphBuilder):
                     node1, node2=nodes[i],nodes[j] 
                     #new_link=AdirectionalLink(node1[0], node2[0], 
                     #                          (node1[1]+node2[1])/2.0)
-                    new_link=self._adirectional_link_factory(node1, node2,
+                    self._add_adirectional_link(new_graph, node1, node2,
                                            (node1.weight+node2.weight)/2.0)
-                    if self.include_link(new_link):
-                        new_graph.add_relationship(new_link)
-                    else:
-                        logging.log(ULTRADEBUG, "Excluding link %r from the graph",
-                                      new_link)
         return new_graph
 
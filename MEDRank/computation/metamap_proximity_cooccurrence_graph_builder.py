@@ -23,22 +23,62 @@ from MEDRank.computation.metamap_cooccurrence_graph_builder import \
                                          MetamapCooccurrenceGraphBuilder
 import math
 
+# Concepts further apart than this are unrelated for the default link 
+# strength
+DEFAULT_LINK_WINDOW=10
+
+def default_link_strength(distance):
+    """The default strength of the link between two concepts that are 
+    distance concepts apart: it decays exponentially, and it's 0 beyond
+    DEFAULT_LINK_WINDOW."""
+    if distance>=0 and distance<=DEFAULT_LINK_WINDOW:
+        return 1.0/math.exp(distance-1.0)
+    return 0.0
+
 class MetamapProximityCooccurrenceGraphBuilder(MetamapCooccurrenceGraphBuilder):
     """Build graphs based on METAMAP machine output, using proximity as a 
     proxy for links as expected by Mihalcea's TextRank algorithm. 
     If a direction_inferrer is passed, it will create a directional graph as
-    directed by the inferrer."""
+    directed by the inferrer.
+    
+    link_strength(distance) gives the strength of the link between two 
+    concepts that are distance concepts apart. It's computed once per 
+    distance, and pairs whose strength is 0 aren't linked. If link_window
+    is given, concepts further apart than that aren't even considered, so
+    the cost of a sentence is linear in its length instead of quadratic;
+    it defaults to DEFAULT_LINK_WINDOW for default_link_strength, and to no
+    window at all for any other strength function."""
     def __init__(self, type_of_graph_to_build=Graph, 
                  node_weight_threshold=0.0,
                  link_weight_threshold=0.0,
                  tf_idf_provider=None,
-                 link_strength=lambda x: 1.0/math.exp(x-1.0) if x>=0 and x<=10 else 0.0,
-                 direction_inferrer=None):
+                 link_strength=default_link_strength,
+                 direction_inferrer=None,
+                 link_window=None,
+                 accumulate_edges=False):
         GraphBuilder.__init__(self, type_of_graph_to_build, 
                               node_weight_threshold, link_weight_threshold,
-                              tf_idf_provider)
+                              tf_idf_provider, 
+                              accumulate_edges=accumulate_edges)
+        if link_window is None and link_strength is default_link_strength:
+            link_window=DEFAULT_LINK_WINDOW
+        if link_window is not None and link_window<1:
+            raise ValueError("The link window must be at least 1, not %r." %
+                             link_window)
         self._link_strength=link_strength
+        self._link_window=link_window
+        # Link strengths by distance. Distance 0 is never used.
+        self._strength_table=[0.0]
         self._direction_inferrer=direction_inferrer
+    def _strengths(self, longest_distance):
+        """Returns the table of link strengths by distance, which goes up to
+        longest_distance or the link window, whichever is shorter."""
+        if self._link_window is not None:
+            longest_distance=min(longest_distance, self._link_window)
+        table=self._strength_table
+        while len(table)<=longest_distance:
+            table.append(self._link_strength(len(table)))
+        return table[:longest_distance+1]
 #    def sentence_iterator(self, list_of_lines):
 #        """Breaks down metamap machine output into utterance->eou groups"""
 #        current_group=[]
@@ -72,29 +112,26 @@ class MetamapProximityCooccurrenceGraphBuilder(MetamapCooccurrenceGraphBuilder):
                     logging.log(ULTRADEBUG, "%r included in the graph", new_node)
                 else:
                     logging.log(ULTRADEBUG, "%r excluded from the graph", new_node)
+            strengths=self._strengths(len(nodes)-1)
             for i in xrange(len(nodes)-1):
-                for j in xrange(i+1, len(nodes)):
+                # Only the nodes within the window can be linked to this one
+                for j in xrange(i+1, min(i+len(strengths), len(nodes))):
                     # Adjacent nodes are related more in this model. 
                     # The weight of the relationship is given by the distance
+                    strength=strengths[j-i]
+                    if strength==0.0:
+                        continue
                     node1, node2=nodes[i], nodes[j]
                     if self._direction_inferrer is None:
-                        new_link=self._adirectional_link_factory(node1, node2, 
-                                                    self._link_strength(j-i))
+                        new_dir=0
                     else:
                         new_dir=\
                           self._direction_inferrer.infer_relation_direction(
                            node1.node_id, node2.node_id)
-                        if new_dir==0:
-                            new_link=self._adirectional_link_factory(node1,
-                                                                     node2, 
-                                                self._link_strength(j-i))
-                        else:
-                            new_link=self._link_factory(node1, node2,
-                                        new_dir*self._link_strength(j-i))
-                            
-                    if self.include_link(new_link):
-                        new_graph.add_relationship(new_link)
+                    if new_dir==0:
+                        self._add_adirectional_link(new_graph, node1, node2,
+                                                    strength)
                     else:
-                        logging.log(ULTRADEBUG, "Excluding link %r from the graph", 
-                                      new_link)
+                        self._add_link(new_graph, node1, node2, 
+                                       new_dir*strength)
         return new_graph
@@ -10,7 +10,11 @@ Copyright (c) 2008 University of Texas - Houston. All rights reserved.
 from MEDRank.utility.logger import logging, ULTRADEBUG
 import time
 from MEDRank.computation.link_matrix import LinkMatrix
-from MEDRank.computation.ranker import (Ranker, RankerStats)
+from MEDRank.computation.ranker import (Ranker, RankerStats, JACOBI, 
+                                        GAUSS_SEIDEL, ADAPTIVE, 
+                                        numpy_available)
+if numpy_available:
+    import numpy
 
 class PageRanker(Ranker):
     """Describes a PageRank ranker.
@@ -19,7 +23,20 @@ class PageRanker(Ranker):
        epsilon) is reached.
               
        Call the evaluate() method to start the evaluation. The evaluation 
-       should always return normalized scores (i.e. between 0 and 1)"""
+       should always return normalized scores (i.e. between 0 and 1)
+       
+       If NumPy is available and the ranker uses one of the built-in inner
+       formulas, each iteration is computed as a single sparse 
+       matrix-vector product instead of a Python loop. Subclasses that
+       override inner_formula always get the Python loop, and so do the
+       GAUSS_SEIDEL and ADAPTIVE convergence modes (the adaptive mode only
+       saves work when it skips frozen nodes, which the vectorized update
+       can't do). Set vectorize to False to force the Python loop."""
+    vectorize=True
+    _latest_batch_stats=None
+    # Marks inner_formula as one the vectorized iteration knows how to
+    # compute. Must be set in the same class that defines inner_formula.
+    _vector_formula_weighted=False
     def inner_formula(self, matrix_value, previous_pagerank, this_pagerank,
                       num_outgoing_links):
         """The inner part of the loop - override it for different versions
@@ -27,8 +44,21 @@ class PageRanker(Ranker):
         # While the current formula could be a static method, other inner
         # formulas may rely on instance data - hence it's not.
         return this_pagerank+previous_pagerank/num_outgoing_links
-    def evaluate(self, linkmatrix, e_vector):
-        """Perform an iterative PageRank computation on a link matrix."""
+    def _vectorizable(self):
+        """Can this ranker's inner formula be computed by 
+        _vectorized_iteration?"""
+        if not (numpy_available and self.vectorize) or \
+           self._convergence in (GAUSS_SEIDEL, ADAPTIVE):
+            return False
+        # Find the class that actually defines the inner formula we'd use
+        for klass in type(self).__mro__:
+            if 'inner_formula' in klass.__dict__:
+                return '_vector_formula_weighted' in klass.__dict__
+        return False
+    def evaluate(self, linkmatrix, e_vector, initial_values=None):
+        """Perform an iterative PageRank computation on a link matrix. Nodes
+        start with a PageRank of 1.0, unless initial_values (a list parallel
+        to the matrix) has a value other than None for them."""
         # Cache commonly used values
         logging.log(ULTRADEBUG, "Setting up to compute PageRank on %r", linkmatrix)
         # Sanity check
@@ -37,70 +67,251 @@ class PageRanker(Ranker):
             
         start=time.clock()
         
-        # Precompute the total number of outgoing links for each node (this
-        # is the number of non-zero entries in the node's row of the link
-        # matrix)
-        count_outgoing_links=[linkmatrix.row_nonzero(x)
-                              for x in xrange(len(linkmatrix))]
-        
-        # The incoming links of each node are the nodes that point TO it, 
-        # that is, for every lm[i,j]!=0 in the matrix there's an incoming
-        # link to j. To figure out the incoming links, then, we need to 
-        # traverse the neighborhood of every node looking for incoming links 
-        # to each j. The easy way to do this is to transpose the matrix and
-        # then get the neighborhoods
-        incoming_links=linkmatrix.transpose().all_neighbors()
-        
-        # Set up the iteration - the PageRank computation ends when the 
-        # difference between successive iterations is smaller than epsilon.
-        accumulator=2*self._e
-        iterations=0
-        pagerank_values=[1.0]*len(linkmatrix)
-        logging.log(ULTRADEBUG, "Setup done. Beginning iterations.")
-        
         # Use a normalized matrix for the actual computations
         try:
-            normatrix=linkmatrix.normalize()
+            normatrix=linkmatrix.normalized()
         except ZeroDivisionError:
             raise ZeroDivisionError("Aberrant matrix: There are no links.")
-        start_iter=time.clock()
         
-        # Iterate until the difference between iterations is smaller than 
-        # epsilon. In each iteration, go over every node, computing its 
-        # PageRank based on the PageRank of the adjacent nodes (see the
-        # Brin & Page paper for the formula)
-        while (accumulator>self._e):
-            if iterations>self._max_iter:
-                logging.debug("Reached the iteration limit of %d. Ending the "
-                "PageRank computation prematurely.", self._max_iter)
-                break
-            accumulator=0.0
-            new_pagerank_values=pagerank_values[:]
-            for i in xrange(len(linkmatrix)):
-                this_pagerank=0.0
-                for j in incoming_links[i]:
-                    #this_pagerank+=((pagerank_values[j]*nm[j,i])/
-                    #                count_outgoing_links[j])
-                    #this_pagerank+=(pagerank_values[j]/
-                    #                count_outgoing_links[j])
-                    this_pagerank=self.inner_formula(normatrix[j, i],
-                                                     pagerank_values[j],
-                                                     this_pagerank,
-                                                     count_outgoing_links[j])
-                new_pagerank_values[i]=(self._d*this_pagerank+
-                                        self._d*e_vector[i])
-                accumulator+=abs(new_pagerank_values[i]-pagerank_values[i])
-            iterations+=1
-            pagerank_values=new_pagerank_values
+        (pagerank_values, warm_started_nodes)=self.starting_values(
+                                [1.0]*len(linkmatrix), initial_values)
+        if self._vectorizable():
+            iterate=self._vectorized_iteration
+        else:
+            iterate=self._python_iteration
+        (pagerank_values, iterations, accumulator, start_iter, residuals)=\
+            iterate(linkmatrix, normatrix, e_vector, pagerank_values)
         finished_iter=time.clock()
         # Benchmarking and book-keeping
-        self._latest_stats=RankerStats(iterations, accumulator, start,
-                                        start_iter, finished_iter)
+        self._latest_stats=self.make_stats(iterations, accumulator, start,
+                                           start_iter, finished_iter,
+                                           warm_started_nodes, residuals,
+                                           linkmatrix)
         
         logging.log(ULTRADEBUG, "Finished computation.")
+        self._latest_values=pagerank_values
         highest=max(pagerank_values)
         if highest==0.0:
             raise ValueError("PageRank returned all zeros.")
         # Normalize the scores
         return [x/highest for x in pagerank_values]
-
+    def _python_iteration(self, linkmatrix, normatrix, e_vector, 
+                          pagerank_values):
+        """Iterates PageRank one node and one link at a time, calling 
+        inner_formula for each link, starting from pagerank_values. Returns
+        the PageRank values, the number of iterations, the final 
+        accumulator, the time at which the iterations started, and the 
+        accumulator after each iteration."""
+        # The total number of outgoing links for each node (this is the 
+        # number of non-zero entries in the node's row of the link matrix)
+        count_outgoing_links=linkmatrix.out_degree()
+        
+        # The incoming links of each node are the nodes that point TO it, 
+        # that is, for every lm[i,j]!=0 in the matrix there's an incoming
+        # link to j. The link matrix keeps them precomputed for us.
+        incoming_links=linkmatrix.in_neighbors()
+        
+        # Compute each node's PageRank based on the PageRank of the adjacent
+        # nodes (see the Brin & Page paper for the formula)
+        def update_node(i, pagerank_values):
+            """The new PageRank of node i."""
+            this_pagerank=0.0
+            for j in incoming_links[i]:
+                #this_pagerank+=((pagerank_values[j]*nm[j,i])/
+                #                count_outgoing_links[j])
+                #this_pagerank+=(pagerank_values[j]/
+                #                count_outgoing_links[j])
+                this_pagerank=self.inner_formula(normatrix[j, i],
+                                                 pagerank_values[j],
+                                                 this_pagerank,
+                                                 count_outgoing_links[j])
+            return self._d*this_pagerank+self._d*e_vector[i]
+        logging.log(ULTRADEBUG, "Setup done. Beginning iterations.")
+        start_iter=time.clock()
+        # Iterate until the difference between iterations is smaller than 
+        # epsilon.
+        (pagerank_values, iterations, accumulator, residuals)=\
+            self.iterate_nodes(pagerank_values, update_node)
+        return (pagerank_values, iterations, accumulator, start_iter,
+                residuals)
+    def _vector_links(self, linkmatrix, normatrix):
+        """Turns the links of a matrix into three parallel NumPy arrays: 
+        their sources, their targets, and the coefficient by which the 
+        source's PageRank is multiplied when it flows to the target."""
+        links=[(j, i) for (j, i, value) in linkmatrix.iter_nonzero()
+               if value>0]
+        sources=numpy.fromiter((x[0] for x in links), dtype=numpy.intp,
+                               count=len(links))
+        targets=numpy.fromiter((x[1] for x in links), dtype=numpy.intp,
+                               count=len(links))
+        count_outgoing_links=numpy.array(linkmatrix.out_degree(),
+                                         dtype=numpy.float64)
+        coefficients=1.0/count_outgoing_links[sources]
+        if self._vector_formula_weighted:
+            coefficients*=numpy.fromiter((normatrix[j, i] for (j, i) 
+                                          in links), dtype=numpy.float64,
+                                         count=len(links))
+        return (sources, targets, coefficients)
+    def _vectorized_iteration(self, linkmatrix, normatrix, e_vector,
+                              pagerank_values):
+        """Iterates PageRank with NumPy. Each link j->i becomes one entry in
+        three parallel arrays (source, target, coefficient), so an iteration
+        is a gather, a multiplication, and a scatter-add (bincount). 
+        Convergence is decided exactly as in _python_iteration."""
+        matrix_size=len(linkmatrix)
+        (sources, targets, coefficients)=self._vector_links(linkmatrix,
+                                                            normatrix)
+        teleport=self._d*numpy.asarray(e_vector, dtype=numpy.float64)
+        def update_all(pagerank_values):
+            """The new PageRank of every node."""
+            incoming=numpy.bincount(targets, 
+                                    weights=pagerank_values[sources]*
+                                            coefficients,
+                                    minlength=matrix_size)
+            return self._d*incoming+teleport
+        logging.log(ULTRADEBUG, "Setup done. Beginning vectorized "
+                    "iterations.")
+        start_iter=time.clock()
+        (pagerank_values, iterations, accumulator, residuals)=\
+            self.iterate_vector(pagerank_values, update_all)
+        return (pagerank_values, iterations, accumulator, start_iter,
+                residuals)
+    def evaluate_batch(self, linkmatrices, e_vectors):
+        """Computes PageRank on many link matrices at once. Returns a list
+        with the scores of each matrix, in the same order, or None for the
+        matrices that couldn't be ranked (the reason is logged).
+        
+        When the iteration can be vectorized, all the matrices are stacked
+        into a single block-diagonal system that is iterated as a whole, 
+        which avoids paying the per-call overhead for each of many small
+        matrices. Each block keeps its own accumulator and stops iterating
+        (its values are frozen) as soon as it converges, so the results are
+        the same as ranking each matrix on its own. Otherwise, the matrices
+        are simply ranked one at a time.
+        
+        The statistics for each matrix are available afterwards as 
+        batch_stats."""
+        # The block-diagonal iteration is a plain Jacobi iteration, and it
+        # doesn't stop early for the top ranks
+        if not self._vectorizable() or self._convergence!=JACOBI or \
+           self._top_k is not None or self._top_cutoff is not None:
+            return self._sequential_batch(linkmatrices, e_vectors)
+        start=time.clock()
+        # Build the block-diagonal system
+        all_sources=[]
+        all_targets=[]
+        all_coefficients=[]
+        teleports=[]
+        blocks=[] # (position in the batch, offset, size)
+        offset=0
+        for position, (linkmatrix, e_vector) in \
+                                enumerate(zip(linkmatrices, e_vectors)):
+            if len(linkmatrix)==0:
+                logging.info("Can't rank %r in a batch: it's empty.", 
+                             linkmatrix)
+                continue
+            try:
+                normatrix=linkmatrix.normalized()
+            except ZeroDivisionError:
+                logging.info("Can't rank %r in a batch: it has no links.",
+                             linkmatrix)
+                continue
+            (sources, targets, coefficients)=self._vector_links(linkmatrix,
+                                                                normatrix)
+            all_sources.append(sources+offset)
+            all_targets.append(targets+offset)
+            all_coefficients.append(coefficients)
+            teleports.append(self._d*numpy.asarray(e_vector, 
+                                                   dtype=numpy.float64))
+            blocks.append((position, offset, len(linkmatrix)))
+            offset+=len(linkmatrix)
+        results=[None]*len(linkmatrices)
+        self._latest_batch_stats=[None]*len(linkmatrices)
+        if len(blocks)==0:
+            return results
+        sources=numpy.concatenate(all_sources)
+        targets=numpy.concatenate(all_targets)
+        coefficients=numpy.concatenate(all_coefficients)
+        teleport=numpy.concatenate(teleports)
+        total_size=offset
+        # Which block each node belongs to
+        node_block=numpy.repeat(numpy.arange(len(blocks)), 
+                                [x[2] for x in blocks])
+        
+        accumulators=numpy.empty(len(blocks))
+        accumulators.fill(2*self._e)
+        block_iterations=numpy.zeros(len(blocks), dtype=numpy.intp)
+        iterations=0
+        pagerank_values=numpy.ones(total_size)
+        logging.log(ULTRADEBUG, "Batch of %d matrices (%d nodes) set up. "
+                    "Beginning vectorized iterations.", len(blocks),
+                    total_size)
+        start_iter=time.clock()
+        while True:
+            # Same stopping rules as the single-matrix iteration, but per 
+            # block
+            active=accumulators>self._e
+            if not active.any():
+                break
+            if iterations>self._max_iter:
+                logging.debug("Reached the iteration limit of %d. Ending the "
+                "PageRank computation prematurely for %d matrices.", 
+                self._max_iter, int(active.sum()))
+                break
+            incoming=numpy.bincount(targets, 
+                                    weights=pagerank_values[sources]*
+                                            coefficients,
+                                    minlength=total_size)
+            new_pagerank_values=self._d*incoming+teleport
+            # Converged blocks keep their values
+            active_nodes=active[node_block]
+            new_pagerank_values=numpy.where(active_nodes, 
+                                            new_pagerank_values,
+                                            pagerank_values)
+            block_deltas=numpy.bincount(node_block, 
+                                        weights=numpy.abs(
+                                          new_pagerank_values-
+                                          pagerank_values),
+                                        minlength=len(blocks))
+            accumulators=numpy.where(active, block_deltas, accumulators)
+            block_iterations+=active
+            iterations+=1
+            pagerank_values=new_pagerank_values
+        finished_iter=time.clock()
+        self._latest_stats=RankerStats(iterations, 
+                                       float(accumulators.sum()), start,
+                                       start_iter, finished_iter)
+        # Split the system back into its blocks
+        for block_number, (position, offset, size) in enumerate(blocks):
+            scores=pagerank_values[offset:offset+size]
+            highest=scores.max()
+            self._latest_batch_stats[position]=RankerStats(
+                                    int(block_iterations[block_number]),
+                                    float(accumulators[block_number]),
+                                    start, start_iter, finished_iter)
+            if highest==0.0:
+                logging.info("PageRank returned all zeros for %r.", 
+                             linkmatrices[position])
+                continue
+            results[position]=(scores/highest).tolist()
+        logging.log(ULTRADEBUG, "Finished batch computation.")
+        return results
+    def _sequential_batch(self, linkmatrices, e_vectors):
+        """Ranks a batch of matrices one at a time. Used when the batch 
+        can't be vectorized."""
+        results=[]
+        self._latest_batch_stats=[]
+        for linkmatrix, e_vector in zip(linkmatrices, e_vectors):
+            try:
+                results.append(self.evaluate(linkmatrix, e_vector))
+                self._latest_batch_stats.append(self.stats)
+            except (ValueError, ZeroDivisionError), exc:
+                logging.info("Can't rank %r: %s", linkmatrix, exc)
+                results.append(None)
+                self._latest_batch_stats.append(None)
+        return results
+    def get_batch_stats(self):
+        """Returns the statistics for each of the matrices in the last
+        batch ranked by evaluate_batch."""
+        return self._latest_batch_stats
+    batch_stats=property(get_batch_stats)
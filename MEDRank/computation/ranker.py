@@ -10,43 +10,426 @@ Copyright (c) 2008 University of Texas - Houston. All rights reserved.
 """
 
 from MEDRank.utility.logger import logging, ULTRADEBUG
+import math
+import weakref
+from itertools import izip
+
+try:
+    import numpy
+    # The vectorized iterations use numpy.bincount's minlength argument, 
+    # which appeared in NumPy 1.6
+    numpy_available=[int(x) for x in 
+                     numpy.__version__.split('.')[:2]]>=[1, 6]
+except ImportError:
+    numpy_available=False
+
+# Disable warnings about spaces before operators (they drive me crazy)
+# pylint: disable-msg=C0322
+
+# The convergence strategies a Ranker can use.
+# Jacobi: every node is updated from the values of the previous iteration.
+JACOBI='jacobi'
+# Gauss-Seidel: nodes are updated in place, so each node sees the values 
+# already updated in this iteration.
+GAUSS_SEIDEL='gauss-seidel'
+# Jacobi, plus an Aitken-style extrapolation of all the values whenever the
+# iteration has settled into geometric convergence.
+EXTRAPOLATION='extrapolation'
+# Jacobi, but nodes whose value changed less than their share of epsilon 
+# are frozen and not computed again until the others settle; then every node
+# is swept again to confirm convergence. Takes more, but cheaper, iterations.
+ADAPTIVE='adaptive'
+CONVERGENCE_MODES=(JACOBI, GAUSS_SEIDEL, EXTRAPOLATION, ADAPTIVE)
+
+def cosine(vector1, vector2):
+    """The cosine of the angle between two vectors (lists or NumPy arrays),
+    or 0.0 if either of them is missing or zero."""
+    if vector1 is None or vector2 is None:
+        return 0.0
+    if numpy_available:
+        dot=float(numpy.dot(vector1, vector2))
+        norms=float(numpy.dot(vector1, vector1)*numpy.dot(vector2, vector2))
+    else:
+        dot=sum(x*y for (x, y) in izip(vector1, vector2))
+        norms=sum(x*x for x in vector1)*sum(y*y for y in vector2)
+    if norms==0.0:
+        return 0.0
+    return dot/math.sqrt(norms)
 
 class RankerStats(object):
-    """Auxilliary class that holds the statistics for a ranking run."""
+    """Auxilliary class that holds the statistics for a ranking run. 
+    Warm-started runs (see Ranker) also record how many nodes started from
+    a previous score, and iterations_saved: how many fewer iterations they
+    took than the ranker's latest cold start on the same matrix object. It's
+    None if the ranker's latest cold start was on another matrix (or there
+    wasn't one), since the iterations of different graphs can't be 
+    compared. If it's known, the accumulator after each iteration is kept 
+    in residuals. stopped_early is True if the run ended as soon as its top
+    ranks were stable, before converging."""
     def __init__(self, iterations, accumulator, start_time, start_iter_time,
-                 end_time):
+                 end_time, warm_started_nodes=0, iterations_saved=None,
+                 residuals=None, stopped_early=False):
         self._iterations=iterations
         self._accumulator=accumulator
         self._start_time=start_time
         self._start_iter_time=start_iter_time
         self._end_time=end_time
+        self._warm_started_nodes=warm_started_nodes
+        self._iterations_saved=iterations_saved
+        self._residuals=residuals
+        self._stopped_early=stopped_early
     def __repr__(self):
         try:
             runtime=self._end_time-self._start_time
             speed="%s" % (float(self._iterations)/(runtime))
         except ZeroDivisionError:
             speed="Too short to measure"
+        if self._warm_started_nodes>0:
+            warm=" (warm start: %d nodes, %s iterations saved)" % (
+                 self._warm_started_nodes, self._iterations_saved)
+        else:
+            warm=""
+        if self._stopped_early:
+            warm+=" (stopped early: top ranks stable)"
         return "<RankerStats: %d iterations in %s seconds (%s were setup)" \
-               "=%s iterations/second (final accumulator=%s)>" % (
+               "=%s iterations/second (final accumulator=%s)%s>" % (
                self._iterations, runtime, 
                self._start_iter_time-self._start_time,
                speed,
-               self._accumulator)
+               self._accumulator, warm)
+    def iterations_fget(self):
+        "Getter for the iterations property"
+        return self._iterations
+    iterations=property(iterations_fget)
+    def warm_started_nodes_fget(self):
+        "Getter for the warm_started_nodes property"
+        return self._warm_started_nodes
+    warm_started_nodes=property(warm_started_nodes_fget)
+    def iterations_saved_fget(self):
+        "Getter for the iterations_saved property"
+        return self._iterations_saved
+    iterations_saved=property(iterations_saved_fget)
+    def residuals_fget(self):
+        "Getter for the residuals property"
+        return self._residuals
+    residuals=property(residuals_fget)
+    def stopped_early_fget(self):
+        "Getter for the stopped_early property"
+        return self._stopped_early
+    stopped_early=property(stopped_early_fget)
 
 class Ranker(object):
+    """Base class for the iterative rankers.
+    
+    Rankers that support warm starts (warm_start_supported is True) accept
+    an initial_values list in evaluate(), parallel to the matrix, with the
+    score each node should start from (e.g. the score it got when a slightly
+    different version of the same graph was ranked) or None for the nodes
+    that should start from the ranker's usual value. MappedRanker builds
+    this list from a mapping keyed by node id. The best starting point is
+    the unnormalized result of a previous run, which the ranker keeps as
+    latest_values.
+    
+    The convergence parameter chooses how the iteration proceeds; it must be
+    one of the ranker's convergence_modes (see CONVERGENCE_MODES). Rankers
+    that update one node at a time through update functions get every mode
+    for free from iterate_nodes(); iterate_vector() supports every mode but
+    GAUSS_SEIDEL and ADAPTIVE.
+    
+    Callers that only use the best-ranked nodes can pass top_k (a number of
+    nodes) and/or top_cutoff (a normalized score, like the workflows' 
+    ranking cutoff). The iteration then stops as soon as the error bound of
+    the scores proves that neither the membership nor the order of the 
+    nodes at the top (the top_k best, those scoring at least top_cutoff, or
+    both) can change, even if the scores themselves haven't converged. The 
+    rest of the scores are less precise than epsilon would make them."""
+    convergence_modes=CONVERGENCE_MODES
+    # Whether the ranker's iteration can stop early for top_k/top_cutoff
+    top_ranks_supported=True
+    # Whether the ranker's evaluate() accepts initial_values for a warm start
+    warm_start_supported=True
+    # How many iterations apart the EXTRAPOLATION mode considers
+    # extrapolating, and how similar the last two iterations must be for it
+    # to actually do it (see _extrapolation_factor)
+    extrapolation_interval=5
+    extrapolation_alignment=0.99
+    extrapolation_ratio_tolerance=0.05
     def __init__(self, damping_factor=0.85, max_iterations=10000, 
-                 epsilon=0.0001):
+                 epsilon=0.0001, convergence=JACOBI, top_k=None,
+                 top_cutoff=None):
         logging.log(ULTRADEBUG, "Creating a ranker object.")
+        if convergence not in self.convergence_modes:
+            raise ValueError("%s doesn't support the %r convergence mode. "
+                             "Use one of %r." % (self.__class__.__name__, 
+                                                 convergence, 
+                                                 self.convergence_modes))
+        if top_k is not None or top_cutoff is not None:
+            if not self.top_ranks_supported:
+                raise ValueError("%s can't stop early for its top ranks." %
+                                 self.__class__.__name__)
+            if top_k is not None and top_k<1:
+                raise ValueError("top_k must be at least 1, not %r." % 
+                                 top_k)
+            if top_cutoff is not None and not (0.0<=top_cutoff<=1.0):
+                raise ValueError("top_cutoff must be between 0.0 and 1.0, "
+                                 "not %r." % top_cutoff)
         self._max_iter=max_iterations
         self._e=epsilon
         self._d=damping_factor
+        self._convergence=convergence
+        self._top_k=top_k
+        self._top_cutoff=top_cutoff
+        self._stopped_early=False
         self._latest_stats=None
+        self._latest_values=None
+        self._cold_start_matrix=None
+        self._cold_start_iterations=None
     def __repr__(self):
         return "<%s: epsilon %1.7f damping factor %1.7f " \
-               "max_iter %d>" % (self.__class__.__name__,
-                                 self._e, self._d, self._max_iter)
+               "max_iter %d convergence %s>" % (self.__class__.__name__,
+                                 self._e, self._d, self._max_iter,
+                                 self._convergence)
+    @staticmethod
+    def starting_values(default_values, initial_values):
+        """Returns a tuple with the values an iteration should start from
+        (default_values, replaced by the initial_values that aren't None)
+        and the number of values that were replaced."""
+        if initial_values is None:
+            return (default_values, 0)
+        if len(initial_values)!=len(default_values):
+            raise ValueError("There are %d initial values for %d nodes." % 
+                             (len(initial_values), len(default_values)))
+        values=list(default_values)
+        warm_started_nodes=0
+        for i, value in enumerate(initial_values):
+            if value is not None:
+                values[i]=value
+                warm_started_nodes+=1
+        return (values, warm_started_nodes)
+    def make_stats(self, iterations, accumulator, start_time, 
+                   start_iter_time, end_time, warm_started_nodes=0,
+                   residuals=None, matrix=None):
+        """Builds the RankerStats for a run on matrix. Remembers how many 
+        iterations the latest cold start took, and on which matrix, so that
+        warm starts of the same matrix can report their savings. Only a weak
+        reference to the matrix is kept."""
+        if warm_started_nodes==0:
+            if matrix is None:
+                self._cold_start_matrix=None
+            else:
+                self._cold_start_matrix=weakref.ref(matrix)
+            self._cold_start_iterations=iterations
+            iterations_saved=None
+        elif matrix is None or self._cold_start_matrix is None or \
+             self._cold_start_matrix() is not matrix:
+            iterations_saved=None
+        else:
+            iterations_saved=self._cold_start_iterations-iterations
+        return RankerStats(iterations, accumulator, start_time, 
+                           start_iter_time, end_time, warm_started_nodes,
+                           iterations_saved, residuals, self._stopped_early)
+    def _iteration_limit_reached(self, iterations):
+        """Checks (and logs) whether the iteration must end prematurely."""
+        if iterations>self._max_iter:
+            logging.debug("Reached the iteration limit of %d. Ending the "
+                          "%s computation prematurely.", self._max_iter,
+                          self.__class__.__name__)
+            return True
+        return False
+    def _extrapolation_factor(self, residuals, alignment):
+        """Decides whether the EXTRAPOLATION mode should extrapolate after
+        the latest iteration. alignment is the cosine between the changes 
+        made by the last two iterations.
+        
+        If the changes point the same way and shrink by a steady ratio, the
+        error is dominated by a single eigenvector, and the remaining 
+        changes form a geometric series whose sum can be added at once
+        (this is Aitken's delta-squared process, with the ratio estimated
+        from the residuals). Returns the factor by which the latest change
+        must be multiplied and added to the values, or None if they 
+        shouldn't be extrapolated."""
+        if residuals[-2]==0.0 or residuals[-3]==0.0:
+            return None
+        latest_ratio=residuals[-1]/residuals[-2]
+        previous_ratio=residuals[-2]/residuals[-3]
+        if latest_ratio>=1.0 or alignment<self.extrapolation_alignment or \
+           abs(latest_ratio-previous_ratio)>\
+                self.extrapolation_ratio_tolerance*latest_ratio:
+            return None
+        return latest_ratio/(1.0-latest_ratio)
+    def _extrapolation_due(self, iterations):
+        """Is it time to consider extrapolating? iterations must include the
+        latest iteration."""
+        return iterations>=3 and iterations%self.extrapolation_interval==0
+    def _top_ranks_stable(self, values, residuals):
+        """Are the membership and order of the top ranks (see top_k and 
+        top_cutoff) certain, given the values and residuals of an iteration
+        that applied the ranker's formula to every node?
+        
+        Every iteration brings the values closer to the solution by at 
+        least the damping factor (or the latest ratio between residuals, if
+        it's worse), so no value is further from its final one than the 
+        sum of the geometric series of the remaining changes. Nodes whose
+        values are more than twice that apart can't swap places."""
+        if self._top_k is None and self._top_cutoff is None:
+            return False
+        if len(residuals)<2 or residuals[-2]==0.0:
+            return False
+        contraction=max(self._d, residuals[-1]/residuals[-2])
+        if contraction>=1.0:
+            return False
+        error=residuals[-1]*contraction/(1.0-contraction)
+        if numpy_available and isinstance(values, numpy.ndarray):
+            ranked=numpy.sort(values)[::-1].tolist()
+        else:
+            ranked=sorted(values, reverse=True)
+        members=len(ranked)
+        if self._top_cutoff is not None:
+            highest=ranked[0]
+            members=len([x for x in ranked 
+                         if x>=self._top_cutoff*highest])
+        limited_by_k=self._top_k is not None and self._top_k<members
+        if limited_by_k:
+            members=self._top_k
+        # The order within the top ranks
+        for position in xrange(members-1):
+            if ranked[position]-ranked[position+1]<=2*error:
+                return False
+        if members==len(ranked):
+            return True
+        # The membership
+        if limited_by_k:
+            return ranked[members-1]-ranked[members]>2*error
+        # The normalization depends on the highest value, which is
+        # uncertain too
+        return ranked[members-1]-error>=\
+                    self._top_cutoff*(ranked[0]+error) and \
+               ranked[members]+error<self._top_cutoff*(ranked[0]-error)
+    def iterate_nodes(self, values, update_node):
+        """Iterates until the accumulator (the sum of the absolute changes
+        of all nodes in an iteration) is below epsilon, using the ranker's
+        convergence mode. update_node(i, values) must return the new value 
+        of node i computed from the list of values. If the ranker has top_k
+        or top_cutoff, it stops as soon as the top ranks are stable.
+        
+        Returns a tuple with the final values, the number of iterations, 
+        the final accumulator, and the accumulator after each iteration."""
+        matrix_size=len(values)
+        values=list(values)
+        mode=self._convergence
+        accumulator=2*self._e
+        iterations=0
+        residuals=[]
+        # Adaptive mode: the nodes that are still being computed, and 
+        # whether the last iteration skipped some of them
+        active=range(matrix_size)
+        freezing_threshold=self._e/matrix_size
+        partial_sweep=False
+        # Extrapolation mode: the changes made by the previous iteration
+        previous_changes=None
+        self._stopped_early=False
+        while (accumulator>self._e or partial_sweep):
+            if self._iteration_limit_reached(iterations):
+                break
+            accumulator=0.0
+            extrapolated=False
+            if mode==GAUSS_SEIDEL:
+                for i in xrange(matrix_size):
+                    old_value=values[i]
+                    values[i]=update_node(i, values)
+                    accumulator+=abs(values[i]-old_value)
+            elif mode==ADAPTIVE:
+                new_values=values[:]
+                still_active=[]
+                partial_sweep=len(active)<matrix_size
+                for i in active:
+                    new_values[i]=update_node(i, values)
+                    change=abs(new_values[i]-values[i])
+                    accumulator+=change
+                    if change>=freezing_threshold:
+                        still_active.append(i)
+                active=still_active
+                if accumulator<=self._e and partial_sweep:
+                    # Only a sweep over every node can prove convergence
+                    active=range(matrix_size)
+                values=new_values
+            else:
+                new_values=values[:]
+                for i in xrange(matrix_size):
+                    new_values[i]=update_node(i, values)
+                    accumulator+=abs(new_values[i]-values[i])
+                if mode==EXTRAPOLATION:
+                    changes=[x-y for (x, y) in izip(new_values, values)]
+                    if self._extrapolation_due(iterations+1):
+                        factor=self._extrapolation_factor(
+                                    residuals+[accumulator],
+                                    cosine(changes, previous_changes))
+                        if factor is not None:
+                            new_values=[x+factor*y for (x, y) in 
+                                        izip(new_values, changes)]
+                            extrapolated=True
+                    previous_changes=changes
+                values=new_values
+            iterations+=1
+            residuals.append(accumulator)
+            # The error bound only holds after a plain update of every node
+            if not (partial_sweep or extrapolated) and \
+               self._top_ranks_stable(values, residuals):
+                self._stopped_early=True
+                break
+        return (values, iterations, accumulator, residuals)
+    def iterate_vector(self, values, update_all):
+        """The NumPy counterpart of iterate_nodes. update_all(values) must
+        return a new array with every node updated from the array of 
+        values. Gauss-Seidel updates can't be expressed this way, and the 
+        adaptive mode would save no work (every node would still be 
+        computed on every iteration); rankers must use iterate_nodes for 
+        them.
+        
+        Returns a tuple with the final values (as a list), the number of 
+        iterations, the final accumulator, and the accumulator after each 
+        iteration."""
+        mode=self._convergence
+        if mode==GAUSS_SEIDEL:
+            raise ValueError("Gauss-Seidel iteration can't be vectorized.")
+        if mode==ADAPTIVE:
+            raise ValueError("Adaptive iteration can't be vectorized.")
+        values=numpy.array(values, dtype=numpy.float64)
+        accumulator=2*self._e
+        iterations=0
+        residuals=[]
+        previous_changes=None
+        self._stopped_early=False
+        while accumulator>self._e:
+            if self._iteration_limit_reached(iterations):
+                break
+            extrapolated=False
+            new_values=update_all(values)
+            changes=new_values-values
+            accumulator=float(numpy.abs(changes).sum())
+            if mode==EXTRAPOLATION:
+                if self._extrapolation_due(iterations+1):
+                    factor=self._extrapolation_factor(
+                                residuals+[accumulator],
+                                cosine(changes, previous_changes))
+                    if factor is not None:
+                        new_values=new_values+factor*changes
+                        extrapolated=True
+                previous_changes=changes
+            iterations+=1
+            residuals.append(accumulator)
+            values=new_values
+            if not extrapolated and self._top_ranks_stable(values, residuals):
+                self._stopped_early=True
+                break
+        return (values.tolist(), iterations, accumulator, residuals)
     def get_stats(self):
         """Returns information about the last PageRank computation performed
         by this ranker."""
         return self._latest_stats
     stats=property(get_stats)
+    def get_latest_values(self):
+        """Returns the scores computed by the last run of this ranker, 
+        before normalization."""
+        return self._latest_values
+    latest_values=property(get_latest_values)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+ranker_ensemble.py
+
+Runs several rankers (or several configurations of the same ranker) on the
+same mapped link matrix, so that they can be compared on exactly the same
+graph without building it more than once.
+"""
+
+from MEDRank.utility.logger import logging
+from MEDRank.computation.mapped_ranker import MappedRanker
+
+def no_arguments(matrix):
+    """The default argument builder: the ranker only needs the matrix."""
+    return ()
+
+def uniform_e_vector(value):
+    """Returns an argument builder for rankers that need an e_vector (such
+    as PageRanker and SpreadingActivation) with the same value for every
+    node."""
+    def build_arguments(matrix):
+        """Builds the e_vector for matrix."""
+        return ([value]*len(matrix),)
+    return build_arguments
+
+class RankerEnsemble(object):
+    """Ranks a matrix with every one of a list of configurations.
+
+    Each configuration is a (name, ranker) or (name, ranker,
+    argument_builder) tuple. The name identifies the configuration's
+    results, and must be unique. argument_builder(matrix) must return a
+    tuple with the arguments to pass to the ranker's evaluate after the
+    matrix; by default there are none.
+
+    The rankers share the matrix, and with it the indexes it caches
+    (neighborhoods, degrees, its normalized version, etc.), so those are
+    computed once no matter how many configurations there are."""
+    def __init__(self, configurations):
+        self._configurations=[]
+        seen_names=set()
+        for configuration in configurations:
+            if len(configuration)==2:
+                name, ranker=configuration
+                argument_builder=no_arguments
+            else:
+                name, ranker, argument_builder=configuration
+            if name in seen_names:
+                raise ValueError("There are two configurations named %r." %
+                                 name)
+            seen_names.add(name)
+            if not isinstance(ranker, MappedRanker):
+                ranker=MappedRanker(ranker)
+            self._configurations.append((name, ranker, argument_builder))
+    def __len__(self):
+        return len(self._configurations)
+    def __repr__(self):
+        return "<%s: %r>" % (self.__class__.__name__,
+                             [(x[0], x[1]) for x in self._configurations])
+    def names_fget(self):
+        "Getter for the names property"
+        return [x[0] for x in self._configurations]
+    names=property(names_fget)
+    def evaluate(self, matrix):
+        """Ranks the matrix with every configuration, in order. Returns a
+        list of (name, RankerResultSet) tuples. A configuration whose ranker
+        can't rank the matrix gets None instead of a RankerResultSet (the
+        reason is logged), so that it doesn't keep the others from
+        running."""
+        results=[]
+        for name, ranker, argument_builder in self._configurations:
+            try:
+                ranked=ranker.evaluate(matrix, *argument_builder(matrix))
+            except (ValueError, ZeroDivisionError), exc:
+                logging.info("%s (%r) can't rank %r: %s", name, ranker,
+                             matrix, exc)
+                ranked=None
+            results.append((name, ranked))
+        return results
+    def stats(self):
+        """Returns a list of (name, RankerStats) tuples with the statistics
+        of each configuration's latest run."""
+        return [(name, ranker.stats)
+                for name, ranker, argument_builder in self._configurations]
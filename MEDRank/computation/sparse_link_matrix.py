@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+sparse_link_matrix.py
+
+A LinkMatrix that only stores the links that actually exist. Article graphs
+are extremely sparse (a 2,000 concept full-text article has a few thousand
+links, not 4 million), so storing every cell is a waste of memory and of
+time.
+"""
+
+from array import array
+from itertools import izip
+from MEDRank.computation.base_matrix import DOUBLE_PRECISION
+from MEDRank.computation.link_matrix import LinkMatrix
+
+# Disable warnings about spaces before operators (they drive me crazy)
+# pylint: disable-msg=C0322
+
+# Matrix.__init__ is skipped on purpose (see the constructor)
+# pylint: disable-msg=W0231
+
+class SparseLinkMatrix(LinkMatrix):
+    """A LinkMatrix that stores only its non-zero cells.
+
+    While the matrix is being filled in, each row is a column->value
+    dictionary. The first time a structural query is made (neighbors, column
+    sums, etc.) the matrix is compressed into compressed sparse row (CSR) and
+    compressed sparse column (CSC) arrays, which are kept until the matrix is
+    modified again. Memory and setup costs scale with the number of links,
+    not with the square of the number of nodes.
+
+    It can be used anywhere a LinkMatrix can; get_row() returns a dense copy
+    of the row for compatibility, but it's slow and should be avoided."""
+    def __init__(self, matrix_size):
+        # We don't call LinkMatrix.__init__, because it would allocate the
+        # dense storage we're trying to avoid.
+        self._n=matrix_size
+        self._rows={}
+        self._indexes={}
+        self._csr=None
+        self._csc=None
+    def __len__(self):
+        return self._n
+    def __repr__(self):
+        return "<%dx%d %s (%d links)>" % (self._n, self._n,
+                                          self.__class__.__name__,
+                                          self.nonzero_count())
+    def _check_bounds(self, i, j):
+        """Raises IndexError if the coordinates are outside the matrix."""
+        if not (0<=i<self._n and 0<=j<self._n):
+            raise IndexError("(%r, %r) is outside of a %dx%d matrix" %
+                             (i, j, self._n, self._n))
+    def _invalidate(self):
+        """Discards the compressed representations and the cached indexes
+        after a modification."""
+        LinkMatrix._invalidate(self)
+        self._csr=None
+        self._csc=None
+    def __getitem__(self, key):
+        i, j=key
+        self._check_bounds(i, j)
+        row=self._rows.get(i)
+        if row is None:
+            return 0
+        return row.get(j, 0)
+    def __setitem__(self, key, value):
+        i, j=key
+        self._check_bounds(i, j)
+        self._invalidate()
+        if value==0:
+            row=self._rows.get(i)
+            if row is not None and j in row:
+                del row[j]
+                if len(row)==0:
+                    del self._rows[i]
+            return
+        if i in self._rows:
+            self._rows[i][j]=value
+        else:
+            self._rows[i]={j: value}
+    def nonzero_count(self):
+        """Returns the number of non-zero cells (i.e. links) in the matrix."""
+        return sum(len(x) for x in self._rows.itervalues())
+    def iter_nonzero(self):
+        """Iterates through the non-zero cells as (i, j, value) tuples, in no
+        particular order."""
+        for i, row in self._rows.iteritems():
+            for j, value in row.iteritems():
+                yield (i, j, value)
+        return
+    def _compress(self):
+        """Builds the CSR and CSC representations of the matrix, if they
+        aren't current."""
+        if self._csr is not None:
+            return
+        row_ptr=array('l', [0])
+        row_idx=array('l')
+        row_val=array('d')
+        col_count=[0]*(self._n+1)
+        for i in xrange(self._n):
+            row=self._rows.get(i)
+            if row is not None:
+                for j in sorted(row):
+                    row_idx.append(j)
+                    row_val.append(row[j])
+                    col_count[j+1]+=1
+            row_ptr.append(len(row_idx))
+        # Turn the column counts into column pointers, and scatter the row
+        # entries into their columns. Since we traverse the rows in order,
+        # the row indices in each column come out sorted.
+        for j in xrange(self._n):
+            col_count[j+1]+=col_count[j]
+        col_ptr=array('l', col_count)
+        next_slot=col_count[:-1]
+        col_idx=array('l', [0])*len(row_idx)
+        col_val=array('d', [0.0])*len(row_idx)
+        for i in xrange(self._n):
+            for k in xrange(row_ptr[i], row_ptr[i+1]):
+                j=row_idx[k]
+                col_idx[next_slot[j]]=i
+                col_val[next_slot[j]]=row_val[k]
+                next_slot[j]+=1
+        self._csr=(row_ptr, row_idx, row_val)
+        self._csc=(col_ptr, col_idx, col_val)
+    def csr(self):
+        """Returns the (row pointers, column indices, values) arrays of the
+        compressed sparse row representation of the matrix. Don't modify
+        them."""
+        self._compress()
+        return self._csr
+    def csc(self):
+        """Returns the (column pointers, row indices, values) arrays of the
+        compressed sparse column representation of the matrix. Don't modify
+        them."""
+        self._compress()
+        return self._csc
+    def rowsum(self, i):
+        """Returns the sum of a matrix row"""
+        return sum(self._rows.get(i, {}).itervalues())
+    def colsum(self, j):
+        """Returns the sum of a matrix column"""
+        col_ptr, col_idx, col_val=self.csc()
+        return sum(col_val[col_ptr[j]:col_ptr[j+1]])
+    def row_nonzero(self, i):
+        """Returns the number of nonzero elements in a matrix row"""
+        # Zeros are never stored
+        return len(self._rows.get(i, ()))
+    def col_nonzero(self, j):
+        """Returns the number of nonzero elements in a matrix column"""
+        col_ptr=self.csc()[0]
+        return col_ptr[j+1]-col_ptr[j]
+    def get_row(self, i):
+        """Returns a single matrix row as a (dense) list. Unlike the dense
+        Matrix, the list is a copy; modifying it won't change the matrix."""
+        result=[0] * self._n
+        for j, value in self._rows.get(i, {}).iteritems():
+            result[j]=value
+        return result
+    def set_row(self, i, row):
+        """Sets an entire matrix row at once."""
+        self._invalidate()
+        new_row=dict((j, value) for j, value in enumerate(row) if value!=0)
+        if len(new_row)==0:
+            self._rows.pop(i, None)
+        else:
+            self._rows[i]=new_row
+    def _compute_max(self):
+        """Actually computes the highest value in the matrix."""
+        if self._n==0:
+            raise ValueError("An empty matrix has no maximum.")
+        highest=None
+        for row in self._rows.itervalues():
+            row_max=max(row.itervalues())
+            if highest is None or row_max>highest:
+                highest=row_max
+        # The cells we don't store are zeros, and they count too.
+        if highest is None or \
+           (highest<0 and self.nonzero_count()<self._n**2):
+            return 0
+        return highest
+    def normalize(self, suggested_type=None):
+        """Returns a normalized version of the matrix. Does not modify the
+        matrix in place."""
+        if suggested_type is None:
+            suggested_type=SparseLinkMatrix
+        my_max=float(self.max())
+        # The dense implementation fails loudly when everything is 0. So do
+        # we.
+        if my_max==0.0:
+            raise ZeroDivisionError("Can't normalize a matrix whose maximum "
+                                    "is 0.")
+        result=suggested_type(self._n)
+        for i, j, value in self.iter_nonzero():
+            result[i, j]=value/my_max
+        return result
+    def _no_dense_storage(self):
+        """The dense storage views can't be provided."""
+        raise TypeError("A %s has no dense storage to share; use csr() or "
+                        "csc() instead." % self.__class__.__name__)
+    def buffer_info(self):
+        self._no_dense_storage()
+    def as_ctypes(self):
+        self._no_dense_storage()
+    def as_numpy(self):
+        self._no_dense_storage()
+    def _row_slice(self, i):
+        self._no_dense_storage()
+    def _column_slice(self, j):
+        self._no_dense_storage()
+    def typecode_fget(self):
+        """Getter for the typecode property. The cells are Python floats,
+        so they have double precision."""
+        return DOUBLE_PRECISION
+    typecode=property(typecode_fget)
+    def fill_from_c_matrix(self, c_matrix):
+        """Fills in data from a matrix handled by the C routines (a flat,
+        row-major ctypes array of numbers). Only the non-zero cells are
+        stored."""
+        if len(c_matrix)!=self._n**2:
+            raise ValueError("A %dx%d matrix can't be filled from %d "
+                             "cells." % (self._n, self._n, len(c_matrix)))
+        self._invalidate()
+        self._rows={}
+        for position, value in enumerate(c_matrix):
+            if value!=0:
+                i, j=divmod(position, self._n)
+                if i in self._rows:
+                    self._rows[i][j]=value
+                else:
+                    self._rows[i]={j: value}
+    def normalize_in_place(self):
+        """Divides every link by the highest value in the matrix, without
+        making a copy of it."""
+        my_max=float(self.max())
+        if my_max==0.0:
+            raise ZeroDivisionError("Can't normalize a matrix whose maximum "
+                                    "is 0.")
+        self._invalidate()
+        for row in self._rows.itervalues():
+            for j in row:
+                row[j]/=my_max
+    def transpose_in_place(self):
+        """Transposes the matrix. Only the links are traversed."""
+        self._rows=self.transpose()._rows
+        self._invalidate()
+    def transpose(self):
+        """Returns a transposed copy of the matrix. Unlike the dense version,
+        it only has to traverse the links."""
+        transposed=SparseLinkMatrix(self._n)
+        rows=transposed._rows
+        for i, j, value in self.iter_nonzero():
+            if j in rows:
+                rows[j][i]=value
+            else:
+                rows[j]={i: value}
+        return transposed
+    def neighbors(self, i):
+        """Returns the list of neighbors of a node i (this is the list of
+        non-zero indexes for the i-th row of the matrix)"""
+        row_ptr, row_idx, row_val=self.csr()
+        start, end=row_ptr[i], row_ptr[i+1]
+        return [j for j, value in izip(row_idx[start:end],
+                                        row_val[start:end])
+                if value>0]
@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+sparse_mapped_link_matrix.py
+"""
+
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
+from MEDRank.computation.mapped_link_matrix import MappedLinkMatrix
+
+class SparseMappedLinkMatrix(SparseLinkMatrix, MappedLinkMatrix):
+    """A MappedLinkMatrix that only stores the links that exist (see
+    SparseLinkMatrix). This is what Graph.as_mapped_link_matrix builds by
+    default."""
+    def __init__(self, terms):
+        SparseLinkMatrix.__init__(self, len(terms))
+        self._set_terms(terms)
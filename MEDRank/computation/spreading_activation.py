@@ -11,7 +11,7 @@ import time
 import copy
 from MEDRank.utility.logger import logging, ULTRADEBUG
 from MEDRank.computation.link_matrix import LinkMatrix
-from MEDRank.computation.ranker import (Ranker, RankerStats)
+from MEDRank.computation.ranker import (Ranker, RankerStats, JACOBI)
 
 class SpreadingActivation(Ranker):
     """Describes a SpreadingActivation ranker.
@@ -26,7 +26,13 @@ class SpreadingActivation(Ranker):
        -does on PageRank
               
        Call the evaluate() method to start the evaluation. The evaluation 
-       should always return normalized scores (i.e. between 0 and 1)"""
+       should always return normalized scores (i.e. between 0 and 1)
+       
+       Since there's no e_vector feeding the nodes, the activation fades
+       away, and the result depends on the path the iteration takes. Only 
+       the JACOBI convergence mode, which spreads the activation one step 
+       per iteration, is supported."""
+    convergence_modes=(JACOBI,)
     def inner_formula(self, matrix_value, previous_pagerank, this_pagerank,
                       num_outgoing_links):
         """The inner part of the loop - override it for different versions
@@ -34,9 +40,11 @@ class SpreadingActivation(Ranker):
         # While the current formula could be a static method, other inner
         # formulas may rely on instance data - hence it's not.
         return this_pagerank+previous_pagerank/num_outgoing_links
-    def evaluate(self, linkmatrix, e_vector):
+    def evaluate(self, linkmatrix, e_vector, initial_values=None):
         """Perform an iterative Spreading Activation computation on a
-        link matrix."""
+        link matrix. Nodes start with their e_vector value, unless 
+        initial_values (a list parallel to the matrix) has a value other 
+        than None for them."""
         # Cache commonly used values
         logging.log(ULTRADEBUG, "Setting up to compute PageRank on %r", linkmatrix)
         # Sanity check
@@ -45,66 +53,55 @@ class SpreadingActivation(Ranker):
             
         start=time.clock()
         
-        # Precompute the total number of outgoing links for each node (this
-        # is the number of non-zero entries in the node's row of the link
-        # matrix)
-        count_outgoing_links=[linkmatrix.row_nonzero(x)
-                              for x in xrange(len(linkmatrix))]
+        # The total number of outgoing links for each node (this is the 
+        # number of non-zero entries in the node's row of the link matrix)
+        count_outgoing_links=linkmatrix.out_degree()
         
         # The incoming links of each node are the nodes that point TO it, 
         # that is, for every lm[i,j]!=0 in the matrix there's an incoming
-        # link to j. To figure out the incoming links, then, we need to 
-        # traverse the neighborhood of every node looking for incoming links 
-        # to each j. The easy way to do this is to transpose the matrix and
-        # then get the neighborhoods
-        incoming_links=linkmatrix.transpose().all_neighbors()
+        # link to j. The link matrix keeps them precomputed for us.
+        incoming_links=linkmatrix.in_neighbors()
         
-        # Set up the iteration - the PageRank computation ends when the 
-        # difference between successive iterations is smaller than epsilon.
-        accumulator=2*self._e
-        iterations=0
-        pagerank_values=copy.copy(e_vector)
-        logging.log(ULTRADEBUG, "Setup done. Beginning iterations.")
+        (pagerank_values, warm_started_nodes)=self.starting_values(
+                                copy.copy(e_vector), initial_values)
         
         # Use a normalized matrix for the actual computations
         try:
-            normatrix=linkmatrix.normalize()
+            normatrix=linkmatrix.normalized()
         except ZeroDivisionError:
             raise ZeroDivisionError("Aberrant matrix: There are no links.")
+        
+        # Compute each node's activation based on the activation of the 
+        # adjacent nodes
+        def update_node(i, pagerank_values):
+            """The new activation of node i."""
+            this_pagerank=0.0
+            for j in incoming_links[i]:
+                #this_pagerank+=((pagerank_values[j]*nm[j,i])/
+                #                count_outgoing_links[j])
+                #this_pagerank+=(pagerank_values[j]/
+                #                count_outgoing_links[j])
+                this_pagerank=self.inner_formula(normatrix[j, i],
+                                                 pagerank_values[j],
+                                                 this_pagerank,
+                                                 count_outgoing_links[j])
+            return self._d*this_pagerank
+        logging.log(ULTRADEBUG, "Setup done. Beginning iterations.")
         start_iter=time.clock()
         
         # Iterate until the difference between iterations is smaller than 
-        # epsilon. In each iteration, go over every node, computing its 
-        # PageRank based on the PageRank of the adjacent nodes (see the
-        # Brin & Page paper for the formula)
-        while (accumulator>self._e):
-            if iterations>self._max_iter:
-                logging.debug("Reached the iteration limit of %d. Ending the "
-                "PageRank computation prematurely.", self._max_iter)
-                break
-            accumulator=0.0
-            new_pagerank_values=pagerank_values[:]
-            for i in xrange(len(linkmatrix)):
-                this_pagerank=0.0
-                for j in incoming_links[i]:
-                    #this_pagerank+=((pagerank_values[j]*nm[j,i])/
-                    #                count_outgoing_links[j])
-                    #this_pagerank+=(pagerank_values[j]/
-                    #                count_outgoing_links[j])
-                    this_pagerank=self.inner_formula(normatrix[j, i],
-                                                     pagerank_values[j],
-                                                     this_pagerank,
-                                                     count_outgoing_links[j])
-                new_pagerank_values[i]=(self._d*this_pagerank)
-                accumulator+=abs(new_pagerank_values[i]-pagerank_values[i])
-            iterations+=1
-            pagerank_values=new_pagerank_values
+        # epsilon.
+        (pagerank_values, iterations, accumulator, residuals)=\
+            self.iterate_nodes(pagerank_values, update_node)
         finished_iter=time.clock()
         # Benchmarking and book-keeping
-        self._latest_stats=RankerStats(iterations, accumulator, start,
-                                        start_iter, finished_iter)
+        self._latest_stats=self.make_stats(iterations, accumulator, start,
+                                           start_iter, finished_iter,
+                                           warm_started_nodes, residuals,
+                                           linkmatrix)
         
         logging.log(ULTRADEBUG, "Finished computation.")
+        self._latest_values=pagerank_values
         highest=max(pagerank_values)
         if highest==0.0:
             raise ValueError("PageRank returned all zeros.")
@@ -12,6 +12,8 @@ import sys
 sys.path.append('../')
 from base_hits_ranker import *
 from MEDRank.computation.link_matrix import LinkMatrix
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
+from MEDRank.computation.ranker import GAUSS_SEIDEL
 
 class test_base_hits_ranker(unittest.TestCase):
     def setUp(self):
@@ -46,7 +48,40 @@ class test_base_hits_ranker(unittest.TestCase):
         hubscores=zip(hub_score, xrange(len(hub_score)))
         hubscores.sort()
         # The largest hub should be four
-        self.assertEqual(4, hubscores[-1][1]) 
-        
+        self.assertEqual(4, hubscores[-1][1])
+    def testSparseMatrixGivesSameResults(self):
+        sparse=SparseLinkMatrix(len(self.m))
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                sparse[i, j]=self.m[i, j]
+        self.assertEqual(self.r.evaluate(sparse), self.r.evaluate(self.m))
+    def testNegativeLinksCount(self):
+        # HITS looks at every non-zero cell, not just the positive ones
+        self.m[1, 4]=-1
+        (authority_score, hub_score)=self.r.evaluate(self.m)
+        self.assert_(authority_score[4]>0.0)
+    def testMatchesExhaustiveOperations(self):
+        # The I and O operations, cell by cell, as Kleinberg describes them
+        def i_operation(y_weights):
+            return [sum(y_weights[y] for y in xrange(len(self.m)) 
+                        if self.m[y, x]!=0) for x in xrange(len(self.m))]
+        def o_operation(x_weights):
+            return [sum(x_weights[x] for x in xrange(len(self.m)) 
+                        if self.m[y, x]!=0) for y in xrange(len(self.m))]
+        weights=[0.5, 0.25, 1.0, 0.75, 0.1]
+        self.assertEqual(i_operation(weights), 
+                         self.r.i_operation(self.m, weights))
+        self.assertEqual(o_operation(weights), 
+                         self.r.o_operation(self.m, weights))
+    def testOnEmptyMatrix(self):
+        self.assertRaises(ZeroDivisionError, self.r.evaluate, LinkMatrix(5))
+    def testNoTopRanks(self):
+        self.assertRaises(ValueError, HITSRanker, top_k=5)
+    def testOnlyJacobiConvergence(self):
+        self.assertRaises(ValueError, HITSRanker, convergence=GAUSS_SEIDEL)
+        self.r.evaluate(self.m)
+        self.assertEqual(self.r.stats.iterations, 
+                         len(self.r.stats.residuals))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
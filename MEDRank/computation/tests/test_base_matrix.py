@@ -8,7 +8,8 @@ Copyright (c) 2010 UTHSC School of Health Information Sciences. All rights reser
 """
 
 import unittest
-from MEDRank.computation.base_matrix import Matrix
+import ctypes
+from MEDRank.computation.base_matrix import *
 
 class test_base_matrix(unittest.TestCase):
     """The default matrix is a 5x5 matrix with the following setup:
@@ -61,6 +62,69 @@ class test_base_matrix(unittest.TestCase):
         norm=self.m.normalize()
         self.assertAlmostEquals(norm[3, 0], 1.0)
         self.assertAlmostEquals(norm[3, 2], 0.05699481865285)
+    def testNormalizeInPlace(self):
+        norm=self.m.normalize()
+        self.m.normalize_in_place()
+        self.assertEquals(norm, self.m)
+    def testNormalizeZeroMatrixInPlace(self):
+        self.assertRaises(ZeroDivisionError, Matrix(3).normalize_in_place)
+    def testTransposeInPlace(self):
+        t=self.m.transpose()
+        self.m.transpose_in_place()
+        self.assertEquals(t, self.m)
+    def testGetRowIsACopy(self):
+        row=self.m.get_row(1)
+        self.assertEquals(row, [0.0, 3.1, 0.1, 0.0, -7.9])
+        row[0]=100.0
+        self.assertEquals(self.m[1, 0], 0.0)
+    def testSetRowOfTheWrongLength(self):
+        self.assertRaises(ValueError, self.m.set_row, 0, [1.0, 2.0])
+    def testIndexBeyondTheRow(self):
+        # The cells are stored contiguously, but (0, 5) isn't (1, 0)
+        self.assertRaises(IndexError, self.m.__getitem__, (0, 5))
+        self.assertRaises(IndexError, self.m.__setitem__, (0, 5), 1.0)
+    def testSinglePrecision(self):
+        m=Matrix(5, SINGLE_PRECISION)
+        self.assertEquals(SINGLE_PRECISION, m.typecode)
+        for i in xrange(len(self.m)):
+            m.set_row(i, self.m.get_row(i))
+        for i in xrange(len(m)):
+            for j in xrange(len(m)):
+                self.assertAlmostEquals(self.m[i, j], m[i, j], 5)
+    def testUnknownPrecision(self):
+        self.assertRaises(ValueError, Matrix, 5, 'i')
+    def testCtypesView(self):
+        view=self.m.as_ctypes()
+        self.assertEquals(25, len(view))
+        self.assertEquals(view[5*3+0], 19.3)
+        view[1]=42.0
+        self.assertEquals(self.m[0, 1], 42.0)
+        self.assertEquals(ctypes.addressof(view), self.m.buffer_info()[0])
+    def testSinglePrecisionCtypesView(self):
+        m=Matrix(2, SINGLE_PRECISION)
+        m.as_ctypes()[3]=1.5
+        self.assertEquals(m[1, 1], 1.5)
+    @unittest.skipUnless(numpy_available, "NumPy is not installed")
+    def testNumpyView(self):
+        view=self.m.as_numpy()
+        self.assertEquals((5, 5), view.shape)
+        self.assertEquals(view[3, 0], 19.3)
+        view[2, 2]=-1.0
+        self.assertEquals(self.m[2, 2], -1.0)
+        # Views survive the in-place operations
+        self.m.transpose_in_place()
+        self.assertEquals(view[0, 3], 19.3)
+    def testBinaryCMatrix(self):
+        cmat=self.m.as_binary_c_matrix()
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                self.assertEquals(int(self.m[i, j]>0), cmat[i*5+j])
+    def testFillFromCMatrix(self):
+        m=Matrix(5)
+        m.fill_from_c_matrix(self.m.as_ctypes())
+        self.assertEquals(self.m, m)
+        self.assertRaises(ValueError, m.fill_from_c_matrix, 
+                          (ctypes.c_int*4)())
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
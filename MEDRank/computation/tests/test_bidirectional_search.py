@@ -35,6 +35,10 @@ class TestBiDiSearch(unittest.TestCase):
         # 2->1
         self.assertEqual(search(self.m, self.m.transpose(), 2, 1),
                          [2, 3, 0, 1])
+    def testSearchWithoutTransposing(self):
+        self.assertEqual(search(self.m, None, 4, 1), [4, 3, 0, 1])
+        self.assertEqual(search(self.m, None, 2, 1), [2, 3, 0, 1])
+        self.assertEqual(search(self.m, None, 0, 4), [])
     def testEmptySearch(self):
         # 0->4 should be empty
         self.assertEqual(search(self.m, self.m.transpose(), 0, 4), [])
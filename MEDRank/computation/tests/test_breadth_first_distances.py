@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_breadth_first_distances.py
+"""
+
+import unittest
+import random
+from MEDRank.computation.breadth_first_distances import *
+from MEDRank.computation.breadth_first_distances import (_python_distances,
+                                                          _numpy_distances)
+from MEDRank.computation.link_matrix import LinkMatrix
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
+from MEDRank.computation.bidirectional_search import search
+
+# pylint: disable-msg=C0103,C0111,R0904
+class test_breadth_first_distances(unittest.TestCase):
+    def setUp(self):
+        """A random sparse graph, with some unreachable nodes."""
+        random.seed(42)
+        self.m=SparseLinkMatrix(40)
+        for i in xrange(60):
+            self.m[random.randrange(35), random.randrange(35)]=random.random()
+    def testTypecodes(self):
+        self.assertEqual('H', distance_typecode(40, 40))
+        self.assertEqual('h', distance_typecode(40, -1))
+        self.assertEqual('i', distance_typecode(70000, 70000))
+        self.assertEqual('i', distance_typecode(40, -70000))
+    def testAgreesWithBidirectionalSearch(self):
+        distances=_python_distances(self.m, -1)
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                path=search(self.m, None, i, j)
+                expected=len(path)-1 if path else -1
+                if i==j:
+                    expected=0
+                self.assertEqual(expected, distances[i*len(self.m)+j])
+    @unittest.skipUnless(numpy_available, "NumPy is not installed")
+    def testEnginesAgree(self):
+        self.assertEqual(_python_distances(self.m, 40),
+                         _numpy_distances(self.m, 40))
+        self.assertEqual(_python_distances(self.m, -1),
+                         _numpy_distances(self.m, -1))
+    @unittest.skipUnless(numpy_available, "NumPy is not installed")
+    def testNumpyEngineSpansBlocks(self):
+        import MEDRank.computation.breadth_first_distances as bfd
+        old_block=bfd.SOURCES_PER_BLOCK
+        bfd.SOURCES_PER_BLOCK=7
+        try:
+            self.assertEqual(_python_distances(self.m, 40),
+                             _numpy_distances(self.m, 40))
+        finally:
+            bfd.SOURCES_PER_BLOCK=old_block
+    def testNoLinks(self):
+        distances=all_pairs_distances(LinkMatrix(3), 3)
+        self.assertEqual(list(distances), [0, 3, 3, 3, 0, 3, 3, 3, 0])
+        
+if __name__ == '__main__':
+    unittest.main()
@@ -38,6 +38,13 @@ class test_distance_matrix(unittest.TestCase):
         self.assertEqual(dist[1,4], 5)
         self.assertEqual(dist[4,4], 0)
         self.assertEqual(dist[1,3], 2)
+    @unittest.skipUnless(DISTLIB is not None, "_distmat.so is not built")
+    def testCLibraryAgrees(self):
+        dist=DistanceMatrix(self.my_matrix)
+        c_dist=DistanceMatrix(self.my_matrix, use_c_library=True)
+        for i in xrange(len(dist)):
+            for j in xrange(len(dist)):
+                self.assertEqual(dist[i, j], c_dist[i, j])
     def testAltUnreachableDistance(self):
         dist=DistanceMatrix(self.my_matrix, -1)
         self.assertEqual(dist[1,2], 1)
@@ -95,6 +102,16 @@ class test_distance_matrix(unittest.TestCase):
         # Σabs(status-contrastatus)=8
         # stratum=8/30=0.2666666667
         self.assertEqual(8.0/30.0, dist.stratum())
+    def testComputeMeasures(self):
+        dist=DistanceMatrix(self.my_matrix)
+        measures=dist.compute_measures()
+        self.assertEqual(5.3125, measures.relative_out_centralities[2])
+        self.assertEqual(5.3125, measures.relative_in_centralities[4])
+        self.assertEqual(dist.compactness(), measures.compactness)
+        self.assertEqual(8.0/30.0, measures.stratum)
+        # 85/16+85/13+85/16+85/20+85/20, averaged
+        self.assertAlmostEqual((85/16.0+85/13.0+85/16.0+85/20.0+85/20.0)/5,
+                               measures.average_relative_out_centrality)
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
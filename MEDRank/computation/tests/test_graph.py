@@ -75,10 +75,160 @@ class graphTests(unittest.TestCase):
         # Yes, retrieving nodes and links is very convoluted. I don't expect
         # it to be a frequent operation.
         self.assertEqual(changed_node.weight, 2.0)
+    def testSumLinkWeights(self):
+        my_test_graph=Graph(link_weight_reducer=SUM_LINK_WEIGHTS)
+        self.fill_in_graph(my_test_graph)
+        self.assertEqual(5, len(my_test_graph._relationships))
+        changed_link=[x for x in my_test_graph._relationships 
+                      if x.node1.node_id=='2' and x.node2.node_id=='3'][0]
+        self.assertEqual(2.0, changed_link.weight)
+        # Consolidating again keeps adding to the same total
+        my_test_graph.add_relationship(Link(Node('2', 'Node2', 1),
+                                            Node('3', 'Node3', 1), 3.0))
+        my_test_graph.consolidate_graph()
+        self.assertEqual(5, len(my_test_graph._relationships))
+        changed_link=[x for x in my_test_graph._relationships 
+                      if x.node1.node_id=='2' and x.node2.node_id=='3'][0]
+        self.assertEqual(5.0, changed_link.weight)
+    def testReducingLeavesTheCallersLinksAlone(self):
+        my_test_graph=Graph(link_weight_reducer=SUM_LINK_WEIGHTS)
+        first_link=Link(Node('0', 'Node0', 1), Node('1', 'Node1', 1), 1.0)
+        my_test_graph.add_relationship(first_link)
+        my_test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                            Node('1', 'Node1', 1), 2.0))
+        my_test_graph.consolidate_graph()
+        self.assertEqual(1.0, first_link.weight)
+        self.assertEqual([3.0], [x.weight for x in 
+                                 my_test_graph._relationships])
+        # Pending edges are merged into a new link too
+        my_test_graph=Graph(link_weight_reducer=MAX_LINK_WEIGHT)
+        my_test_graph.add_relationship(first_link)
+        my_test_graph.consolidate_graph()
+        my_test_graph.add_edge(Node('0', 'Node0', 1), Node('1', 'Node1', 1),
+                               4.0, adirectional=False)
+        my_test_graph.consolidate_graph()
+        self.assertEqual(1.0, first_link.weight)
+        self.assertEqual([4.0], [x.weight for x in 
+                                 my_test_graph._relationships])
+    def testMeanLinkWeight(self):
+        my_test_graph=Graph(link_weight_reducer=MEAN_LINK_WEIGHT)
+        my_test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                            Node('1', 'Node1', 1), 1.0))
+        my_test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                            Node('1', 'Node1', 1), 2.0))
+        my_test_graph.consolidate_graph()
+        my_test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                            Node('1', 'Node1', 1), 6.0))
+        my_test_graph.consolidate_graph()
+        self.assertEqual([3.0], [x.weight for x in 
+                                 my_test_graph._relationships])
+    def testMaxLinkWeight(self):
+        self.test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                              Node('1', 'Node1', 1), 1.0))
+        self.test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                              Node('1', 'Node1', 1), 4.0))
+        self.test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                              Node('1', 'Node1', 1), 2.0))
+        self.test_graph.consolidate_graph()
+        self.assertEqual([4.0], [x.weight for x in 
+                                 self.test_graph._relationships])
+    def testUnknownLinkWeightReducer(self):
+        self.assertRaises(ValueError, Graph, link_weight_reducer='median')
+    def testAdirectionalDuplicatesAreMerged(self):
+        my_test_graph=Graph(link_weight_reducer=SUM_LINK_WEIGHTS)
+        my_test_graph.add_relationship(AdirectionalLink(Node('0', 'Node0', 1),
+                                                        Node('1', 'Node1', 1),
+                                                        1.0))
+        my_test_graph.add_relationship(AdirectionalLink(Node('1', 'Node1', 1),
+                                                        Node('0', 'Node0', 1),
+                                                        1.0))
+        # A directional link between the same nodes is a different link
+        my_test_graph.add_relationship(Link(Node('1', 'Node1', 1),
+                                            Node('0', 'Node0', 1), 1.0))
+        my_test_graph.consolidate_graph()
+        self.assertEqual([1.0, 2.0], sorted(x.weight for x in
+                                            my_test_graph._relationships))
+    def testLinksWithTheSameHashAreNotMerged(self):
+        # (1<<2)^0==(0<<2)^4
+        first=Link(Node(1, 'Node1', 1), Node(0, 'Node0', 1), 1.0)
+        second=Link(Node(0, 'Node0', 1), Node(4, 'Node4', 1), 1.0)
+        self.assertEqual(hash(first), hash(second))
+        self.test_graph.add_relationship(first)
+        self.test_graph.add_relationship(second)
+        self.test_graph.consolidate_graph()
+        self.assertEqual(2, len(self.test_graph._relationships))
+    def testNodeTable(self):
+        self.fill_in_graph(self.test_graph)
+        table=self.test_graph.node_table
+        self.assertEqual(['0', '1', '2', '3', '4'], 
+                         [x.node_id for x in table])
+        # Every link points at the canonical nodes
+        for a_link in self.test_graph._relationships:
+            self.assert_(a_link.node1 is table[int(a_link.node1.node_id)])
+            self.assert_(a_link.node2 is table[int(a_link.node2.node_id)])
+        a_matrix=self.test_graph.as_mapped_link_matrix()
+        self.assertEqual(table, list(a_matrix.terms))
+    def testAddEdge(self):
+        edge_graph=Graph()
+        self.fill_in_graph(self.test_graph, AdirectionalLink)
+        for a_link in self.test_graph.relationships:
+            edge_graph.add_edge(Node(a_link.node1.node_id, a_link.node1.name,
+                                     1),
+                                Node(a_link.node2.node_id, a_link.node2.name,
+                                     1),
+                                a_link.weight)
+        # The links are repeated in the other direction
+        edge_graph.add_edge(Node('3', 'Node3', 1), Node('2', 'Node2', 1), 5.0)
+        edge_graph.consolidate_graph()
+        # No links have been built yet
+        self.assertEqual(0, len(edge_graph._links))
+        self.assertEqual(self.test_graph.compute_measures(measures=[
+                            GraphNumberLinks, GraphNumberNodes]),
+                         edge_graph.compute_measures(measures=[
+                            GraphNumberLinks, GraphNumberNodes]))
+        a_matrix=edge_graph.as_mapped_link_matrix()
+        self.assertEqual(5.0, a_matrix[a_matrix.get_term_position(
+                                            Node('2', 'Node2', 1)),
+                                       a_matrix.get_term_position(
+                                            Node('3', 'Node3', 1))])
+        self.assertEqual(0, len(edge_graph._links))
+        # Asking for the relationships builds them
+        links=edge_graph.relationships
+        self.assertEqual(5, len(links))
+        self.assert_(all(isinstance(x, AdirectionalLink) for x in links))
+        self.assertEqual(0, len(edge_graph._edge_weights))
+    def testAddEdgeAfterLinks(self):
+        my_test_graph=Graph(link_weight_reducer=SUM_LINK_WEIGHTS)
+        self.fill_in_graph(my_test_graph)
+        my_test_graph.add_edge(Node('2', 'Node2', 1), Node('3', 'Node3', 1),
+                               1.0, adirectional=False)
+        my_test_graph.add_edge(Node('0', 'Node0', 1), Node('2', 'Node2', 1),
+                               1.0, adirectional=False)
+        my_test_graph.add_relationship(Link(Node('0', 'Node0', 1),
+                                            Node('2', 'Node2', 1), 2.0))
+        my_test_graph.consolidate_graph()
+        weights=dict(((x.node1.node_id, x.node2.node_id), x.weight) 
+                     for x in my_test_graph.relationships)
+        self.assertEqual(6, len(weights))
+        self.assertEqual(3.0, weights[('2', '3')])
+        self.assertEqual(3.0, weights[('0', '2')])
+    def testAddEdgeWithCustomHandler(self):
+        class smallestLink(Graph):
+            @staticmethod
+            def relationship_collision_handler(old_ones):
+                return min(old_ones, key=lambda x: x.weight)
+        my_test_graph=smallestLink()
+        my_test_graph.add_edge(Node('0', 'Node0', 1), Node('1', 'Node1', 1),
+                               3.0)
+        my_test_graph.add_edge(Node('1', 'Node1', 1), Node('0', 'Node0', 1),
+                               2.0)
+        my_test_graph.consolidate_graph()
+        self.assertEqual([2.0], [x.weight for x in
+                                 my_test_graph.relationships])
     def testLinkMatrixConversion(self):
         self.fill_in_graph(self.test_graph)
         a_matrix=self.test_graph.as_mapped_link_matrix()
-        self.assert_(type(a_matrix) is MappedLinkMatrix)
+        self.assert_(isinstance(a_matrix, MappedLinkMatrix))
         from_node=Node('2', 'Node2', 1)
         to_node=Node('4', 'Node4', 1)
         self.assertEqual(a_matrix[a_matrix.get_term_position(from_node),
@@ -92,13 +242,20 @@ class graphTests(unittest.TestCase):
         self.assertEqual(a_matrix[a_matrix.get_term_position(to_node),
                                   a_matrix.get_term_position(from_node)],
                                   1.0)
+    def testDenseLinkMatrixConversion(self):
+        self.fill_in_graph(self.test_graph)
+        sparse=self.test_graph.as_mapped_link_matrix()
+        dense=self.test_graph.as_mapped_link_matrix(MappedLinkMatrix)
+        self.assert_(type(dense) is MappedLinkMatrix)
+        self.assertEqual(sparse.terms, dense.terms)
+        self.assertEqual(sparse, dense)
     def testConvertEmptyGraph(self):
         matrix=self.test_graph.as_mapped_link_matrix()
         self.assertEqual(0, len(matrix))
     def testConvertingAdirectionalGraph(self):
         self.fill_in_graph(self.test_graph, AdirectionalLink)
         a_matrix=self.test_graph.as_mapped_link_matrix()
-        self.assert_(type(a_matrix) is MappedLinkMatrix)
+        self.assert_(isinstance(a_matrix, MappedLinkMatrix))
         from_node=Node('2', 'Node2', 1)
         to_node=Node('4', 'Node4', 1)
         self.assertEqual(a_matrix[a_matrix.get_term_position(from_node),
@@ -135,6 +292,29 @@ Node2 Node3 1.0000000
 Node1 Node2 1.0000000
 Node4 Node3 1.0000000
 Node3 blah 1.0000000""".split('\n')))
+    def testComputeAllMeasures(self):
+        self.fill_in_graph(self.test_graph)
+        measures=self.test_graph.compute_measures()
+        self.assertEqual(set(ALL_GRAPH_MEASURES), 
+                         set(type(x) for x in measures))
+    def testComputeSelectedMeasures(self):
+        self.fill_in_graph(self.test_graph)
+        measures=self.test_graph.compute_measures(
+                    measures=[GraphNumberLinks, GraphLinkDegree])
+        self.assertEqual(set([GraphNumberLinks(5), GraphLinkDegree(1.0)]),
+                         measures)
+        everything=self.test_graph.compute_measures()
+        distance_only=self.test_graph.compute_measures(
+                        measures=DISTANCE_GRAPH_MEASURES)
+        self.assertEqual(set(x for x in everything 
+                             if type(x) in DISTANCE_GRAPH_MEASURES),
+                         distance_only)
+        self.assertEqual(0, len(self.test_graph.compute_measures(
+                                    measures=())))
+    def testComputeUnknownMeasure(self):
+        self.fill_in_graph(self.test_graph)
+        self.assertRaises(ValueError, self.test_graph.compute_measures,
+                          measures=[GraphMeasure])
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
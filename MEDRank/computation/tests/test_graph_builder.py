@@ -10,6 +10,7 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 import sys
 import unittest
 from MEDRank.computation.graph_builder import *
+from MEDRank.computation.graph import Graph
                 
 # pylint: disable-msg=C0103,C0111
 class graph_builderTests(unittest.TestCase):
@@ -29,6 +30,39 @@ class graph_builderTests(unittest.TestCase):
         self.assertTrue(my_graph_builder.include_link(a_link))
         a_link=Link(my_fail_node, my_success_node, 0.3)
         self.assertFalse(my_graph_builder.include_link(a_link))
+    def testAccumulatedEdgesMatchLinks(self):
+        graphs=[]
+        for accumulate in (False, True):
+            my_graph_builder=GraphBuilder(link_weight_threshold=0.5,
+                                          accumulate_edges=accumulate)
+            a_graph=Graph()
+            nodes=[Node(x, x, 1.0) for x in 'abc']
+            my_graph_builder._add_adirectional_link(a_graph, nodes[0], 
+                                                    nodes[1], 0.7)
+            my_graph_builder._add_adirectional_link(a_graph, nodes[1],
+                                                    nodes[0], 0.9)
+            my_graph_builder._add_adirectional_link(a_graph, nodes[1], 
+                                                    nodes[2], 0.3)
+            graphs.append(a_graph)
+        self.assertEqual(0, len(graphs[1]._links))
+        self.assertEqual(graphs[0].as_mapped_link_matrix(),
+                         graphs[1].as_mapped_link_matrix())
+        self.assertEqual(set(graphs[0].relationships), 
+                         set(graphs[1].relationships))
+    def testAccumulatedEdgesUseOverriddenFilters(self):
+        class noLinksToA(GraphBuilder):
+            def include_link(self, link_under_consideration):
+                return 'a' not in (link_under_consideration.node1.node_id,
+                                   link_under_consideration.node2.node_id)
+        my_graph_builder=noLinksToA(accumulate_edges=True)
+        a_graph=Graph()
+        nodes=[Node(x, x, 1.0) for x in 'abc']
+        my_graph_builder._add_adirectional_link(a_graph, nodes[0], nodes[1],
+                                                1.0)
+        my_graph_builder._add_adirectional_link(a_graph, nodes[1], nodes[2],
+                                                1.0)
+        self.assertEqual(['b', 'c'], 
+                         [x.node_id for x in a_graph.node_table])
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
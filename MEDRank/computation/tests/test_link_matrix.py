@@ -100,6 +100,63 @@ class link_matrixTests(unittest.TestCase):
         self.fill_in_matrix()    
         t=self.my_matrix.transpose()
         self.assertEquals(t.all_neighbors(), [[], [], [1], [2], [0, 4]])
+    def testCachedIndexes(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.out_neighbors(),
+                          [[4], [2], [3], [], [4]])
+        self.assertEquals(self.my_matrix.in_neighbors(),
+                          [[], [], [1], [2], [0, 4]])
+        self.assertEquals(self.my_matrix.out_degree(), [1, 1, 1, 0, 1])
+        self.assertEquals(self.my_matrix.row_sums(), [1, 3, 2, 0, 4])
+        self.assert_(self.my_matrix.in_neighbors() is 
+                     self.my_matrix.in_neighbors())
+    def testCachedIndexesInvalidated(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.max(), 4)
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [])
+        self.my_matrix[3, 1]=7
+        self.assertEquals(self.my_matrix.max(), 7)
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [3])
+        self.assertEquals(self.my_matrix.out_degree()[3], 1)
+        self.my_matrix.set_row(3, [0, 0, 0, 0, 0])
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [])
+        self.assertEquals(self.my_matrix.row_sums()[3], 0)
+    def testInPlaceOperationsInvalidateIndexes(self):
+        self.fill_in_matrix()
+        expected=self.my_matrix.transpose()
+        self.assertEquals(self.my_matrix.in_neighbors()[4], [0, 4])
+        self.my_matrix.transpose_in_place()
+        self.assertEquals(self.my_matrix.in_neighbors()[4], [4])
+        self.assertEquals(expected, self.my_matrix)
+        self.my_matrix.normalize_in_place()
+        self.assertEquals(self.my_matrix.max(), 1.0)
+        self.assertEquals(self.my_matrix[3, 2], 0.5)
+    def testCellsChanged(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.max(), 4)
+        self.my_matrix.as_ctypes()[5*3+1]=9
+        self.my_matrix.cells_changed()
+        self.assertEquals(self.my_matrix.max(), 9)
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [3])
+    def testFillFromCMatrixInvalidatesIndexes(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.max(), 4)
+        self.my_matrix.fill_from_c_matrix(
+                        self.my_matrix.as_binary_c_matrix())
+        self.assertEquals(self.my_matrix.max(), 1)
+    def testLinks(self):
+        self.fill_in_matrix()
+        self.my_matrix[3, 0]=-1
+        self.assertEquals(self.my_matrix.links(),
+                          [(0, 4), (1, 2), (2, 3), (3, 0), (4, 4)])
+    def testBinaryCMatrix(self):
+        self.fill_in_matrix()
+        cmat=self.my_matrix.as_binary_c_matrix()
+        self.assertEquals([cmat[x] for x in (7, 4, 24, 13, 10)],
+                          [1, 1, 1, 1, 0])
+        tcmat=self.my_matrix.as_binary_c_matrix(transposed=True)
+        self.assertEquals([tcmat[x] for x in (11, 20, 24, 17, 7)],
+                          [1, 1, 1, 1, 0])
     #def testCMatrixConversion(self):
     #    self.fill_in_matrix()
     #    cmat=self.my_matrix.as_int_c_matrix()
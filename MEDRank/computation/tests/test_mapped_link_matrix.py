@@ -105,6 +105,10 @@ class mapped_link_matrixTests(unittest.TestCase):
     def testPosition(self):
         self.assertEqual(0, self.my_matrix.get_term_position('term1'))
         self.assertRaises(ValueError, self.my_matrix.get_term_position, 'hi')
+    def testRepeatedTermPosition(self):
+        m=MappedLinkMatrix(['a', 'b', 'a'])
+        self.assertEqual(0, m.get_term_position('a'))
+        self.assertEqual(1, m.get_term_position('b'))
     
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -11,6 +11,7 @@ import sys
 import unittest
 sys.path.append('../')
 from mapped_ranker import *
+from MEDRank.computation.hits_combined_ranker import HITSCombinedRanker
 
 # pylint: disable-msg=C0103,C0111,R0904        
 class mapped_rankerTests(unittest.TestCase):
@@ -43,6 +44,9 @@ class mapped_rankerTests(unittest.TestCase):
         ranking=self.r.evaluate(self.m, self.e)
         self.assert_(ranking['term3'] > ranking['term4'])
         self.assert_(ranking['term2'] < ranking['term0'])
+    def testUnknownTerm(self):
+        ranking=self.r.evaluate(self.m, self.e)
+        self.assertRaises(ValueError, ranking.__getitem__, 'term7')
     def testRankerAttributesAccessible(self):
         raised=False
         try:
@@ -50,6 +54,54 @@ class mapped_rankerTests(unittest.TestCase):
         except:
             raised=True
         self.assertFalse(raised)
+    def testBatchEvaluation(self):
+        empty=MappedLinkMatrix(['term0'])
+        rankings=self.r.evaluate_batch([self.m, empty], [self.e, [0.15]])
+        self.assertEqual(len(rankings), 2)
+        self.assert_(type(rankings[0]) is RankerResultSet)
+        self.assert_(rankings[0]['term3'] > rankings[0]['term4'])
+        self.assertEqual(rankings[1], None)
+    def testWarmStartByNodeId(self):
+        ranking=self.r.evaluate(self.m, self.e)
+        cold_iterations=self.r.stats.iterations
+        initial_scores=ranking.as_initial_scores()
+        self.assertEqual(set(initial_scores), 
+                         set(['term0', 'term1', 'term2', 'term3', 'term4']))
+        # The same graph, with its terms in a different order
+        other=MappedLinkMatrix(['term3', 'term2', 'term1', 'term0', 
+                                'term4'])
+        other[3, 2]=1
+        other[2, 1]=1
+        other[1, 0]=2
+        other[4, 0]=1
+        other[0, 3]=1
+        reranking=self.r.evaluate(other, self.e, 
+                                  initial_scores=initial_scores)
+        self.assertEqual(5, self.r.stats.warm_started_nodes)
+        self.assert_(self.r.stats.iterations<cold_iterations)
+        for term, score in ranking:
+            self.assertAlmostEqual(score, reranking[term])
+        # Terms that weren't ranked before start from scratch
+        bigger=MappedLinkMatrix(['term0', 'term1', 'term2', 'term3', 
+                                 'term4', 'term5'])
+        for i, j, value in self.m.iter_nonzero():
+            bigger[i, j]=value
+        bigger[5, 3]=1
+        self.r.evaluate(bigger, [0.15]*len(bigger), 
+                        initial_scores=initial_scores)
+        self.assertEqual(5, self.r.stats.warm_started_nodes)
+    def testWarmStartUnsupported(self):
+        hits=MappedRanker(HITSCombinedRanker())
+        self.failIf(hits.warm_start_supported)
+        initial_scores=self.r.evaluate(self.m, self.e).as_initial_scores()
+        self.assertRaises(ValueError, hits.evaluate, self.m,
+                          initial_scores=initial_scores)
+        # Without initial scores it ranks as usual
+        ranking=hits.evaluate(self.m)
+        self.assert_(ranking['term3'] > ranking['term4'])
+    def testUnknownKeywordArgument(self):
+        self.assertRaises(TypeError, self.r.evaluate, self.m, self.e,
+                          initial_score={})
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
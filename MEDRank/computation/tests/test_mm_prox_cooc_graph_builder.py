@@ -80,6 +80,53 @@ class test_mm_prox_cooc_graph_builder(unittest.TestCase):
         # There are 15 unique elements in the fake METAMAP file
         self.assertEqual(15, len(matrix))
 
+    @staticmethod
+    def long_sentence(length):
+        from MEDRank.file.metamap import (MetamapLine, MetamapLineList)
+        return MetamapLineList(1, [MetamapLine(
+                                '0000000001|MM|500|Concept %d|C%07d|[dsyn]|TI'
+                                '||0:%d' % (x, x, x)) for x in xrange(length)])
+    def testOnlyPairsWithinTheWindowAreLinked(self):
+        my_builder=MetamapProximityCooccurrenceGraphBuilder()
+        graph=my_builder.create_graph(self.long_sentence(30))
+        # Pairs up to DEFAULT_LINK_WINDOW concepts apart
+        self.assertEqual(sum(30-x for x in xrange(1, DEFAULT_LINK_WINDOW+1)),
+                         len(graph.relationships))
+        matrix=graph.as_mapped_link_matrix()
+        for i in xrange(30):
+            for j in xrange(30):
+                self.assertAlmostEqual(default_link_strength(abs(i-j))
+                                       if i!=j else 0.0,
+                                       matrix[i, j])
+    def testCustomLinkWindow(self):
+        computed=[]
+        def strength(distance):
+            computed.append(distance)
+            return 1.0/distance
+        my_builder=MetamapProximityCooccurrenceGraphBuilder(
+                        link_strength=strength, link_window=3)
+        graph=my_builder.create_graph(self.long_sentence(20))
+        self.assertEqual(19+18+17, len(graph.relationships))
+        graph=my_builder.create_graph(self.long_sentence(20))
+        # Each distance's strength is computed only once
+        self.assertEqual([1, 2, 3], computed)
+    def testNoWindowForCustomStrengths(self):
+        my_builder=MetamapProximityCooccurrenceGraphBuilder(
+                        link_strength=lambda x: 1.0)
+        graph=my_builder.create_graph(self.long_sentence(20))
+        self.assertEqual(20*19/2, len(graph.relationships))
+    def testAccumulatedEdgesMatchLinks(self):
+        links=MetamapProximityCooccurrenceGraphBuilder().create_graph(
+                    self.long_sentence(25))
+        edges=MetamapProximityCooccurrenceGraphBuilder(
+                    accumulate_edges=True).create_graph(
+                    self.long_sentence(25))
+        self.assertEqual(links.as_mapped_link_matrix(),
+                         edges.as_mapped_link_matrix())
+    def testInvalidLinkWindow(self):
+        self.assertRaises(ValueError, 
+                          MetamapProximityCooccurrenceGraphBuilder,
+                          link_window=0)
     
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
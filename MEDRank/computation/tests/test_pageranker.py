@@ -11,6 +11,9 @@ import unittest
 import sys
 sys.path.append('../')
 from pageranker import *
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
+from MEDRank.computation.ranker import (CONVERGENCE_MODES, GAUSS_SEIDEL,
+                                        EXTRAPOLATION, ADAPTIVE)
 
 # pylint: disable-msg=C0103,C0111,R0904        
 class rankerTests(unittest.TestCase):
@@ -55,6 +58,154 @@ class rankerTests(unittest.TestCase):
         empty_matrix=LinkMatrix(0)
         empty_e=[]
         self.assertRaises(ValueError, self.r.evaluate, empty_matrix, empty_e)
+    def testSparseMatrixGivesSameResults(self):
+        sparse=SparseLinkMatrix(len(self.m))
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                sparse[i, j]=self.m[i, j]
+        self.assertEqual(self.r.evaluate(sparse, self.e),
+                         self.r.evaluate(self.m, self.e))
+    @unittest.skipUnless(numpy_available, "NumPy 1.6+ is not installed")
+    def testVectorizedMatchesPythonLoop(self):
+        self.assert_(self.r._vectorizable())
+        vectorized=self.r.evaluate(self.m, self.e)
+        vectorized_iterations=self.r.stats._iterations
+        self.r.vectorize=False
+        looped=self.r.evaluate(self.m, self.e)
+        for x, y in zip(vectorized, looped):
+            self.assertAlmostEqual(x, y)
+        self.assertEqual(vectorized_iterations, self.r.stats._iterations)
+    def testCustomFormulaUsesPythonLoop(self):
+        class CountingRanker(PageRanker):
+            calls=0
+            def inner_formula(self, *args):
+                CountingRanker.calls+=1
+                return PageRanker.inner_formula(self, *args)
+        r=CountingRanker(epsilon=1e-30)
+        self.assertFalse(r._vectorizable())
+        r.evaluate(self.m, self.e)
+        self.assert_(CountingRanker.calls>0)
+    def testBatchMatchesIndividualRankings(self):
+        r=PageRanker(epsilon=1e-8)
+        other=LinkMatrix(3)
+        other[0, 1]=1
+        other[1, 2]=1
+        other[2, 1]=1
+        matrices=[self.m, LinkMatrix(4), other]
+        e_vectors=[self.e, [0.15]*4, [0.15]*3]
+        batch=r.evaluate_batch(matrices, e_vectors)
+        self.assertEqual(batch[1], None)
+        self.assertEqual(r.batch_stats[1], None)
+        for position in (0, 2):
+            individual=r.evaluate(matrices[position], e_vectors[position])
+            for x, y in zip(batch[position], individual):
+                self.assertAlmostEqual(x, y)
+            self.assertEqual(r.batch_stats[position]._iterations,
+                             r.stats._iterations)
+    def testWarmStart(self):
+        r=PageRanker(epsilon=1e-8)
+        cold=r.evaluate(self.m, self.e)
+        cold_iterations=r.stats.iterations
+        self.assertEqual(0, r.stats.warm_started_nodes)
+        warm=r.evaluate(self.m, self.e, r.latest_values)
+        for x, y in zip(cold, warm):
+            self.assertAlmostEqual(x, y)
+        self.assertEqual(5, r.stats.warm_started_nodes)
+        self.assert_(r.stats.iterations<cold_iterations)
+        self.assertEqual(cold_iterations-r.stats.iterations, 
+                         r.stats.iterations_saved)
+    def testIterationsSavedOnlyForTheSameMatrix(self):
+        r=PageRanker(epsilon=1e-8)
+        r.evaluate(self.m, self.e)
+        starting_values=r.latest_values
+        other=LinkMatrix(5)
+        other[0, 1]=1
+        other[1, 0]=1
+        r.evaluate(other, self.e)
+        # The latest cold start was on another matrix
+        r.evaluate(self.m, self.e, starting_values)
+        self.assertEqual(5, r.stats.warm_started_nodes)
+        self.assertEqual(None, r.stats.iterations_saved)
+    def testPartialWarmStart(self):
+        r=PageRanker(epsilon=1e-8)
+        cold=r.evaluate(self.m, self.e)
+        initial_values=r.latest_values[:]
+        initial_values[4]=None
+        warm=r.evaluate(self.m, self.e, initial_values)
+        for x, y in zip(cold, warm):
+            self.assertAlmostEqual(x, y)
+        self.assertEqual(4, r.stats.warm_started_nodes)
+    def testWarmStartWithWrongLength(self):
+        self.assertRaises(ValueError, self.r.evaluate, self.m, self.e, 
+                          [1.0, 1.0])
+    def testConvergenceModesAgree(self):
+        jacobi=PageRanker(epsilon=1e-10).evaluate(self.m, self.e)
+        for mode in CONVERGENCE_MODES:
+            for vectorize in (True, False):
+                r=PageRanker(epsilon=1e-10, convergence=mode)
+                r.vectorize=vectorize
+                for x, y in zip(jacobi, r.evaluate(self.m, self.e)):
+                    self.assertAlmostEqual(x, y)
+    def testResidualHistory(self):
+        self.r.evaluate(self.m, self.e)
+        residuals=self.r.stats.residuals
+        self.assertEqual(self.r.stats.iterations, len(residuals))
+        self.assertEqual(self.r.stats._accumulator, residuals[-1])
+    def testFasterConvergenceModes(self):
+        # A 60-node graph with a ring and some symmetrical shortcuts
+        m=LinkMatrix(60)
+        for i in xrange(60):
+            m[i, (i+1)%60]=1
+            m[i, (i*7+3)%60]=1
+            m[(i*7+3)%60, i]=1
+        e=[0.15]*60
+        r=PageRanker(epsilon=1e-10)
+        jacobi=r.evaluate(m, e)
+        jacobi_iterations=r.stats.iterations
+        for mode in (GAUSS_SEIDEL, EXTRAPOLATION):
+            r=PageRanker(epsilon=1e-10, convergence=mode)
+            for x, y in zip(jacobi, r.evaluate(m, e)):
+                self.assertAlmostEqual(x, y)
+            self.assert_(r.stats.iterations<jacobi_iterations/2)
+    def testModesThatCantBeVectorized(self):
+        for mode in (GAUSS_SEIDEL, ADAPTIVE):
+            r=PageRanker(convergence=mode)
+            self.assertFalse(r._vectorizable())
+            self.assertRaises(ValueError, r.iterate_vector, [1.0, 1.0],
+                              lambda x: x)
+    def testUnknownConvergenceMode(self):
+        self.assertRaises(ValueError, PageRanker, convergence='magic')
+    def _ranking(self, scores):
+        return sorted(xrange(len(scores)), key=lambda x: -scores[x])
+    def testTopKStopsEarly(self):
+        converged=PageRanker(epsilon=1e-10).evaluate(self.m, self.e)
+        for vectorize in (True, False):
+            r=PageRanker(epsilon=1e-10, top_k=2)
+            r.vectorize=vectorize
+            top=r.evaluate(self.m, self.e)
+            self.assert_(r.stats.stopped_early)
+            self.assert_(r.stats.iterations<147)
+            self.assertEqual(self._ranking(converged)[:2], 
+                             self._ranking(top)[:2])
+    def testTopCutoffStopsEarly(self):
+        converged=PageRanker(epsilon=1e-10).evaluate(self.m, self.e)
+        r=PageRanker(epsilon=1e-10, top_cutoff=0.9)
+        top=r.evaluate(self.m, self.e)
+        self.assert_(r.stats.stopped_early)
+        self.assertEqual([x for x in self._ranking(converged) 
+                          if converged[x]>=0.9],
+                         [x for x in self._ranking(top) if top[x]>=0.9])
+    def testTopRanksOfEveryNode(self):
+        r=PageRanker(epsilon=1e-10, top_k=5)
+        r.evaluate(self.m, self.e)
+        self.assert_(r.stats.stopped_early)
+        # Asking for nothing in particular gives the regular iteration
+        r=PageRanker(epsilon=1e-10)
+        r.evaluate(self.m, self.e)
+        self.failIf(r.stats.stopped_early)
+    def testInvalidTopRanks(self):
+        self.assertRaises(ValueError, PageRanker, top_k=0)
+        self.assertRaises(ValueError, PageRanker, top_cutoff=1.5)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
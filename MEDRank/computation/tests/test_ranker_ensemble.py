@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_ranker_ensemble.py
+"""
+
+import unittest
+from MEDRank.computation.ranker_ensemble import *
+from MEDRank.computation.mapped_link_matrix import MappedLinkMatrix
+from MEDRank.computation.pageranker import PageRanker
+from MEDRank.computation.textranker import TextRanker
+from MEDRank.computation.hits_combined_ranker import HITSCombinedRanker
+from MEDRank.computation.spreading_activation import SpreadingActivation
+
+# pylint: disable-msg=C0103,C0111,R0904
+class rankerEnsembleTests(unittest.TestCase):
+    def setUp(self):
+        """Same graph as the mapped_ranker tests
+            (0)-->(1)-->(2)-->(3)<--(4)
+             ↑            ╲__ ↗|
+             └─────────────────┘
+        """
+        self.m=MappedLinkMatrix(['term0', 'term1', 'term2', 'term3',
+                                 'term4'])
+        self.m[0, 1]=1
+        self.m[1, 2]=1
+        self.m[2, 3]=2
+        self.m[4, 3]=1
+        self.m[3, 0]=1
+        self.ensemble=RankerEnsemble([
+                        ('pagerank', PageRanker(epsilon=1e-10),
+                         uniform_e_vector(0.15)),
+                        ('textrank', TextRanker(epsilon=1e-10)),
+                        ('hits', HITSCombinedRanker(epsilon=1e-10))])
+    def testNames(self):
+        self.assertEqual(['pagerank', 'textrank', 'hits'],
+                         self.ensemble.names)
+        self.assertEqual(3, len(self.ensemble))
+    def testSameResultsAsSeparateRankers(self):
+        results=self.ensemble.evaluate(self.m)
+        self.assertEqual(self.ensemble.names, [x[0] for x in results])
+        expected=[MappedRanker(PageRanker(epsilon=1e-10)).evaluate(self.m,
+                                                        [0.15]*len(self.m)),
+                  MappedRanker(TextRanker(epsilon=1e-10)).evaluate(self.m),
+                  MappedRanker(HITSCombinedRanker(epsilon=1e-10)).evaluate(
+                                                                    self.m)]
+        for (name, ranked), expected_ranked in zip(results, expected):
+            self.assertEqual(list(expected_ranked), list(ranked))
+    def testMatrixIndexesAreShared(self):
+        self.ensemble.evaluate(self.m)
+        normalized=self.m.normalized()
+        self.ensemble.evaluate(self.m)
+        self.assertTrue(normalized is self.m.normalized())
+    def testFailingRankerDoesNotStopTheOthers(self):
+        ensemble=RankerEnsemble([
+                    ('silent', SpreadingActivation(), uniform_e_vector(0.0)),
+                    ('textrank', TextRanker())])
+        results=ensemble.evaluate(self.m)
+        self.assertEqual(None, results[0][1])
+        self.assertTrue(results[1][1] is not None)
+    def testStats(self):
+        self.ensemble.evaluate(self.m)
+        stats=self.ensemble.stats()
+        self.assertEqual(self.ensemble.names, [x[0] for x in stats])
+        self.assertTrue(all(x[1].iterations>0 for x in stats))
+    def testRepeatedNames(self):
+        self.assertRaises(ValueError, RankerEnsemble,
+                          [('a', TextRanker()), ('a', PageRanker())])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_sparse_link_matrix.py
+"""
+
+import unittest
+from MEDRank.computation.sparse_link_matrix import *
+from MEDRank.computation.sparse_mapped_link_matrix import \
+     SparseMappedLinkMatrix
+from MEDRank.computation.base_matrix import DOUBLE_PRECISION
+
+# pylint: disable-msg=C0103,C0111,R0904,W0212
+# Copied the LinkMatrix tests, as this class must pass them too
+class sparse_link_matrixTests(unittest.TestCase):
+    def setUp(self):
+        self.my_matrix=SparseLinkMatrix(5) # Create a 5x5 link_matrix
+    def testDimensions(self):
+        self.assertEquals(len(self.my_matrix), 5)
+        self.assertRaises(IndexError, self.my_matrix.__getitem__, (5, 0))
+        self.assertRaises(IndexError, self.my_matrix.__getitem__, (0, 5))
+    def testInitializedWithZeros(self):
+        for i in xrange(len(self.my_matrix)):
+            for j in xrange(len(self.my_matrix)):
+                self.assertEquals(self.my_matrix[i, j], 0.0)
+    def fill_in_matrix(self):
+        """Creates the following links:
+            0    1--->2--->3    4
+            │                   ↻
+            └──────────────────↗"""
+        self.my_matrix[1, 2]=3
+        self.my_matrix[4, 4]=4
+        self.my_matrix[0, 4]=1
+        self.my_matrix[2, 3]=2
+    def testFilling(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix[1, 2], 3)
+        self.assertEquals(self.my_matrix[4, 4], 4)
+        self.assertEquals(self.my_matrix[0, 4], 1)
+        self.assertEquals(self.my_matrix[2, 3], 2)
+    def testNormalization(self):
+        self.fill_in_matrix()
+        norm=self.my_matrix.normalize()
+        self.assertEquals(norm[1, 2], 0.75)
+        self.assertEquals(norm[4, 4], 1)
+        self.assertEquals(norm[0, 4], 0.25)
+        self.assertEquals(norm[2, 3], 0.5)
+    def testRowSum(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.rowsum(0), 1)
+        self.assertEquals(self.my_matrix.rowsum(1), 3)
+        self.assertEquals(self.my_matrix.rowsum(2), 2)
+        self.assertEquals(self.my_matrix.rowsum(3), 0)
+        self.assertEquals(self.my_matrix.rowsum(4), 4)
+    def testColSum(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.colsum(0), 0)
+        self.assertEquals(self.my_matrix.colsum(1), 0)
+        self.assertEquals(self.my_matrix.colsum(2), 3)
+        self.assertEquals(self.my_matrix.colsum(3), 2)
+        self.assertEquals(self.my_matrix.colsum(4), 5)
+    def testMax(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.max(), 4)
+        norm=self.my_matrix.normalize()
+        self.assertEquals(norm.max(), 1)
+    def testColNonZero(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.col_nonzero(0), 0)
+        self.assertEquals(self.my_matrix.col_nonzero(1), 0)
+        self.assertEquals(self.my_matrix.col_nonzero(2), 1)
+        self.assertEquals(self.my_matrix.col_nonzero(3), 1)
+        self.assertEquals(self.my_matrix.col_nonzero(4), 2)
+    def testRowNonZero(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.row_nonzero(0), 1)
+        self.assertEquals(self.my_matrix.row_nonzero(1), 1)
+        self.assertEquals(self.my_matrix.row_nonzero(2), 1)
+        self.assertEquals(self.my_matrix.row_nonzero(3), 0)
+        self.assertEquals(self.my_matrix.row_nonzero(4), 1)
+    def testNeighbors(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.neighbors(0), [4])
+        self.assertEquals(self.my_matrix.neighbors(1), [2])
+        self.assertEquals(self.my_matrix.neighbors(2), [3])
+        self.assertEquals(self.my_matrix.neighbors(3), [])
+        self.assertEquals(self.my_matrix.neighbors(4), [4])
+    def testAllNeighbors(self):
+        self.fill_in_matrix()
+        self.my_matrix[0, 2]=1
+        self.assertEquals(self.my_matrix.all_neighbors(),
+                          [[2, 4], [2], [3], [], [4]])
+    def testTranspose(self):
+        self.fill_in_matrix()
+        t=self.my_matrix.transpose()
+        self.assertEquals(t[2, 1], 3)
+        self.assertEquals(t[4, 4], 4)
+        self.assertEquals(t[4, 0], 1)
+        self.assertEquals(t[3, 2], 2)
+    def testTransposedNeighborhood(self):
+        self.fill_in_matrix()    
+        t=self.my_matrix.transpose()
+        self.assertEquals(t.all_neighbors(), [[], [], [1], [2], [0, 4]])
+    def testCachedIndexes(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.out_neighbors(),
+                          [[4], [2], [3], [], [4]])
+        self.assertEquals(self.my_matrix.in_neighbors(),
+                          [[], [], [1], [2], [0, 4]])
+        self.assertEquals(self.my_matrix.out_degree(), [1, 1, 1, 0, 1])
+        self.assertEquals(self.my_matrix.row_sums(), [1, 3, 2, 0, 4])
+        self.assert_(self.my_matrix.in_neighbors() is 
+                     self.my_matrix.in_neighbors())
+    def testCachedIndexesInvalidated(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.max(), 4)
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [])
+        self.my_matrix[3, 1]=7
+        self.assertEquals(self.my_matrix.max(), 7)
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [3])
+        self.assertEquals(self.my_matrix.out_degree()[3], 1)
+        self.my_matrix.set_row(3, [0, 0, 0, 0, 0])
+        self.assertEquals(self.my_matrix.in_neighbors()[1], [])
+        self.assertEquals(self.my_matrix.row_sums()[3], 0)
+    def testInPlaceOperationsInvalidateIndexes(self):
+        self.fill_in_matrix()
+        expected=self.my_matrix.transpose()
+        self.assertEquals(self.my_matrix.in_neighbors()[4], [0, 4])
+        self.my_matrix.transpose_in_place()
+        self.assertEquals(self.my_matrix.in_neighbors()[4], [4])
+        self.assertEquals(expected, self.my_matrix)
+        self.my_matrix.normalize_in_place()
+        self.assertEquals(self.my_matrix.max(), 1.0)
+        self.assertEquals(self.my_matrix[3, 2], 0.5)
+    def testNoDenseStorage(self):
+        self.assertRaises(TypeError, self.my_matrix.as_ctypes)
+        self.assertRaises(TypeError, self.my_matrix.as_numpy)
+        self.assertRaises(TypeError, self.my_matrix._row_slice, 0)
+        self.assertRaises(TypeError, self.my_matrix._column_slice, 0)
+    def testTypecode(self):
+        self.assertEquals(DOUBLE_PRECISION, self.my_matrix.typecode)
+        self.assertEquals(DOUBLE_PRECISION, 
+                          SparseMappedLinkMatrix(['a', 'b']).typecode)
+    def testFillFromCMatrix(self):
+        self.fill_in_matrix()
+        other=SparseLinkMatrix(5)
+        other.fill_from_c_matrix(self.my_matrix.as_binary_c_matrix())
+        self.assertEquals(4, other.nonzero_count())
+        self.assertEquals(other.neighbors(1), [2])
+    def testLinks(self):
+        self.fill_in_matrix()
+        self.my_matrix[3, 0]=-1
+        self.assertEquals(self.my_matrix.links(),
+                          [(0, 4), (1, 2), (2, 3), (3, 0), (4, 4)])
+    def testBinaryCMatrix(self):
+        self.fill_in_matrix()
+        cmat=self.my_matrix.as_binary_c_matrix()
+        self.assertEquals([cmat[x] for x in (7, 4, 24, 13, 10)],
+                          [1, 1, 1, 1, 0])
+        tcmat=self.my_matrix.as_binary_c_matrix(transposed=True)
+        self.assertEquals([tcmat[x] for x in (11, 20, 24, 17, 7)],
+                          [1, 1, 1, 1, 0])
+    def testOnlyStoresLinks(self):
+        self.fill_in_matrix()
+        self.assertEquals(self.my_matrix.nonzero_count(), 4)
+        self.my_matrix[1, 2]=0
+        self.assertEquals(self.my_matrix.nonzero_count(), 3)
+        self.assertEquals(self.my_matrix[1, 2], 0)
+        self.assertEquals(self.my_matrix.neighbors(1), [])
+    def testSameAsDense(self):
+        self.fill_in_matrix()
+        dense=LinkMatrix(5)
+        for i, j, value in self.my_matrix.iter_nonzero():
+            dense[i, j]=value
+        self.assertEquals(self.my_matrix, dense)
+        self.assertEquals(self.my_matrix.transpose(), dense.transpose())
+        self.assertEquals(self.my_matrix.normalize(), dense.normalize())
+        self.assertEquals([self.my_matrix.get_row(x) for x in xrange(5)],
+                          [dense.get_row(x) for x in xrange(5)])
+    def testCompressedColumns(self):
+        self.fill_in_matrix()
+        col_ptr, row_idx, values=self.my_matrix.csc()
+        self.assertEquals(list(col_ptr), [0, 0, 0, 1, 2, 4])
+        self.assertEquals(list(row_idx), [1, 2, 0, 4])
+        self.assertEquals(list(values), [3.0, 2.0, 1.0, 4.0])
+    def testNormalizingEmptyMatrix(self):
+        self.assertRaises(ZeroDivisionError, self.my_matrix.normalize)
+    def testSetRow(self):
+        self.fill_in_matrix()
+        self.my_matrix.set_row(1, [0, 0, 0, 5, 0])
+        self.assertEquals(self.my_matrix.neighbors(1), [3])
+        self.assertEquals(self.my_matrix.colsum(3), 7)
+        self.assertEquals(self.my_matrix.colsum(2), 0)
+        
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -9,6 +9,8 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 
 import unittest
 from MEDRank.computation.textranker import *
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
+from MEDRank.computation.ranker import CONVERGENCE_MODES
 
 # pylint: disable-msg=C0103,C0111,R0904        
 class textrankerTests(unittest.TestCase):
@@ -42,6 +44,42 @@ class textrankerTests(unittest.TestCase):
         self.assert_(pr[2]>pr[4])
         self.assert_(type(self.r.stats) is RankerStats)
         #print self.r.stats
+    def testSparseMatrixGivesSameResults(self):
+        sparse=SparseLinkMatrix(len(self.m))
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                sparse[i, j]=self.m[i, j]
+        self.assertEqual(self.r.evaluate(sparse), self.r.evaluate(self.m))
+    @unittest.skipUnless(numpy_available, "NumPy 1.6+ is not installed")
+    def testVectorizedMatchesPythonLoop(self):
+        r=TextRanker(epsilon=1e-10)
+        self.assert_(r._vectorizable())
+        vectorized=r.evaluate(self.m)
+        vectorized_iterations=r.stats.iterations
+        r.vectorize=False
+        looped=r.evaluate(self.m)
+        for x, y in zip(vectorized, looped):
+            self.assertAlmostEqual(x, y)
+        self.assertEqual(vectorized_iterations, r.stats.iterations)
+    def testCustomFormulaUsesPythonLoop(self):
+        class CountingRanker(TextRanker):
+            calls=0
+            def inner_formula(self, *args):
+                CountingRanker.calls+=1
+                return TextRanker.inner_formula(self, *args)
+        r=CountingRanker(epsilon=1e-10)
+        self.assertFalse(r._vectorizable())
+        looped=TextRanker(epsilon=1e-10)
+        looped.vectorize=False
+        self.assertEqual(r.evaluate(self.m), looped.evaluate(self.m))
+        self.assert_(CountingRanker.calls>0)
+    def testConvergenceModesAgree(self):
+        jacobi=TextRanker(epsilon=1e-10).evaluate(self.m)
+        for mode in CONVERGENCE_MODES:
+            r=TextRanker(epsilon=1e-10, convergence=mode)
+            for x, y in zip(jacobi, r.evaluate(self.m)):
+                self.assertAlmostEqual(x, y)
+            self.assertEqual(r.stats.iterations, len(r.stats.residuals))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -9,10 +9,12 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 
 import unittest
 from MEDRank.computation.weighted_pageranker import *
+from MEDRank.computation.pageranker import numpy_available
 
 # This class should pass the same tests as the PageRanker class
 # so they are copied mercilessly from there :)
 from MEDRank.computation.link_matrix import LinkMatrix
+from MEDRank.computation.sparse_link_matrix import SparseLinkMatrix
 # pylint: disable-msg=C0103,C0111,R0904
 class rankerTests(unittest.TestCase):
     def setUp(self):
@@ -52,6 +54,33 @@ class rankerTests(unittest.TestCase):
         self.assert_(pr[1]>pr[2])
         self.assert_(pr[2]>pr[4])
         #print self.r.get_stats()
+    def testSparseMatrixGivesSameResults(self):
+        sparse=SparseLinkMatrix(len(self.m))
+        for i in xrange(len(self.m)):
+            for j in xrange(len(self.m)):
+                sparse[i, j]=self.m[i, j]
+        self.assertEqual(self.r.evaluate(sparse, self.e),
+                         self.r.evaluate(self.m, self.e))
+    @unittest.skipUnless(numpy_available, "NumPy 1.6+ is not installed")
+    def testVectorizedMatchesPythonLoop(self):
+        self.assert_(self.r._vectorizable())
+        vectorized=self.r.evaluate(self.m, self.e)
+        vectorized_iterations=self.r.stats._iterations
+        self.r.vectorize=False
+        looped=self.r.evaluate(self.m, self.e)
+        for x, y in zip(vectorized, looped):
+            self.assertAlmostEqual(x, y)
+        self.assertEqual(vectorized_iterations, self.r.stats._iterations)
+    def testCustomFormulaUsesPythonLoop(self):
+        class CountingRanker(WeightedPageRanker):
+            calls=0
+            def inner_formula(self, *args):
+                CountingRanker.calls+=1
+                return WeightedPageRanker.inner_formula(self, *args)
+        r=CountingRanker(epsilon=1e-30)
+        self.assertFalse(r._vectorizable())
+        r.evaluate(self.m, self.e)
+        self.assert_(CountingRanker.calls>0)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -11,70 +11,128 @@ Copyright (c) 2008 University of Texas - Houston. All rights reserved.
 
 import time
 from MEDRank.utility.logger import logging, ULTRADEBUG
-from MEDRank.computation.ranker import (Ranker, RankerStats)
+from MEDRank.computation.ranker import (Ranker, RankerStats, GAUSS_SEIDEL,
+                                        ADAPTIVE, numpy_available)
 from MEDRank.computation.link_matrix import LinkMatrix
+if numpy_available:
+    import numpy
 
 class TextRanker(Ranker):
-    """Perform Rada Mihalcea's TextRank computation on a link matrix"""
+    """Perform Rada Mihalcea's TextRank computation on a link matrix.
+    
+    The weight of every edge is computed once, before iterating. If NumPy is
+    available, inner_formula hasn't been overridden and the convergence mode
+    isn't GAUSS_SEIDEL or ADAPTIVE, each iteration is then a single vector
+    operation over those weights; otherwise it's a Python loop over them.
+    Set vectorize to False to force the loop."""
+    vectorize=True
     def inner_formula(self, matrix_value, previous_textrank, this_textrank,
                       weights_neighbors):
         """The inner part of the loop - override for custom TextRankers"""
         return this_textrank+(matrix_value/weights_neighbors)*\
             previous_textrank
-    def evaluate(self, linkmatrix, e_vector=None):
-        """Perform an iterative computation of TextRank"""
+    def _vectorizable(self):
+        """Can this ranker use _vectorized_iteration? Only if it uses the
+        standard inner formula."""
+        return numpy_available and self.vectorize and \
+               self._convergence not in (GAUSS_SEIDEL, ADAPTIVE) and \
+               self.inner_formula.im_func is \
+               TextRanker.__dict__['inner_formula']
+    def evaluate(self, linkmatrix, e_vector=None, initial_values=None):
+        """Perform an iterative computation of TextRank. Nodes start with a
+        TextRank of 1.0, unless initial_values (a list parallel to the 
+        matrix) has a value other than None for them."""
         logging.log(ULTRADEBUG, "Setting up to compute TextRank on %r", linkmatrix)
         # Sanity check
         if len(linkmatrix)==0:
             raise ValueError("Attempting to PageRank an empty link matrix.")
         start=time.clock()
-        logging.log(ULTRADEBUG, "Normalizing the link matrix.")
-        # Perform actual computations on a normalized matrix
-        try:
-            normatrix=linkmatrix.normalize()
-        except ZeroDivisionError:
+        # Perform actual computations on normalized values. We only need 
+        # them for the links, so there's no need to build a whole normalized
+        # matrix.
+        my_max=float(linkmatrix.max())
+        if my_max==0.0:
             raise ZeroDivisionError("Aberrant matrix: There are no links.")
         # Precompute the neighborhood of each node
         logging.log(ULTRADEBUG, "Computing all neighborhoods.")
-        neighborhood=linkmatrix.all_neighbors()
+        neighborhood=linkmatrix.out_neighbors()
         logging.log(ULTRADEBUG, "Computing the weight of each neighborhood.")
         neighborhood_weights=[0.0]*len(linkmatrix)
         for i in xrange(len(linkmatrix)):
             this_neighbor=0.0
             for j in neighborhood[i]:
-                this_neighbor+=normatrix[i, j]
+                this_neighbor+=linkmatrix[i, j]/my_max
             neighborhood_weights[i]=this_neighbor
+        # Every node i receives TextRank from each j in its neighborhood, 
+        # through the (normalized) j->i link
+        logging.log(ULTRADEBUG, "Computing the weight of each edge.")
+        edges=[(i, j, linkmatrix[j, i]/my_max) 
+               for i in xrange(len(linkmatrix)) for j in neighborhood[i]]
         
         logging.log(ULTRADEBUG, "Weight computation done - iterating.")
-        # Set up the iteration variables
-        accumulator=2*self._e
-        iterations=0
-        textrank=[1.0]*len(linkmatrix)
-        start_iter=time.clock() # Benchmarking
-        while (accumulator>self._e):
-            if iterations>self._max_iter:
-                logging.log(ULTRADEBUG, "Reached the iteration limit of %d. Ending the "
-                "TextRank computation prematurely.", self._max_iter)
-                break
-            accumulator=0.0
-            new_textrank=textrank[:]
-            for i in xrange(len(normatrix)):
-                this_textrank=0.0
-                for j in neighborhood[i]:
-                    this_textrank=self.inner_formula(normatrix[j, i],
-                                                     textrank[j],
-                                                     this_textrank,
-                                                     neighborhood_weights[j])
-                new_textrank[i]=1-self._d+self._d*this_textrank
-                accumulator+=abs(new_textrank[i]-textrank[i])
-            iterations+=1
-            textrank=new_textrank
+        (textrank, warm_started_nodes)=self.starting_values(
+                                [1.0]*len(linkmatrix), initial_values)
+        if self._vectorizable():
+            iterate=self._vectorized_iteration
+        else:
+            iterate=self._python_iteration
+        (textrank, iterations, accumulator, start_iter, residuals)=\
+            iterate(len(linkmatrix), edges, neighborhood_weights, textrank)
         logging.log(ULTRADEBUG, "Iteration done.")
         finished_iter=time.clock()
-        self._latest_stats=RankerStats(iterations, accumulator, start,
-                                        start_iter, finished_iter)
+        self._latest_stats=self.make_stats(iterations, accumulator, start,
+                                           start_iter, finished_iter,
+                                           warm_started_nodes, residuals,
+                                           linkmatrix)
+        self._latest_values=textrank
         highest=max(textrank)
         if highest==0.0:
             raise ValueError("TextRank returned all zeros!")
         return [x/highest for x in textrank]
-        
+    def _python_iteration(self, matrix_size, edges, neighborhood_weights,
+                          textrank):
+        """Iterates TextRank one node and one edge at a time, calling
+        inner_formula for each edge. Returns the TextRank values, the number
+        of iterations, the final accumulator, the time at which the 
+        iterations started, and the accumulator after each iteration."""
+        # Group the edges by the node that receives the TextRank
+        incoming=[[] for i in xrange(matrix_size)]
+        for i, j, matrix_value in edges:
+            incoming[i].append((j, matrix_value, neighborhood_weights[j]))
+        def update_node(i, textrank):
+            """The new TextRank of node i."""
+            this_textrank=0.0
+            for j, matrix_value, weight in incoming[i]:
+                this_textrank=self.inner_formula(matrix_value,
+                                                 textrank[j],
+                                                 this_textrank,
+                                                 weight)
+            return 1-self._d+self._d*this_textrank
+        start_iter=time.clock() # Benchmarking
+        (textrank, iterations, accumulator, residuals)=\
+            self.iterate_nodes(textrank, update_node)
+        return (textrank, iterations, accumulator, start_iter, residuals)
+    def _vectorized_iteration(self, matrix_size, edges, neighborhood_weights,
+                              textrank):
+        """Iterates TextRank with NumPy. The edges become three flat arrays
+        (receiving node, giving node, transition weight), so an iteration is
+        a gather, a multiplication, and a scatter-add (bincount). 
+        Convergence is decided exactly as in _python_iteration."""
+        targets=numpy.fromiter((x[0] for x in edges), dtype=numpy.intp,
+                               count=len(edges))
+        sources=numpy.fromiter((x[1] for x in edges), dtype=numpy.intp,
+                               count=len(edges))
+        # The division happens here, once, instead of once per iteration
+        transitions=numpy.fromiter((matrix_value/neighborhood_weights[j]
+                                    for (i, j, matrix_value) in edges),
+                                   dtype=numpy.float64, count=len(edges))
+        def update_all(textrank):
+            """The new TextRank of every node."""
+            incoming=numpy.bincount(targets, 
+                                    weights=transitions*textrank[sources],
+                                    minlength=matrix_size)
+            return 1-self._d+self._d*incoming
+        start_iter=time.clock() # Benchmarking
+        (textrank, iterations, accumulator, residuals)=\
+            self.iterate_vector(textrank, update_all)
+        return (textrank, iterations, accumulator, start_iter, residuals)
@@ -13,6 +13,7 @@ class WeightedPageRanker(PageRanker):
     """Computes pagerank but takes into account the weight of the links
     between nodes, by using the matrix's value at i,j as a factor in the 
     computation."""
+    _vector_formula_weighted=True
     def inner_formula(self, matrix_value, previous_pagerank, this_pagerank,
                       num_outgoing_links):
         """The inner part of the loop - override it for different versions
@@ -8,4 +8,4 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
 __all__=['chunkmap', 'disk_backed_dict', 'metamap', 'mti', 'nlm_output', 
-         'semrep', 'text', 'mrrel']
\ No newline at end of file
+         'semrep', 'text', 'mrrel', 'article_index']
\ No newline at end of file
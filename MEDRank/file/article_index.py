@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+article_index.py
+
+An ArticleIndex records where the lines of each article are in an NLM output
+file (SEMREP, METAMAP, METAMAP machine output...), as the byte offset and
+length of each contiguous block of lines. With it, a ChunkedNLMOutput can
+seek directly to the articles it's asked for instead of reading the whole
+file, which makes it possible to rerun a subset of the articles, to resume
+an interrupted job, or to split a file among several processes.
+
+Indexes are built by ChunkedNLMOutput.build_article_index, and are stored
+next to the output file they describe (see index_filename) as text files
+with one "pmid<TAB>offset<TAB>length" line per block; 
+ChunkedNLMOutput.load_article_index reads them from there.
+"""
+
+from MEDRank.utility.logger import logging
+from MEDRank.file.text import Text
+from MEDRank.pubmed.pmid import Pmid
+
+# Disable warnings about spaces before operators (they drive me crazy)
+# pylint: disable-msg=C0322
+
+INDEX_EXTENSION='.index'
+
+def index_filename(output_filename):
+    """Returns the name of the sidecar file that holds the index of an
+    output file."""
+    return output_filename+INDEX_EXTENSION
+
+def pmid_number(pmid):
+    """Returns the number of a PubMed ID, whether it's a Pmid or
+    something int() understands."""
+    if isinstance(pmid, Pmid):
+        return pmid.pmid
+    return int(pmid)
+
+class ArticleIndex(object):
+    """Maps the PubMed ID of each article in an output file to the (offset,
+    length) of the blocks of lines that belong to it. Articles usually have a
+    single block, but nothing in the output files guarantees it."""
+    def __init__(self):
+        self._blocks={}
+        self._pmids=[]
+    def __len__(self):
+        return len(self._pmids)
+    def __contains__(self, pmid):
+        return pmid_number(pmid) in self._blocks
+    def __repr__(self):
+        return "<%s of %d articles>" % (self.__class__.__name__, len(self))
+    def add(self, pmid, offset, length):
+        """Records a block of lines of an article."""
+        number=pmid_number(pmid)
+        if number not in self._blocks:
+            self._blocks[number]=[]
+            self._pmids.append(number)
+        self._blocks[number].append((offset, length))
+    def blocks(self, pmid):
+        """Returns the list of (offset, length) tuples of the blocks of an
+        article. Raises KeyError if it isn't in the index."""
+        return self._blocks[pmid_number(pmid)][:]
+    def pmids_fget(self):
+        """Getter for the pmids property: the Pmids of the indexed articles,
+        in the order in which they first appear in the file. Slicing it is a
+        simple way to split the work among several processes."""
+        return [Pmid(x) for x in self._pmids]
+    pmids=property(pmids_fget)
+    def blocks_for(self, pmids):
+        """Returns the blocks of every article in pmids in file order, so
+        they can be read with forward seeks. Articles that aren't in the
+        index are logged and left out."""
+        selected=[]
+        for pmid in set(pmid_number(x) for x in pmids):
+            if pmid in self._blocks:
+                selected.extend(self._blocks[pmid])
+            else:
+                logging.warn("Article %d isn't in the index. Skipping it.",
+                             pmid)
+        selected.sort()
+        return selected
+    def save(self, fileobject):
+        """Writes the index to a file object."""
+        fileobject.write("# MEDRank article index: pmid, offset, length\n")
+        for pmid in self._pmids:
+            for offset, length in self._blocks[pmid]:
+                fileobject.write("%d\t%d\t%d\n" % (pmid, offset, length))
+    @staticmethod
+    def load(fileobject):
+        """Reads an index written by save from a file object."""
+        index=ArticleIndex()
+        for line in Text(fileobject):
+            try:
+                pmid, offset, length=[int(x) for x in line.split('\t')]
+            except ValueError:
+                raise ValueError("%r is not a valid article index line." %
+                                 line)
+            index.add(pmid, offset, length)
+        return index
@@ -14,6 +14,7 @@ Created by Jorge Herskovic on 2008-05-13.
 Copyright (c) 2008 University of Texas - Houston. All rights reserved.
 """
 
+from operator import attrgetter
 from MEDRank.utility.logger import logging, ULTRADEBUG
 from MEDRank.file.nlm_output import (Line, ChunkedNLMOutput,
                                      CUINotFoundError, ParsingError,
@@ -30,45 +31,39 @@ DEFAULT_LINES_TO_IGNORE=["<<<<< MMI", ">>>>> MMI", "*** ERROR ***"]
 
 
 class MetamapLine(Line):
-    """Represents a single line of METAMAP output"""
-    __slots__=['_cui', '_description', '_source', '_location', '_semtype']
+    """Represents a single line of METAMAP output. The description, semantic
+    type and source are read from split_line when they're asked for."""
+    __slots__=['_cui', '_location']
     def __init__(self, original_line):
         Line.__init__(self, original_line, id_position=0)
-        # Unnecessary - done in the Line constructor
-        #line_breakup=self._line.split(self.split_char) 
+        line_breakup=self.split_line
         try:
-            self._cui=self.split_line[4]
+            self._cui=line_breakup[4]
         except IndexError:
             raise CUINotFoundError("There was no CUI in the line '%s'" % 
                                    self._line)
         if self._cui=='':
             raise CUINotFoundError("There was no CUI in the line '%s'" % 
                                    self._line)
-        try:
-            self._description=self.split_line[3]
-            self._source=self.split_line[6]
-            self._semtype=self.split_line[5]
-        except IndexError:
+        # The description, semantic type and source are fields 3, 5 and 6
+        if len(line_breakup)<7:
             raise ParsingError("Data missing from line '%s'" % self._line)
         # Some entities have no stated confidence. We use 0 in such cases,
         # so they can be eliminated from the workflow later.
         try:
-            self.confidence=float(self.split_line[2])/1000.0
+            self.confidence=float(line_breakup[2])/1000.0
         except ValueError:
             raise NoConfidenceError("Could not parse a confidence value in "
                                     "line '%s'" % self._line)
         try:
-            locations=self.split_line[8].split(',')
-        except:
+            locations=line_breakup[8].split(',')
+        except IndexError:
             logging.debug("Could not find a location in line %s", self._line)
             locations=[""]
-        locations=[x.split(':') for x in locations]
-        locations.sort()
         # Use the first appearance of a term as its location
-        self._location=locations[0]
-        logging.log(ULTRADEBUG, "Created a MetamapLine @ %d: %s (%s) %1.3f", 
-                      self.line_id, self._cui,
-                      self._description, self.confidence)
+        self._location=min(x.split(':') for x in locations)
+        logging.log(ULTRADEBUG, "Created a MetamapLine @ %d: %s %1.3f", 
+                      self.line_id, self._cui, self.confidence)
     # The CUI property.
     def cui_fget(self):
         "Getter for the CUI property"
@@ -77,19 +72,19 @@ class MetamapLine(Line):
     # The description property.
     def description_fget(self):
         "Getter for the description property"
-        return self._description 
+        return self.split_line[3]
     description=property(description_fget)
     # The source property.
     def source_fget(self):
         "Getter for the source property"
-        return self._source
+        return self.split_line[6]
     source=property(source_fget)
     def location_fget(self):
         "Getter for the location property"
         return self._location
     location=property(location_fget)
     def semantic_type_fget(self):
-        return self._semtype
+        return self.split_line[5]
     semantic_type=property(semantic_type_fget)
 
 class MetamapLineList(LineList):
@@ -100,7 +95,9 @@ class MetamapLineList(LineList):
     def sorter(x, y): return cmp(x.location, y.location)
     def __init__(self, set_id, lines):
         LineList.__init__(self, set_id, lines)
-        self._lines.sort(cmp=MetamapLineList.sorter)
+        # Sorting by key reads each location once, instead of twice per
+        # comparison
+        self._lines.sort(key=attrgetter('location'))
         
 # Creating graphs should be the responsibility of other classes
 # NOT of the input parsers, so if this parser only creates entities,
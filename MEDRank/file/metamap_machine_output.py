@@ -14,7 +14,10 @@ remembers the last seen ID and returns that for lines that don't have one.
 NOTE: THIS MEANS THAT THESE CLASSES ARE NOT THREAD-SAFE!
 
 Requires pyparsing, in order to parse the (*&#&%^$™@) output lines properly.
-Regular expressions just don't cut it.
+Regular expressions just don't cut it. The mappings lines, which are the slow
+ones, are parsed by a hand-written Prolog term parser by default; the 
+pyparsing grammar is the fallback for the lines it can't handle, and can be
+used to validate it (see MappingLine.mappings_parser).
 
 Created by Jorge Herskovic on 2008-05-13.
 Copyright (c) 2008 University of Texas - Houston. All rights reserved.
@@ -27,7 +30,8 @@ from MEDRank.file.nlm_output import (ChunkedNLMOutput,
                                      CUINotFoundError, ParsingError,
                                      NoConfidenceError,
                                      NoLineIDError,
-                                     LineList)
+                                     LineList,
+                                     LineDispatcher)
 from pyparsing import *
 
 # These lines are known to be useless to the parser. We have gathered them 
@@ -115,6 +119,136 @@ map_expressions=Suppress("[") + Group(Optional(map_expression) + \
                 ZeroOrMore(Suppress(",") + map_expression)) + Suppress("]")
 mappings=Suppress("mappings(") + map_expressions + Suppress(").")
 
+# The hand-written parser. It reads the whole mappings line as a generic
+# Prolog term in one pass: compound terms become (functor, [arguments])
+# tuples, lists become lists, and atoms and numbers stay as strings. Quoted
+# atoms lose their outer quotes but keep their doubled inner quotes, just 
+# like the pyparsing grammar above does.
+prolog_token=re.compile(r"""'(?:[^']|'')*'         # Quoted atom
+                           |[^\s,\[\]()']+\(         # Functor
+                           |[^\s,\[\]()']+            # Atom or number
+                           |[\[\](),]                 # Punctuation
+                        """, re.VERBOSE)
+
+def tokenize_prolog_term(text):
+    """Breaks a Prolog term into a list of tokens. Raises ParsingError if
+    there's something that can't be a token in it."""
+    tokens=prolog_token.findall(text)
+    # findall skips whatever it can't match. If there's no whitespace 
+    # between the tokens (METAMAP doesn't write any) and nothing was 
+    # skipped, the tokens add up to the whole text.
+    if len(''.join(tokens))==len(text):
+        return tokens
+    # Otherwise, go through the text one token at a time to find out.
+    tokens=[]
+    position=0
+    text_length=len(text)
+    match_token=prolog_token.match
+    while position<text_length:
+        if text[position].isspace():
+            position+=1
+            continue
+        token=match_token(text, position)
+        if token is None:
+            raise ParsingError("Unexpected input at %d in %r" % (position, 
+                                                                 text))
+        tokens.append(token.group())
+        position=token.end()
+    return tokens
+
+def parse_prolog_term(tokens, position=0):
+    """Parses the term that starts at tokens[position]. Returns the term and
+    the position of the token that follows it."""
+    # The compound terms and lists that are still open, innermost last, as 
+    # (term, its argument list, its closing token) tuples
+    open_terms=[]
+    token_count=len(tokens)
+    while True:
+        if position>=token_count:
+            raise ParsingError("The term ends prematurely.")
+        token=tokens[position]
+        position+=1
+        if token=='[':
+            term=arguments=[]
+            closing=']'
+        elif token in (']', '(', ')', ','):
+            raise ParsingError("Unexpected %r in the term." % token)
+        elif token[-1]=='(':
+            arguments=[]
+            term=(token[:-1], arguments)
+            closing=')'
+        elif token[0]=="'":
+            term=token[1:-1]
+            closing=None
+        else:
+            term=token
+            closing=None
+        if closing is not None:
+            if position<token_count and tokens[position]==closing:
+                position+=1
+            else:
+                open_terms.append((term, arguments, closing))
+                continue
+        # term is complete. Add it to the term that contains it, and close
+        # that one too if this was its last argument.
+        while open_terms:
+            (container, arguments, closing)=open_terms[-1]
+            arguments.append(term)
+            if position>=token_count:
+                raise ParsingError("The term ends prematurely.")
+            token=tokens[position]
+            position+=1
+            if token==',':
+                break
+            if token!=closing:
+                raise ParsingError("Expected ',' or %r, found %r." % 
+                                   (closing, token))
+            open_terms.pop()
+            term=container
+        else:
+            return (term, position)
+
+def parse_mappings(text):
+    """Parses a (lowercased) mappings line with the hand-written parser.
+    Returns a list of (map score, [EV argument list, ...]) tuples, with the
+    scores without their sign, as strings, like the pyparsing grammar 
+    returns them."""
+    tokens=tokenize_prolog_term(text)
+    (term, position)=parse_prolog_term(tokens)
+    if tokens[position:]!=['.'] or type(term) is not tuple or \
+       term[0]!='mappings' or len(term[1])!=1 or type(term[1][0]) is not list:
+        raise ParsingError("%r is not a mappings term." % text)
+    result=[]
+    for a_map in term[1][0]:
+        if type(a_map) is not tuple or a_map[0]!='map' or \
+           len(a_map[1])!=2:
+            raise ParsingError("%r is not a map term." % (a_map,))
+        (map_score, evs)=a_map[1]
+        if type(evs) is not list:
+            raise ParsingError("%r is not a list of EVs." % (evs,))
+        for ev_term in evs:
+            if type(ev_term) is not tuple or ev_term[0]!='ev' or \
+               len(ev_term[1])<3:
+                raise ParsingError("%r is not an EV term." % (ev_term,))
+        result.append((unsigned_number(map_score), 
+                       [x[1] for x in evs]))
+    return result
+
+def unsigned_number(text):
+    """Checks that text is a number and drops its sign, if any."""
+    if type(text) is not str:
+        raise ParsingError("%r is not a number." % (text,))
+    if text[0]=='-':
+        text=text[1:]
+    if not text.isdigit():
+        raise ParsingError("%r is not a number." % text)
+    return text
+
+# Choices for MappingLine.mappings_parser
+FAST_MAPPINGS_PARSER='fast'
+PYPARSING_MAPPINGS_PARSER='pyparsing'
+VALIDATING_MAPPINGS_PARSER='validating'
+
 class WrongTypeOfLineError(ParsingError):
     """Represents that the line passed to the line parser is of the wrong type
     """
@@ -124,11 +258,11 @@ class WrongTypeOfLineError(ParsingError):
 # create another, parallel one.
 class MachineOutputLine(object):
     """Represent a line in a METAMAP Machine output file."""
-    slots=['_line', '_line_type']
+    __slots__=['_line', '_line_type']
     _line_id=None
     def __init__(self, original_line):
         self._line=original_line.strip().lower()
-        self._line_type=self._line.split('(')[0]
+        self._line_type=self._line.partition('(')[0]
     # The line property.
     def line_fget(self):
         "Getter for the line property"
@@ -166,6 +300,7 @@ class UtteranceLine(MachineOutputLine):
         
 class EndOfUtteranceLine(MachineOutputLine):
     """Represents the end of an utterance."""
+    __slots__=[]
     def __init__(self, original_line):
         MachineOutputLine.__init__(self, original_line)
         if self.line_type!="'eou'.":
@@ -177,6 +312,7 @@ class EndOfUtteranceLine(MachineOutputLine):
 class CandidateLine(MachineOutputLine):
     """Candidate lines - we're not using this one right now, so we just skip
     them."""
+    __slots__=[]
     def __init__(self, original_line):
         MachineOutputLine.__init__(self, original_line)
         if self.line_type!='candidates':
@@ -187,6 +323,7 @@ class CandidateLine(MachineOutputLine):
 
 class PhraseLine(MachineOutputLine):
     """Phrase Lines - not useful for our purposes"""
+    __slots__=[]
     def __init__(self, original_line):
         MachineOutputLine.__init__(self, original_line)
         if self.line_type!='phrase':
@@ -219,7 +356,15 @@ class ConceptLine(MachineOutputLine):
 class MappingLine(MachineOutputLine):
     """A mapping line - these are the ones we're actually interested in. Due
     to the syntax of machine output files, these will have to be told what 
-    their ID is."""
+    their ID is.
+    
+    mappings_parser chooses how the line is parsed: FAST_MAPPINGS_PARSER 
+    (the default) uses the hand-written parser, and falls back to pyparsing
+    only for lines it can't parse; PYPARSING_MAPPINGS_PARSER uses only 
+    pyparsing; VALIDATING_MAPPINGS_PARSER uses both, warns if they
+    disagree, and trusts pyparsing. It can be set on a single line, so
+    MappingLines don't declare __slots__."""
+    mappings_parser=FAST_MAPPINGS_PARSER
     #map_parser=re.compile(r"""map\((?P<map_score>\-?\d+?)\,
     #                          \[(?P<the_rest>.*)\]\)\.""", re.VERBOSE |
     #                                                       re.IGNORECASE)
@@ -242,9 +387,63 @@ class MappingLine(MachineOutputLine):
                                        self.line)                                   
         logging.log(ULTRADEBUG, "Created a MappingLine")
     def iter_concepts(self):
-        """Iterates through the concepts (only one per position) so that
-        they can be extracted in order. We will get the first concept that
-        covers each positional 'slot' in the original. """
+        """Iterates through the concepts of the best mapping, in order."""
+        if self.mappings_parser==PYPARSING_MAPPINGS_PARSER:
+            concepts=self._pyparsing_concepts()
+        elif self.mappings_parser==FAST_MAPPINGS_PARSER:
+            try:
+                concepts=self._fast_concepts()
+            except ParsingError, exc:
+                logging.debug("The fast parser couldn't parse %s (%s). "
+                              "Using pyparsing.", self.line, exc)
+                concepts=self._pyparsing_concepts()
+        elif self.mappings_parser==VALIDATING_MAPPINGS_PARSER:
+            concepts=self._pyparsing_concepts()
+            try:
+                fast_concepts=self._fast_concepts()
+            except ParsingError, exc:
+                logging.warn("The fast parser couldn't parse %s (%s)", 
+                             self.line, exc)
+            else:
+                if [(x.CUI, x.description, x.confidence) 
+                    for x in fast_concepts]!=\
+                   [(x.CUI, x.description, x.confidence) for x in concepts]:
+                    logging.warn("The parsers disagree on %s: %r vs. %r",
+                                 self.line, fast_concepts, concepts)
+        else:
+            raise ValueError("Unknown mappings parser %r" % 
+                             self.mappings_parser)
+        for new_concept in concepts:
+            logging.debug("Emitting %r", new_concept)
+            yield new_concept
+        return
+    def _fast_concepts(self):
+        """Returns the ConceptLines of the best mapping according to the 
+        hand-written parser. Raises ParsingError if it can't parse the 
+        line."""
+        all_mappings=parse_mappings(self.line)
+        if len(all_mappings)==0:
+            return []
+        # Get the mapping with the best score. If all have the same score,
+        # uses the first one. The scores are compared as strings, exactly
+        # like the pyparsing version does.
+        (best_mapping_score, best_mapping)=all_mappings[0]
+        for (score, evs) in all_mappings[1:]:
+            if score>best_mapping_score:
+                best_mapping_score=score
+                best_mapping=evs
+        concepts=[]
+        for ev_arguments in best_mapping:
+            (score, cui, name)=ev_arguments[:3]
+            if type(cui) is not str or type(name) is not str:
+                raise ParsingError("Bad EV arguments %r" % (ev_arguments,))
+            concepts.append(ConceptLine(cui, name, 
+                                        int(unsigned_number(score))))
+        return concepts
+    def _pyparsing_concepts(self):
+        """Returns the ConceptLines of the best mapping according to the
+        pyparsing grammar. We will get the first concept that covers each
+        positional 'slot' in the original."""
         #concepts_iter=MappingLine.ev_parser.finditer(self.line)
         #concept_slots={}
         #for concept in concepts_iter:
@@ -275,7 +474,7 @@ class MappingLine(MachineOutputLine):
             logging.warn("FAIL parsing %s", self.line)
             raise
         if len(all_mappings)==0:
-            return
+            return []
         # Get the mapping with the best score. If all have the same score,
         # uses the first one.
         best_mapping=all_mappings[0]['Expression'][0]
@@ -284,38 +483,61 @@ class MappingLine(MachineOutputLine):
             if m['Score']>best_mapping_score:
                 best_mapping_score=m['Score']
                 best_mapping=m['Expression'][0]
-        # The EVs are in order
-        for e in best_mapping:
-            new_concept=ConceptLine(e['ConceptID'],
-                                    e['Name'],
-                                    int(e['Score']))
-            logging.debug("Emitting %r", new_concept)
-            yield new_concept
-        return
+        # The EVs are in order. Depending on pyparsing's version the names
+        # come back as strings or as single-token ParseResults.
+        return [ConceptLine(e['ConceptID'], 
+                            e['Name'] if isinstance(e['Name'], basestring)
+                                      else e['Name'][0],
+                            int(e['Score']))
+                for e in best_mapping]
         
+# The kinds of lines in machine output, by line type (what comes before the
+# first parenthesis, or the whole line for the end of utterance marker)
+MACHINE_OUTPUT_LINE_TYPES={'utterance': UtteranceLine,
+                           'mappings': MappingLine,
+                           "'eou'.": EndOfUtteranceLine,
+                           'candidates': CandidateLine,
+                           'phrase': PhraseLine}
+# We don't use these, so by default the reader doesn't even build them
+DEFAULT_SKIPPED_LINE_TYPES=('candidates', 'phrase')
+# Line types are never longer than this
+LONGEST_LINE_TYPE=max(len(x) for x in MACHINE_OUTPUT_LINE_TYPES)
+
+def machine_output_line_type(line_text):
+    """Returns the type of a machine output line, looking only at its
+    beginning. It's the same as MachineOutputLine.line_type for every known
+    type of line."""
+    start=line_text.lstrip()[:LONGEST_LINE_TYPE+1]
+    parenthesis=start.find('(')
+    if parenthesis>=0:
+        return start[:parenthesis].lower()
+    return start.rstrip().lower()
+
+# Only used through build(), so it never counts anything
+_line_dispatcher=LineDispatcher(machine_output_line_type,
+                                MACHINE_OUTPUT_LINE_TYPES,
+                                unknown_type_error=WrongTypeOfLineError)
+
 def line_factory(line_text):
-    """Builds a line of the appropriate type by trial and error."""
-    line_types_to_try=[UtteranceLine, MappingLine, EndOfUtteranceLine,
-                       CandidateLine, PhraseLine]
-    for t in line_types_to_try:
-        try:
-            tentative_line=t(line_text)
-        except WrongTypeOfLineError:
-            tentative_line=None
-        else:
-            break
-    if tentative_line is None:
-        raise WrongTypeOfLineError("%s is not of one of the known Metamap "
-                                   "machine output line types." % line_text)
-    return tentative_line
+    """Builds a line of the appropriate type, according to its line type."""
+    return _line_dispatcher.build(line_text)
     
 class MetamapMachineOutput(ChunkedNLMOutput):
     """Represents a Metamap Machine output file that contains chunked data
     from several articles simultaneously. It iterates through the file one
-    article at a time."""
-    def __init__(self, fileobject, lines_to_ignore, chunkmap):
+    article at a time.
+    
+    The lines whose types are in skipped_line_types (candidates and phrases,
+    by default) are left out without being parsed. The line_counts property
+    counts the lines of each type read."""
+    def __init__(self, fileobject, lines_to_ignore, chunkmap, 
+                 skipped_line_types=DEFAULT_SKIPPED_LINE_TYPES):
         ChunkedNLMOutput.__init__(self, fileobject,
-                                    type_of_lines=line_factory,
+                                    type_of_lines=LineDispatcher(
+                                        machine_output_line_type,
+                                        MACHINE_OUTPUT_LINE_TYPES,
+                                        skipped_line_types,
+                                        WrongTypeOfLineError),
                                     lines_to_ignore=lines_to_ignore,
                                     chunkmap=chunkmap)
     def ignore_exception(self, which_exception, on_which_line):
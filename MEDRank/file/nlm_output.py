@@ -24,7 +24,10 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 
 from MEDRank.utility.logger import logging, ULTRADEBUG
 import re
+import os
+from itertools import izip, repeat
 from MEDRank.file.text import Text
+from MEDRank.file.article_index import ArticleIndex, index_filename
 from MEDRank.pubmed.pmid import Pmid
 
 class ParsingError(Exception):
@@ -55,7 +58,7 @@ class NoLineTypeError(ParsingError):
 
 class Line(object):
     """Represent a line in an NLM output file."""
-    slots=['_id', '_line', '_confidence', '_split_char', 'split_line']
+    __slots__=['_id', '_line', '_confidence', '_split_char', 'split_line']
     number_parser=re.compile(r'\d+')
     def __init__(self, original_line, id_position=0, split_char='|', 
                  id_decorator_remover=number_parser.findall):
@@ -105,6 +108,58 @@ class Line(object):
     #    return self._split_line
     #split_line=property(get_split_line)
     
+class LineDispatcher(object):
+    """Builds the right kind of line object for each line of a file that 
+    has several kinds of lines, without trial and error. 
+    
+    classifier(line_text) must return a key for the kind of line, looking
+    at as little of it as possible (a prefix, a single field...), or raise
+    a ParsingError if it can't tell. line_types maps each key to the type
+    (or any callable) that builds that kind of line; unknown keys raise 
+    unknown_type_error. The lines whose key is in skipped_types aren't 
+    built at all: the dispatcher returns None for them, and NLMOutput 
+    skips them.
+    
+    counts holds the number of lines of each kind seen so far (including
+    the skipped and unknown ones), by key; None counts the lines that 
+    couldn't be classified. build() does the same as calling the 
+    dispatcher, but leaves the line out of the counts."""
+    def __init__(self, classifier, line_types, skipped_types=(),
+                 unknown_type_error=UnknownLineTypeError):
+        self._classifier=classifier
+        self._line_types=dict(line_types)
+        self._skipped_types=frozenset(skipped_types)
+        self._unknown_type_error=unknown_type_error
+        self.counts={}
+    def __repr__(self):
+        return "<%s for %r>" % (self.__class__.__name__, 
+                                sorted(self._line_types.keys()))
+    def __call__(self, line_text):
+        try:
+            line_kind=self._classifier(line_text)
+        except ParsingError:
+            self.counts[None]=self.counts.get(None, 0)+1
+            raise
+        self.counts[line_kind]=self.counts.get(line_kind, 0)+1
+        return self._build(line_kind, line_text)
+    def build(self, line_text):
+        """Builds the line without counting it."""
+        return self._build(self._classifier(line_text), line_text)
+    def _build(self, line_kind, line_text):
+        """Builds a line of the given kind, or returns None if that kind is
+        skipped."""
+        if line_kind in self._skipped_types:
+            return None
+        try:
+            line_type=self._line_types[line_kind]
+        except KeyError:
+            raise self._unknown_type_error("Unknown line type in line '%s'" % 
+                                           line_text)
+        return line_type(line_text)
+    def reset_counts(self):
+        """Starts counting from zero again."""
+        self.counts={}
+
 class LineList(object):
     """Represents a list of lines tied to the same article ID, probably by a
     chunkmap."""
@@ -155,6 +210,12 @@ class NLMOutput(Text):
         "Changes the type of the lines that will be created."
         self.__line_type=new_line_type
     line_type=property(get_line_type, set_line_type)
+    def line_counts_fget(self):
+        """Getter for the line_counts property: the number of lines of each
+        kind read so far, if the lines are built by a LineDispatcher (None
+        otherwise)."""
+        return getattr(self.__line_type, 'counts', None)
+    line_counts=property(line_counts_fget)
     def __iter__(self):
         """Iterates over the file, skipping lines that contain ignorable
         snippets and constructing line objects of the specified type for all
@@ -163,9 +224,18 @@ class NLMOutput(Text):
         ignore_exception returns True) parsing may continue.
         
         We will only allow ParsingErrors to be caught, which should be enough
-        to ignore truly known parsing problems.
+        to ignore truly known parsing problems. Lines for which the line type
+        returns None are skipped, too.
         """
-        for line in Text.__iter__(self):
+        for offset, new_line in self._parse_lines(izip(repeat(None),
+                                                    Text.__iter__(self))):
+            yield new_line
+        return
+    def _parse_lines(self, numbered_lines):
+        """Does the actual work of the iterator. Takes (offset, text) tuples
+        and yields an (offset, line object) tuple for every line that isn't
+        skipped."""
+        for offset, line in numbered_lines:
             if self.is_ignorable(line.lower()):
                 continue
             try:
@@ -177,24 +247,51 @@ class NLMOutput(Text):
                     logging.error("Unignorable exception on line '%s'", line)
                     raise
             else:
-                yield new_line
+                if new_line is not None:
+                    yield (offset, new_line)
         return
 
 class ChunkedNLMOutput(NLMOutput):
     """Represents a file associated with a chunkmap. Its iterator returns
     linelists, which are lists of lines logically tied together by the same ID
     in the chunkmap. It assumes (reasonably, I think) that lines belonging to
-    the same set are contiguous in the file."""
+    the same set are contiguous in the file.
+    
+    If the file was opened in binary mode, build_article_index can record
+    where each article's lines are (load_article_index reuses the index 
+    stored next to the file); after select_articles, the iterator seeks
+    directly to the articles requested instead of reading the whole file."""
     def __init__(self, fileobject, type_of_lines, lines_to_ignore, chunkmap, 
                  type_of_line_set=LineList):
         NLMOutput.__init__(self, fileobject, type_of_lines, lines_to_ignore)
         self._chunkmap=chunkmap
         self._lines_type=type_of_line_set
+        self._selected_blocks=None
     def __iter__(self):
+        if self._selected_blocks is None:
+            numbered_lines=izip(repeat(None), Text.__iter__(self))
+        else:
+            numbered_lines=self._iter_selected_blocks()
+        for offset, line_set in self._group_lines(
+                                        self._parse_lines(numbered_lines)):
+            yield line_set
+        return
+    def _iter_selected_blocks(self):
+        """Reads the lines of the blocks chosen by select_articles."""
+        for offset, length in self._selected_blocks:
+            logging.log(ULTRADEBUG, "Reading %d bytes at %d", length, offset)
+            for line in self.read_block(offset, length):
+                yield (None, line)
+        return
+    def _group_lines(self, parsed_lines):
+        """Groups the (offset, line object) tuples coming from _parse_lines
+        into line sets according to the chunkmap. Yields (offset, line set)
+        tuples, where the offset is the one of the first line in the set."""
         current_set=[]
         current_id=None
+        current_offset=None
         bad_id=-1
-        for line in NLMOutput.__iter__(self):
+        for offset, line in parsed_lines:
             try:
                 this_lines_set_id=self._chunkmap.pmid_from_block(line.line_id)
             except KeyError:
@@ -213,15 +310,86 @@ class ChunkedNLMOutput(NLMOutput):
                     if current_id<0:
                         # Decrement bad line counter
                         bad_id-=1
-                    yield self._lines_type(current_id, current_set)
+                    yield (current_offset, 
+                           self._lines_type(current_id, current_set))
                         
                 # Start a new, empty linelist
                 current_id=this_lines_set_id
+                current_offset=offset
                 current_set=[]
             current_set.append(line)
         # Is there something left to emit after the iteration's over?
         if len(current_set)>0:
             logging.log(ULTRADEBUG, "Completed iteration. Emitting the last "
                                     "lines left with set id %s", current_id)
-            yield self._lines_type(current_id, current_set)
+            yield (current_offset, self._lines_type(current_id, current_set))
         return
+    def build_article_index(self):
+        """Reads the whole file, from the beginning, and returns an
+        ArticleIndex with the offset and length of the block of lines of
+        each article. Each block ends where the next one starts, so the
+        lines skipped in between are read again (and skipped again) when
+        seeking. Lines without a chunkmap equivalent aren't indexed."""
+        self.rewind()
+        index=ArticleIndex()
+        current_id=None
+        current_offset=None
+        for offset, line_set in self._group_lines(self._parse_lines(
+                                                self.iter_with_offsets())):
+            if current_id is not None:
+                index.add(current_id, current_offset, offset-current_offset)
+            if line_set.set_id.pmid<0:
+                current_id=None
+            else:
+                current_id=line_set.set_id
+                current_offset=offset
+        if current_id is not None:
+            self.original_file.seek(0, 2)
+            index.add(current_id, current_offset, 
+                      self.original_file.tell()-current_offset)
+        self.rewind()
+        logging.debug("Built %r", index)
+        return index
+    def load_article_index(self):
+        """Returns the ArticleIndex stored next to the file (see 
+        article_index.index_filename). If there's none, or it's older than
+        the file, builds one with build_article_index and tries to store it
+        there for the next time. Files without a name on disk just get a 
+        new index."""
+        output_filename=getattr(self.original_file, 'name', None)
+        if output_filename is None or not os.path.isfile(output_filename):
+            return self.build_article_index()
+        sidecar_filename=index_filename(output_filename)
+        if os.path.isfile(sidecar_filename) and \
+           os.path.getmtime(sidecar_filename)>=\
+           os.path.getmtime(output_filename):
+            logging.debug("Loading the article index from %s", 
+                          sidecar_filename)
+            sidecar=open(sidecar_filename)
+            try:
+                return ArticleIndex.load(sidecar)
+            finally:
+                sidecar.close()
+        index=self.build_article_index()
+        try:
+            sidecar=open(sidecar_filename, 'w')
+            try:
+                index.save(sidecar)
+            finally:
+                sidecar.close()
+        except IOError:
+            logging.warn("Could not store the article index in %s.",
+                         sidecar_filename)
+        return index
+    def select_articles(self, article_index, pmids=None):
+        """From now on, the iterator will seek directly to the articles in
+        pmids (every article in article_index if it's None) and read only
+        their lines, in the order in which they are in the file. Articles
+        that aren't in the index are skipped. Pass None as article_index to
+        read the whole file again."""
+        if article_index is None:
+            self._selected_blocks=None
+            return
+        if pmids is None:
+            pmids=article_index.pmids
+        self._selected_blocks=article_index.blocks_for(pmids)
@@ -22,7 +22,8 @@ from MEDRank.file.nlm_output import (Line, ChunkedNLMOutput,
                         NoConfidenceError,
                         NoLineIDError,
                         UnknownLineTypeError,
-                        NoLineTypeError)
+                        NoLineTypeError,
+                        LineDispatcher)
 import re
 
 # These lines are known to be useless to the parser. We have gathered them 
@@ -33,42 +34,46 @@ DEFAULT_LINES_TO_IGNORE=["semrep wrapper error"]
 class SemrepLine(Line):
     """The basic semrep line has the ID in the second position instead of
     the first, so this class calls the constructor appropriately."""
+    __slots__=[]
     def __init__(self, original_line):
         Line.__init__(self, original_line, id_position=1, 
                       id_decorator_remover=lambda x: [x])
         
 class EntityLine(SemrepLine):
-    """Represents a line holding an Entity in the SEMREP output."""
-    __slots__=['_cui', '_semantic_type', '_description']
-    def __init__(self, original_line, 
-                 cui_position=6, # Support for different SEMREP output formats
-                 description_position=7,
-                 semantic_type_position=8):
+    """Represents a line holding an Entity in the SEMREP output. 
+    
+    The CUI and the confidence are extracted when the line is built, because
+    a line without them is unusable; the description and the semantic type
+    are only read from the line when they're asked for. The positions of the
+    fields are class attributes to support different SEMREP output
+    formats."""
+    __slots__=['_cui']
+    cui_position=6
+    description_position=7
+    semantic_type_position=8
+    def __init__(self, original_line):
         SemrepLine.__init__(self, original_line)
-        #line_breakup=self._line.split(self.split_char)
+        line_breakup=self.split_line
         try:
-            self._cui=self.split_line[cui_position]
+            self._cui=line_breakup[self.cui_position]
         except IndexError:
             raise CUINotFoundError("There was no CUI in the line '%s'" % 
                                    self._line)
         if self._cui=='':
             raise CUINotFoundError("There was no CUI in the line '%s'" % 
                                    self._line)
-        try:
-            self._description=self.split_line[description_position]
-            self._semantic_type=self.split_line[semantic_type_position]
-        except IndexError:
+        if len(line_breakup)<=max(self.description_position,
+                                  self.semantic_type_position):
             raise ParsingError("Data missing from line '%s'" % self._line)
         # Some entities have no stated confidence. We use 0 in such cases,
         # so they can be eliminated from the workflow later.
         try:
-            self.confidence=float(self.split_line[-3])/1000.0
+            self.confidence=float(line_breakup[-3])/1000.0
         except ValueError:
             raise NoConfidenceError("Could not parse a confidence value in "
                                     "line '%s'" % self._line)
-        logging.log(ULTRADEBUG, "Created an entity_line @ %d: %s (%s) %1.3f", 
-                      self.line_id, self._cui,
-                      self._description, self.confidence)
+        logging.log(ULTRADEBUG, "Created an entity_line @ %d: %s %1.3f", 
+                      self.line_id, self._cui, self.confidence)
     # The CUI property.
     def cui_fget(self):
         "Getter for the cui property"
@@ -77,52 +82,52 @@ class EntityLine(SemrepLine):
     # The semantic_type property.
     def semantic_type_fget(self):
         "Getter for the semantic_type property"
-        return self._semantic_type
+        return self.split_line[self.semantic_type_position]
     semantic_type=property(semantic_type_fget)
     # The description property.
     def description_fget(self):
         "Getter for the description property"
-        return self._description
+        return self.split_line[self.description_position]
     description=property(description_fget)
 
 class EntityLine07(EntityLine):
     """Represents an EntityLine as outputted by '07 SEMREPP"""
-    def __init__(self, original_line):
-        EntityLine.__init__(self, original_line, 8, 6, 7)
+    __slots__=[]
+    cui_position=8
+    description_position=6
+    semantic_type_position=7
 
 class RelationLine(SemrepLine):
-    """Represents a line holding a Relationship in the SEMREP output."""
-    __slots__=['_cui1', '_cui2', '_relation_type']
+    """Represents a line holding a Relationship in the SEMREP output. The
+    relation type is only read from the line when it's asked for."""
+    __slots__=['_cui1', '_cui2']
+    relation_type_position=24
     def __init__(self, original_line):
         SemrepLine.__init__(self, original_line)
-        #line_breakup=self._line.split(self.split_char)
+        line_breakup=self.split_line
         try:
-            self._cui1=self.split_line[11]
+            self._cui1=line_breakup[11]
             if self._cui1=='':
                 raise IndexError() # Trigger the CUINotFoundError
         except IndexError:
             raise CUINotFoundError("There was no CUI1 in the line '%s'" % 
                                    self._line)
+        # CUI2 is the last field we use, so if it's there the relation type
+        # is, too.
         try:
-            self._cui2=self.split_line[33]
+            self._cui2=line_breakup[33]
             if self._cui2=='':
                 raise IndexError() # Trigger the CUINotFoundError
         except IndexError:
             raise CUINotFoundError("There was no CUI2 in the line '%s'" % 
                                    self._line)
         try:
-            self._relation_type=self.split_line[24]
-        except IndexError:
-            raise ParsingError("Data missing from line '%s'" % self._line)
-        
-        try:
-            self.confidence=float(self.split_line[-3])/1000.0
+            self.confidence=float(line_breakup[-3])/1000.0
         except ValueError:
             raise NoConfidenceError("Could not parse a confidence value in "
                                     "line '%s'" % self._line)
-        logging.log(ULTRADEBUG, "Created a relation_line @ %d: %s--%s-->%s (%1.3f)", 
-                      self.line_id, self._cui1, self._relation_type,
-                      self._cui2, self.confidence)
+        logging.log(ULTRADEBUG, "Created a relation_line @ %d: %s-->%s (%1.3f)", 
+                      self.line_id, self._cui1, self._cui2, self.confidence)
     # The cui1 property.
     def cui1_fget(self):
         "Getter for the cui1 property"
@@ -136,25 +141,45 @@ class RelationLine(SemrepLine):
     # The relation_type property.
     def relation_type_fget(self):
         "Getter for the relation_type property"
-        return self._relation_type
+        return self.split_line[self.relation_type_position]
     relation_type=property(relation_type_fget)
     
 class TextLine(SemrepLine):
     """SEMREP also returns lines holding the original text. We're not
     particularly interested in these right now."""
-    pass
+    __slots__=[]
     
+def semrep_line_type(line_text):
+    """In SEMREP output, the type of a line is its 6th element. Only the 
+    first fields are split to get it."""
+    try:
+        return line_text.split('|', 6)[5]
+    except IndexError:
+        raise NoLineTypeError("Could not determine the line type of '%s'" %
+                              line_text)
+
+SEMREP_LINE_TYPES={'entity': EntityLine,
+                   'relation': RelationLine,
+                   'text': TextLine}
+
+# Only used through build(), so it never counts anything
+_line_dispatcher=LineDispatcher(semrep_line_type, SEMREP_LINE_TYPES)
+
 class SemrepOutput(ChunkedNLMOutput):
     """Represents a SEMREP output file that contains chunked data from several
     articles simultaneously. It iterates through the file one article at a
-    time."""
-    # _dispatch_table={'entity': EntityLine,
-    #                     'relation': RelationLine,
-    #                 'text': TextLine
-    #                 }
-    def __init__(self, fileobject, lines_to_ignore, chunkmap):
+    time. 
+    
+    The lines whose types are in skipped_line_types (for example, 'text')
+    are left out without being parsed. The line_counts property counts the
+    lines of each type read."""
+    def __init__(self, fileobject, lines_to_ignore, chunkmap,
+                 skipped_line_types=()):
         ChunkedNLMOutput.__init__(self, fileobject,
-                                    type_of_lines=SemrepOutput.line_factory,
+                                    type_of_lines=LineDispatcher(
+                                        semrep_line_type,
+                                        SEMREP_LINE_TYPES,
+                                        skipped_line_types),
                                     lines_to_ignore=lines_to_ignore,
                                     chunkmap=chunkmap)
     def ignore_exception(self, which_exception, on_which_line):
@@ -181,25 +206,6 @@ class SemrepOutput(ChunkedNLMOutput):
     @staticmethod
     def line_factory(line_text):
         """Decides whether to instantiate an entity_line or a relation_line
-        dynamically, so it can be passed to the chunked_nlm_output constructor
-        instead of a type.
-
-        In SEMREP output, the type of a line is its 6th element."""
-        try:
-            line_type=line_text.split('|')[5]
-        except IndexError:
-            raise NoLineTypeError("Could not determine the line type of '%s'",
-                                  line_text)
-        #try:
-        #    return SemrepOutput._dispatch_table[line_type](line_text)
-        if line_type=='entity':
-            return EntityLine(line_text)
-        if line_type=="relation":
-            return RelationLine(line_text)
-        if line_type=='text':
-            return TextLine(line_text)
-        #except KeyError:
-        #    raise UnknownLineTypeError("Unknown line type in line '%s'" % 
-        #                                line_text)
-        raise UnknownLineTypeError("Unknown line type in line '%s'" % 
-                                    line_text)
+        dynamically, according to the line's type (see 
+        semrep_line_type)."""
+        return _line_dispatcher.build(line_text)
@@ -14,8 +14,9 @@ from MEDRank.file.semrep import (SemrepOutput,
                                  EntityLine,
                                  RelationLine, 
                                  TextLine,
-                                 DEFAULT_LINES_TO_IGNORE)
-from MEDRank.file.nlm_output import NoLineTypeError, UnknownLineTypeError
+                                 DEFAULT_LINES_TO_IGNORE,
+                                 semrep_line_type)
+from MEDRank.file.nlm_output import LineDispatcher
                                  
 from MEDRank.umls.concept import Concept
 
@@ -49,24 +50,25 @@ class RelationMeSHLine(RelationLine):
 class SemrepMeSHOutput(SemrepOutput):
     """Reads a Semrep Output file, outputs MeSH terms instead of UMLS 
     concepts. Keeps the CUIs for backwards compatibility."""
-    def __init__(self, fileobject, lines_to_ignore, chunkmap, converter):
+    def __init__(self, fileobject, lines_to_ignore, chunkmap, converter,
+                 skipped_line_types=()):
         SemrepOutput.__init__(self, fileobject,
                               lines_to_ignore=lines_to_ignore,
                               chunkmap=chunkmap)
         self._my_converter=converter
-        self.line_type=self.line_factory
+        self.line_type=LineDispatcher(semrep_line_type, 
+                                      {'entity': self.entity_line,
+                                       'relation': self.relation_line,
+                                       'text': TextLine},
+                                      skipped_line_types)
+    def entity_line(self, line_text):
+        "Builds an EntityMeSHLine."
+        return EntityMeSHLine(line_text, self._my_converter)
+    def relation_line(self, line_text):
+        "Builds a RelationMeSHLine."
+        return RelationMeSHLine(line_text, self._my_converter)
     def line_factory(self, line_text):
-        try:
-            line_type=line_text.split('|')[5]
-        except IndexError:
-            raise NoLineTypeError("Could not determine the line type of '%s'",
-                                  line_text)
-        if line_type=='entity':
-            return EntityMeSHLine(line_text, self._my_converter)
-        if line_type=="relation":
-            return RelationMeSHLine(line_text, self._my_converter)
-        if line_type=='text':
-            return TextLine(line_text)
-        raise UnknownLineTypeError("Unknown line type in line '%s'", line_text)
+        "Builds the right kind of line for line_text."
+        return self.line_type(line_text)
 
         
\ No newline at end of file
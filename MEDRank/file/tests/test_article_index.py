@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_article_index.py
+"""
+
+import unittest
+from StringIO import StringIO
+from MEDRank.file.article_index import *
+
+# pylint: disable-msg=C0103,C0111,R0904
+class articleIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index=ArticleIndex()
+        self.index.add(Pmid(30), 0, 100)
+        self.index.add(10, 100, 50)
+        self.index.add(Pmid(20), 150, 25)
+        self.index.add(30, 175, 10)
+    def testAdd(self):
+        self.assertEquals(3, len(self.index))
+        self.assert_(Pmid(10) in self.index)
+        self.assert_(10 in self.index)
+        self.failIf(40 in self.index)
+        self.assertEquals([(0, 100), (175, 10)], self.index.blocks(30))
+        self.assertRaises(KeyError, self.index.blocks, 40)
+    def testPmidsAreInFileOrder(self):
+        self.assertEquals([Pmid(30), Pmid(10), Pmid(20)], self.index.pmids)
+    def testBlocksFor(self):
+        self.assertEquals([(100, 50), (150, 25)],
+                          self.index.blocks_for([Pmid(20), 10, 40]))
+        self.assertEquals([(0, 100), (150, 25), (175, 10)],
+                          self.index.blocks_for([30, 20, 30]))
+    def testSaveAndLoad(self):
+        saved=StringIO()
+        self.index.save(saved)
+        saved.seek(0)
+        loaded=ArticleIndex.load(saved)
+        self.assertEquals(self.index.pmids, loaded.pmids)
+        for pmid in self.index.pmids:
+            self.assertEquals(self.index.blocks(pmid), loaded.blocks(pmid))
+    def testLoadRejectsGarbage(self):
+        self.assertRaises(ValueError, ArticleIndex.load, 
+                          StringIO("1\t2\n"))
+    def testIndexFilename(self):
+        self.assertEquals('out.semrep.index', index_filename('out.semrep'))
+
+if __name__ == '__main__':
+    unittest.main()
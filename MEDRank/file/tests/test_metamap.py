@@ -89,6 +89,18 @@ class metamapTests(unittest.TestCase):
         except NoConfidenceError:
             raised=True
         self.assert_(raised)
+    def testFields(self):
+        line=MetamapLine('0000000001|MM|585|Little\'s Disease|C0023882|'
+                         '[dsyn]|TI||0:12,0:4:1')
+        self.assertEquals('c0023882', line.CUI)
+        self.assertEquals("little's disease", line.description)
+        self.assertEquals('[dsyn]', line.semantic_type)
+        self.assertEquals('ti', line.source)
+        self.assertEquals(['0', '12'], line.location)
+        self.failIf(hasattr(line, '__dict__'))
+    def testMissingLocation(self):
+        line=MetamapLine('1234|MM|121|Injury|c1234|[blah]|TI')
+        self.assertEquals([''], line.location)
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -42,9 +42,117 @@ class test_metamap_machine_output(unittest.TestCase):
         c=[x for x in ml.iter_concepts()]
         self.assertEqual('c0038317', c[0].CUI)
         self.assertEqual('c0312426', c[1].CUI)
+    def concepts_with(self, parser, line):
+        ml=MappingLine(line)
+        ml.mappings_parser=parser
+        return [(x.CUI, x.description, x.confidence) 
+                for x in ml.iter_concepts()]
+    def assertParsersAgree(self, line):
+        fast=self.concepts_with(FAST_MAPPINGS_PARSER, line)
+        self.assertEqual(self.concepts_with(PYPARSING_MAPPINGS_PARSER, line),
+                         fast)
+        return fast
+    def testFastParserAgreesWithPyparsing(self):
+        self.assertEqual([('c0038317', 'steroid', 660), 
+                          ('c0312426', 'hormone production', 901)],
+                         self.assertParsersAgree(self.mapline))
+    def testFastParserTrickyNames(self):
+        line="mappings([map(-1000,[ev(-1000,'C0010346','Crohn''s',"\
+             "'Crohn''s disease',[crohn,s],[dsyn],[[[1,2],[1,2],0]],"\
+             "yes,no),ev(-812,'C0000001','''quoted''','Odd, [name] (x)',"\
+             "[],[],[[[3,3],[1,1],0]],no,no)])])."
+        self.assertEqual([('c0010346', "crohn''s", 1000),
+                          ('c0000001', "''quoted''", 812)],
+                         self.assertParsersAgree(line))
+    def testFastParserPicksTheSameMapping(self):
+        # The map scores are compared as strings (so 901 beats 1000)
+        line="mappings([map(-1000,[ev(-1000,'C0000001',one,one,[one],"\
+             "[ftcn],[[[1,1],[1,1],0]],yes,no)]),map(-901,[ev(-901,"\
+             "'C0000002',two,two,[two],[ftcn],[[[1,1],[1,1],0]],yes,no)])])."
+        self.assertEqual([('c0000002', 'two', 901)],
+                         self.assertParsersAgree(line))
+    def testFastParserNoMappings(self):
+        self.assertEqual([], self.assertParsersAgree("mappings([])."))
+    def testFastParserFallsBackToPyparsing(self):
+        ml=MappingLine("mappings([map(-901,[ev(-660,'C0038317',steroid,"
+                       "'Steroids',[steroid],[strd],[[[1,1],[1,1],0]],no,"
+                       "no)])]). trailing")
+        self.assertRaises(ParsingError, ml._fast_concepts)
+        self.assertEqual([('c0038317', 'steroid', 660)],
+                         [(x.CUI, x.description, x.confidence) 
+                          for x in ml.iter_concepts()])
+    def testParsePrologTerm(self):
+        tokens=tokenize_prolog_term("f(a,'b c',[1,[],g(x)]).")
+        self.assertEqual((('f', ['a', 'b c', ['1', [], ('g', ['x'])]]), 
+                          len(tokens)-1),
+                         parse_prolog_term(tokens))
+        self.assertRaises(ParsingError, parse_prolog_term,
+                          tokenize_prolog_term("f(a,b"))
+        self.assertRaises(ParsingError, parse_prolog_term,
+                          tokenize_prolog_term("f(a b)"))
+        self.assertRaises(ParsingError, parse_prolog_term,
+                          tokenize_prolog_term("(a)"))
+        self.assertRaises(ParsingError, tokenize_prolog_term, "f('a)")
+        self.assertEqual(['f(', 'a', ',', "'b c'", ')', '.'],
+                         tokenize_prolog_term(" f( a , 'b c' ) ."))
+    def testUnknownMappingsParser(self):
+        ml=MappingLine(self.mapline)
+        ml.mappings_parser='regex'
+        self.assertRaises(ValueError, list, ml.iter_concepts())
     def testLineFactory(self):
         self.assert_(type(line_factory(self.uttext)) is UtteranceLine)
         self.assert_(type(line_factory(self.mapline)) is MappingLine)
+    def testLineFactoryDoesNotCount(self):
+        # The module's dispatcher is shared by every caller of line_factory
+        from MEDRank.file.metamap_machine_output import _line_dispatcher
+        line_factory(self.uttext)
+        self.assertEquals({}, _line_dispatcher.counts)
+    def testLineTypeMatchesTheLine(self):
+        for line in (self.uttext, self.mapline, "'EOU'.", 
+                     "phrase(steroid,[mod([lexmatch([steroid])])],0/7,[]).",
+                     "candidates([]).", "ooga booga"):
+            self.assertEquals(MachineOutputLine(line).line_type,
+                              machine_output_line_type(line))
+    def testReaderSkipsCandidatesAndPhrases(self):
+        import StringIO
+        from MEDRank.file.chunkmap import chunkmap_factory
+        text="\n".join([self.uttext, 
+                        "phrase(steroid,[mod([lexmatch([steroid])])],"
+                        "0/7,[]).",
+                        "candidates([]).", self.mapline, "'EOU'.",
+                        "ooga booga"])
+        chunkmap=chunkmap_factory({'98157484.txt': [98157484]})
+        reader=MetamapMachineOutput(StringIO.StringIO(text), [], chunkmap)
+        lines=[x.lines for x in reader][0]
+        self.assertEqual([UtteranceLine, ConceptLine, ConceptLine,
+                          EndOfUtteranceLine], [type(x) for x in lines])
+        self.assertEqual({'utterance': 1, 'phrase': 1, 'candidates': 1,
+                          'mappings': 1, "'eou'.": 1, 'ooga booga': 1},
+                         reader.line_counts)
+        reader=MetamapMachineOutput(StringIO.StringIO(text), [], chunkmap,
+                                    skipped_line_types=())
+        lines=[x.lines for x in reader][0]
+        self.assertEqual([UtteranceLine, PhraseLine, CandidateLine, 
+                          ConceptLine, ConceptLine, EndOfUtteranceLine], 
+                         [type(x) for x in lines])
+    def testReaderSeeksToIndexedArticles(self):
+        import StringIO
+        from MEDRank.file.chunkmap import chunkmap_factory
+        from MEDRank.pubmed.pmid import Pmid
+        other_utterance=self.uttext.replace('98157484', '98157485')
+        text="\n".join([self.uttext, self.mapline, "'EOU'.",
+                        other_utterance, self.mapline, "'EOU'."])
+        chunkmap=chunkmap_factory({'98157484.txt': [98157484],
+                                   '98157485.txt': [98157485]})
+        reader=MetamapMachineOutput(StringIO.StringIO(text), [], chunkmap)
+        index=reader.build_article_index()
+        self.assertEqual([Pmid(98157484), Pmid(98157485)], index.pmids)
+        reader.select_articles(index, [98157485])
+        articles=[x for x in reader]
+        self.assertEqual([Pmid(98157485)], [x.set_id for x in articles])
+        self.assertEqual([UtteranceLine, ConceptLine, ConceptLine,
+                          EndOfUtteranceLine], 
+                         [type(x) for x in articles[0].lines])
     def testLineFactoryFailsOnGibberish(self):
         self.assertRaises(WrongTypeOfLineError, line_factory, "ooga booga")
         
@@ -59,6 +59,56 @@ class nlm_outputTests(unittest.TestCase):
         self.assertEquals(processed_sets[0].set_id, Pmid(1))
         self.assertEquals(processed_sets[1].set_id, Pmid(2))
         self.assertEquals(processed_sets[1].lines[1].line_id, 56790)
+    def testArticleIndex(self):
+        from MEDRank.file.chunkmap import chunkmap_factory
+        from MEDRank.pubmed.pmid import Pmid
+        cm=chunkmap_factory({'1.txt': [12345], '2.txt': [56789, 56790]})
+        cno=ChunkedNLMOutput(self.fakefile, Line, self.lines_to_skip, cm)
+        index=cno.build_article_index()
+        self.assertEquals([Pmid(1), Pmid(2)], index.pmids)
+        text=self.fakefile.getvalue()
+        offset, length=index.blocks(2)[0]
+        self.assertEquals(len(text), offset+length)
+        self.assert_(text[offset:].lstrip().startswith('56789|Woo|Hoo'))
+        # Reading from the index gives the same sets as reading the file
+        cno.select_articles(index, [Pmid(2)])
+        selected=[x for x in cno]
+        self.assertEquals([Pmid(2)], [x.set_id for x in selected])
+        self.assertEquals([56789, 56790], 
+                          [x.line_id for x in selected[0].lines])
+        cno.select_articles(index)
+        self.assertEquals([[12345], [56789, 56790]],
+                          [[y.line_id for y in x.lines] for x in cno])
+        cno.select_articles(None)
+        cno.rewind()
+        self.assertEquals(2, len([x for x in cno]))
+    def testStoredArticleIndex(self):
+        import os
+        import tempfile
+        from MEDRank.file.chunkmap import chunkmap_factory
+        from MEDRank.file.article_index import index_filename
+        from MEDRank.pubmed.pmid import Pmid
+        cm=chunkmap_factory({'1.txt': [12345], '2.txt': [56789, 56790]})
+        (handle, output_filename)=tempfile.mkstemp()
+        os.write(handle, self.fakefile.getvalue())
+        os.close(handle)
+        try:
+            cno=ChunkedNLMOutput(open(output_filename, 'rb'), Line, 
+                                 self.lines_to_skip, cm)
+            built=cno.load_article_index()
+            self.assert_(os.path.isfile(index_filename(output_filename)))
+            # The second time, the stored index is read instead
+            cno.build_article_index=None
+            loaded=cno.load_article_index()
+            self.assertEquals(built.pmids, loaded.pmids)
+            self.assertEquals(built.blocks(2), loaded.blocks(2))
+            cno.select_articles(loaded, [Pmid(2)])
+            self.assertEquals([Pmid(2)], [x.set_id for x in cno])
+            cno.original_file.close()
+        finally:
+            for name in (output_filename, index_filename(output_filename)):
+                if os.path.exists(name):
+                    os.remove(name)
     def testExceptionIgnoring(self):
         class MyBadParser(NLMOutput):
             """This test class ignores NoLineID exceptions to parse the file,
@@ -72,6 +122,52 @@ class nlm_outputTests(unittest.TestCase):
         self.assertEquals(processed_lines[1].line_id, 56789)
         self.assertEquals(processed_lines[2].line_id, 56790)
         self.assertEquals(3, len(processed_lines))
+    def testIgnorableLinesAreCaseInsensitive(self):
+        no=NLMOutput(self.fakefile, Line, ['  * error *  ', 'HISS'])
+        self.assertEquals([56789, 56790], [x.line_id for x in no])
+        self.assert_(no.is_ignorable('12345|boo|hiss'))
+        self.assert_(no.is_ignorable('* error * in line 3'))
+        self.failIf(no.is_ignorable('56789|woo|hoo'))
+    def testIgnorableStringsAreNotPatterns(self):
+        no=NLMOutput(self.fakefile, Line, ['a.b', '(x'])
+        self.failIf(no.is_ignorable('1|axb'))
+        self.assert_(no.is_ignorable('1|a.b'))
+        self.assert_(no.is_ignorable('1|(x|y'))
+    def testNothingToIgnore(self):
+        no=NLMOutput(self.fakefile, Line, [])
+        self.failIf(no.is_ignorable('* error *'))
+    def testLineDispatcher(self):
+        def second_field(line_text):
+            try:
+                return line_text.split('|', 2)[1]
+            except IndexError:
+                raise NoLineTypeError("No type in %r" % line_text)
+        dispatcher=LineDispatcher(second_field, {'woo': Line}, ['boo'])
+        self.assertEquals(56789, dispatcher('56789|Woo|Hoo'.lower()).line_id)
+        self.assertEquals(None, dispatcher('12345|boo|hiss'))
+        self.assertRaises(UnknownLineTypeError, dispatcher, '1|hiss|boo')
+        self.assertRaises(NoLineTypeError, dispatcher, 'nothing')
+        self.assertEquals({'woo': 1, 'boo': 1, 'hiss': 1, None: 1},
+                          dispatcher.counts)
+        dispatcher.reset_counts()
+        self.assertEquals({}, dispatcher.counts)
+        self.assertEquals(56789, dispatcher.build('56789|woo|hoo').line_id)
+        self.assertEquals(None, dispatcher.build('12345|boo|hiss'))
+        self.assertRaises(NoLineTypeError, dispatcher.build, 'nothing')
+        self.assertEquals({}, dispatcher.counts)
+    def testNLMOutputSkipsDispatchedLines(self):
+        dispatcher=LineDispatcher(lambda x: x.split('|')[1].lower(),
+                                  {'woo': Line}, ['boo'])
+        no=NLMOutput(self.fakefile, dispatcher, self.lines_to_skip)
+        self.assertEquals([56789, 56790], [x.line_id for x in no])
+        self.assertEquals({'woo': 2, 'boo': 1}, no.line_counts)
+        self.assertEquals(None, NLMOutput(self.fakefile, Line, 
+                                          []).line_counts)
+    def testLineHasNoInstanceDictionary(self):
+        l=Line('1234|XYZ|ABC')
+        self.assertEquals('1234|XYZ|ABC', l.line)
+        self.assertEquals(['1234', 'xyz', 'abc'], l.split_line)
+        self.failIf(hasattr(l, '__dict__'))
     def testDecoratedLineExtractionWorks(self):
         l=Line('12345.decorated.badly|xyz|abc')
         self.assertEquals(l.line_id, 12345)
@@ -71,6 +71,18 @@ class semrepTests(unittest.TestCase):
         self.getArticles()
         the_line=[x for x in self.articles[0].lines if type(x) is TextLine]
         self.assertEquals(len(the_line), 1)
+    def testLineCounts(self):
+        sro=SemrepOutput(self.fakefile, ["USELESS LINE!"],
+                         self.fake_chunkmap)
+        self.assertEquals(1, len([x for x in sro]))
+        self.assertEquals({'entity': 2, 'relation': 1, 'text': 1},
+                          sro.line_counts)
+    def testSkippedLineTypes(self):
+        sro=SemrepOutput(self.fakefile, ["USELESS LINE!"],
+                         self.fake_chunkmap, skipped_line_types=['text'])
+        lines=[x for x in sro][0].lines
+        self.assertEquals([], [x for x in lines if type(x) is TextLine])
+        self.assertEquals(1, sro.line_counts['text'])
     # The exceptions are raised in a specific order according to the parsing
     # order. The test suite takes this into account.
     def testBadEntityLineRaisesCUIError(self):
@@ -120,6 +132,22 @@ class semrepTests(unittest.TestCase):
         except NoLineTypeError:
             raised=True
         self.assert_(raised)
+    def testEntityFieldPositions(self):
+        line=EntityLine("SE|0000000000||ti|2|entity|C0392760|"
+                        "Affecting|ftcn|involved||||1000|319|326")
+        self.assertEquals('c0392760', line.CUI)
+        self.assertEquals('affecting', line.description)
+        self.assertEquals('ftcn', line.semantic_type)
+        self.assertEquals(1.0, line.confidence)
+        line07=EntityLine07("SE|0000000000||ti|2|entity|Affecting|"
+                            "ftcn|C0392760|involved||||1000|319|326")
+        self.assertEquals('c0392760', line07.CUI)
+        self.assertEquals('affecting', line07.description)
+        self.assertEquals('ftcn', line07.semantic_type)
+    def testLinesHaveNoInstanceDictionary(self):
+        self.getArticles()
+        for line in self.articles[0].lines:
+            self.failIf(hasattr(line, '__dict__'), line)
     
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
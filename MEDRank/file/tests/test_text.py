@@ -58,6 +58,17 @@ class textTests(unittest.TestCase):
         self.my_file.rewind()
         self.assertEqual(self.my_file.as_dict(0),
                         {'First line': 0, 'second line': 0})
+    def testOffsetsKeepTheSameLines(self):
+        with_offsets=list(self.my_file.iter_with_offsets())
+        self.my_file.rewind()
+        self.assertEqual([x[1] for x in with_offsets], self.my_file.as_list())
+        text=self.original_file.getvalue()
+        for offset, line in with_offsets:
+            self.assert_(text[offset:].lstrip().startswith(line))
+    def testUsableLine(self):
+        self.assertEqual('a line', usable_line('  a line \n'))
+        self.assertEqual(None, usable_line('   \n'))
+        self.assertEqual(None, usable_line('  # a comment'))
     def test_file_property(self):
         self.assertEqual(self.my_file.original_file, self.original_file)
         
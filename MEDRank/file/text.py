@@ -7,6 +7,23 @@ Created by Jorge Herskovic on 2008-04-22.
 Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
+def usable_line(line):
+    """Returns the stripped line, or None if it's empty or a comment."""
+    this_line=line.strip()
+    if len(this_line)==0:
+        return None
+    if this_line[0]=='#':
+        return None
+    return this_line
+
+def usable_lines(raw_lines):
+    """Strips the lines, and leaves out the empty ones and the comments."""
+    for line in raw_lines:
+        this_line=usable_line(line)
+        if this_line is not None:
+            yield this_line
+    return
+
 class Text(object):
     """Provides standardized handling for text files. The rules are: 
     1. All the text is lowercased. 
@@ -24,14 +41,25 @@ class Text(object):
     def __repr__(self):
         return "<text file based on %r>" % self.__my_file
     def __iter__(self):
+        return usable_lines(self.__my_file)
+    def iter_with_offsets(self):
+        """Iterates like the regular iterator, but yields (offset, line)
+        tuples. The offset is the position of the line in the file, counted
+        from wherever the file was when the iteration started. If the file
+        was opened in binary mode, it can be passed to seek."""
+        position=self.__my_file.tell()
         for line in self.__my_file:
-            this_line=line.strip()
-            if len(this_line)==0:
-                continue
-            if this_line[0]=='#':
-                continue
-            yield this_line
+            offset=position
+            position+=len(line)
+            this_line=usable_line(line)
+            if this_line is not None:
+                yield (offset, this_line)
         return
+    def read_block(self, offset, length):
+        """Returns the lines (handled like the iterator does) in the length
+        bytes of the file that start at offset."""
+        self.__my_file.seek(offset)
+        return list(usable_lines(self.__my_file.read(length).split('\n')))
     def rewind(self):
         """Restarts reading the file from the beginning."""
         self.__my_file.seek(0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+benchmark_mappings_parser.py
+
+Compares the hand-written and the pyparsing parsers for the mappings lines
+of METAMAP machine output: how long each takes, and whether they extract the
+same concepts.
+
+Usage: benchmark_mappings_parser.py [--limit N] [machine_output_file ...]
+Files ending in .bz2 are decompressed on the fly. Without files, it uses a
+sample mappings line.
+"""
+
+import sys
+import bz2
+import time
+from optparse import OptionParser
+from MEDRank.file.metamap_machine_output import (MappingLine,
+                                                 FAST_MAPPINGS_PARSER,
+                                                 PYPARSING_MAPPINGS_PARSER)
+
+SAMPLE_LINE="mappings([map(-901,[ev(-660,'C0038317',steroid,'Steroids',"\
+            "[steroid],[strd],[[[1,1],[1,1],0]],no,no),ev(-901,'C0312426',"\
+            "'Hormone production','Hormone production',[hormone,production],"\
+            "[ortf],[[[2,2],[1,1],0],[[3,3],[2,2],0]],yes,no)]),map(-901,"\
+            "[ev(-734,'C0301818','Steroid hormone','Steroid hormone',"\
+            "[steroid,hormone],[horm,strd],[[[1,2],[1,2],0]],no,no),"\
+            "ev(-827,'C1548180','Production','Production Processing ID',"\
+            "[production],[fndg],[[[3,3],[1,1],0]],yes,no)])])."
+
+def read_mappings_lines(filenames, limit):
+    """Returns up to limit mappings lines from the files."""
+    lines=[]
+    for filename in filenames:
+        if filename.endswith('.bz2'):
+            infile=bz2.BZ2File(filename)
+        else:
+            infile=open(filename)
+        for line in infile:
+            if line.lower().startswith('mappings('):
+                lines.append(line)
+                if len(lines)>=limit:
+                    return lines
+        infile.close()
+    return lines
+
+def extract(lines, parser):
+    """Extracts the concepts from every line with the given parser. Returns
+    the time it took and the concepts (as tuples) of each line, or the
+    exception that stopped the parser."""
+    results=[]
+    start=time.time()
+    for line in lines:
+        mapping_line=MappingLine(line)
+        mapping_line.mappings_parser=parser
+        try:
+            results.append([(x.CUI, x.description, x.confidence)
+                            for x in mapping_line.iter_concepts()])
+        except Exception, exc:
+            results.append(exc)
+    return (time.time()-start, results)
+
+def main():
+    option_parser=OptionParser(usage="%prog [--limit N] "
+                                     "[machine_output_file ...]")
+    option_parser.add_option("--limit", type="int", default=20000,
+                             help="Maximum number of mappings lines to use "
+                                  "[default: %default]")
+    (options, filenames)=option_parser.parse_args()
+    if filenames:
+        lines=read_mappings_lines(filenames, options.limit)
+    else:
+        lines=[SAMPLE_LINE]*min(options.limit, 2000)
+    if len(lines)==0:
+        print "No mappings lines found."
+        return 1
+    print "Parsing %d mappings lines." % len(lines)
+    (fast_time, fast_results)=extract(lines, FAST_MAPPINGS_PARSER)
+    (pyparsing_time, pyparsing_results)=extract(lines,
+                                                PYPARSING_MAPPINGS_PARSER)
+    for name, elapsed in (("hand-written", fast_time),
+                          ("pyparsing", pyparsing_time)):
+        print "%-12s %8.3f s %10.1f lines/s" % (name, elapsed,
+                                                len(lines)/max(elapsed, 1e-9))
+    print "Speedup: %.1fx" % (pyparsing_time/max(fast_time, 1e-9))
+    # Lines that neither parser can handle count as agreements
+    disagreements=[x for x in xrange(len(lines))
+                   if fast_results[x]!=pyparsing_results[x] and not
+                   (isinstance(fast_results[x], Exception) and
+                    isinstance(pyparsing_results[x], Exception))]
+    print "%d lines where the parsers disagree." % len(disagreements)
+    for x in disagreements[:10]:
+        print "  %s" % lines[x].strip()
+        print "    hand-written: %r" % (fast_results[x],)
+        print "    pyparsing:    %r" % (pyparsing_results[x],)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,6 +18,7 @@ from MEDRank.mesh.expression import ExpressionList
 from MEDRank.umls.converter import Converter
 from MEDRank.umls.ranked_converter import RankedConverter
 from MEDRank.evaluation.named_result_set import NamedResultSet
+from MEDRank.evaluation.result_set import ResultSet
 from MEDRank.utility.workflow import CouldNotRank
 
 #import time
@@ -30,7 +31,9 @@ class SingleArticleWorkflow(SingleItemWorkflow):
     reader: an instance of an NLMOutput descendant (that knows how to read an
             output file, basically)
     graph_builder: a graph builder
-    ranker: a Ranker 
+    ranker: a Ranker, or a RankerEnsemble to evaluate several rankers on
+            the same graphs. Each of the ensemble's configurations gets its
+            own columns in the output, prefixed by the configuration's name.
     eval_parameters: Pass an instance of EvaluationParameters, but just fill
                      in the numerical ones. The matrix and tree will be 
                      instantiated and loaded by the Workflow constructor.
@@ -111,12 +114,15 @@ class SingleArticleWorkflow(SingleItemWorkflow):
         return generated_terms.as_ExpressionList().flatten()
     def perform_evaluation(self, article,
                            evaluator, flat_medline, flattened_terms):
-        results=evaluator.evaluate(flat_medline, flattened_terms)
-        # Get the size of the LinkMatrix - we'll have to build the graph again
-        # but only if we have something to build with.
-        article_graph=self.graph_item(article)
-        if article_graph is not None:
-            results.update(article_graph.compute_measures())
+        return evaluator.evaluate(flat_medline, flattened_terms)
+    def add_article_measures(self, article, results):
+        """Adds the article's graph measures and the graph builder's 
+        measurements to its result set. They describe the article, not a
+        ranking, so they go in the article's row only once no matter how 
+        many rankings are evaluated."""
+        article_measures=self.item_measures(article)
+        if article_measures is not None:
+            results.update(article_measures)
         if self._graph_builder is not None:
             results.update(self._graph_builder.measurements)
         return results
@@ -130,36 +136,56 @@ class SingleArticleWorkflow(SingleItemWorkflow):
         tr=TotalRecall().evaluate(flat_gold_standard, flat_converted)
         return tr
     def process_article(self, each_article):
-        if not self.include_article(each_article):
-            logging.log(ULTRADEBUG, "Skipping article %r due to exclusion "
-                          " criteria.", each_article)
-            return
         try:
-            ranked_article=self.graph_and_rank(each_article)
-        except CouldNotRank:
-            return
+            if not self.include_article(each_article):
+                logging.log(ULTRADEBUG, "Skipping article %r due to exclusion "
+                              " criteria.", each_article)
+                return
+            try:
+                rankings=self.rank_item(each_article)
+            except CouldNotRank:
+                return
+            try:
+                medline_record_mesh_terms=ExpressionList().from_medline(
+                        each_article.set_id.article_record()['MH'])
+            except:
+                logging.warn("Could not obtain an article record for %r. "
+                             "Skipping.", each_article)
+                return
+            flat_medline=medline_record_mesh_terms.flatten()
+            if len(flat_medline)==0:
+                logging.warn("No gold standard available for article %r. "
+                             "Omitting it from the result set.", each_article)
+                return
+            # Every ranking of the article goes in the same row
+            article_result=ResultSet()
+            for name, ranked_article in rankings:
+                ranking_result=self.evaluate_ranking(each_article, 
+                                                     ranked_article,
+                                                     medline_record_mesh_terms)
+                if name is not None:
+                    ranking_result=NamedResultSet(name+"_", ranking_result)
+                article_result.update(ranking_result)
+            self.add_article_measures(each_article, article_result)
+            self.all_results[each_article.set_id]=article_result
+        finally:
+            self.forget_item()
+        return
+    def evaluate_ranking(self, article, ranked_article, 
+                         medline_record_mesh_terms):
+        """Evaluates one ranking of the article against its MeSH headings,
+        and returns the result set."""
         logging.debug("Ranked article: %r", ranked_article)
         converted_terms=self.convert(ranked_article)
         logging.debug("Converted terms: %r", converted_terms)
         cut_terms=converted_terms.terms_higher_than_or_equal_to(
                             self._ranking_cutoff)
         logging.debug("Cut terms: %r", cut_terms)
-        try:
-            medline_record_mesh_terms=ExpressionList().from_medline(
-                    each_article.set_id.article_record()['MH'])
-        except:
-            logging.warn("Could not obtain an article record for %r. "
-                         "Skipping.", each_article)
-            return
         flat_medline=medline_record_mesh_terms.flatten()
         flattened_terms=self.flatten_generated_terms(flat_medline,
                         cut_terms)
         flattened_terms=self.limit_length(flat_medline, flattened_terms)
-        if len(flat_medline)==0:
-            logging.warn("No gold standard available for article %r. "
-                         "Omitting it from the result set.", each_article)
-            return
-        eval_result=self.perform_evaluation(each_article,
+        eval_result=self.perform_evaluation(article,
                                             self.evaluator,
                                             flat_medline,
                                             flattened_terms)
@@ -170,7 +196,7 @@ class SingleArticleWorkflow(SingleItemWorkflow):
         #                flattened_major_headings)
         logging.debug("Flattened MeSH terms: %r", flat_medline)
         logging.debug("Flattened generated terms: %r", flattened_terms)
-        mh_result_temp=self.perform_evaluation(each_article, self.evaluator,
+        mh_result_temp=self.perform_evaluation(article, self.evaluator,
                                                flattened_major_headings,
                                                flattened_terms)
         mh_result=NamedResultSet("major_", mh_result_temp)
@@ -179,6 +205,5 @@ class SingleArticleWorkflow(SingleItemWorkflow):
                                                converted_terms)
         eval_result.add(total_recall)
         # Unify the result sets
-        self.all_results[each_article.set_id]=eval_result | mh_result
-        return
+        return eval_result | mh_result
 
@@ -13,6 +13,8 @@ Copyright (c) 2010 UTHSC School of Health Information Sciences. All rights reser
 # pylint: disable-msg=C0322
 from MEDRank.utility.logger import logging, ULTRADEBUG
 from MEDRank.computation.mapped_ranker import MappedRanker
+from MEDRank.computation.ranker_ensemble import RankerEnsemble
+from MEDRank.computation.graph import ALL_GRAPH_MEASURES
 from MEDRank.utility.workflow import CouldNotRank
 
 class SingleItemWorkflow(object):
@@ -28,10 +30,19 @@ class SingleItemWorkflow(object):
                             aforementioned constructor.
     ranker_constructor:     A class that knows how to build a Ranker (as in
                             MEDRank.computation.ranker.Ranker) or descendant
-    ranker_params: The parameters to pass to THAT constructor
+    ranker_params: The parameters to pass to THAT constructor. Pass 
+                   RankerEnsemble as the constructor and a list of 
+                   configurations as its parameters to rank each item with
+                   several rankers.
     ranking_cutoff: A float value between 0.0 (no filtering) and 1.0. 
                    Everything below ranking_cutoff gets discarded.
+    
+    The graph measures reported for each item are the GraphMeasure classes
+    listed in the graph_measures attribute (by default, all of them). Set it
+    to MEDRank.computation.graph.CHEAP_GRAPH_MEASURES to skip the distance 
+    matrix, or to an empty tuple to skip graph measures altogether.
     """
+    graph_measures=ALL_GRAPH_MEASURES
     def __init__(self, graph_builder_constructor, graph_builder_params,
                  ranker_constructor, ranker_params, ranking_cutoff):
         logging.debug("Setting up a SingleItemWorkflow instance.")
@@ -42,26 +53,61 @@ class SingleItemWorkflow(object):
         else:
             self._graph_builder=None    
         if ranker_constructor is not None:
-            self._ranker=MappedRanker(ranker_constructor(*ranker_params))
+            self._ranker=ranker_constructor(*ranker_params)
+            if not isinstance(self._ranker, RankerEnsemble):
+                self._ranker=MappedRanker(self._ranker)
         else:
             self._ranker=None
         logging.debug("My ranker is: %r", ranker_constructor)
         self._ranking_cutoff=ranking_cutoff
         logging.debug("My ranking cutoff is: %r", self._ranking_cutoff)
         self.all_results={}
+        self.forget_item()
         return
     def __repr__(self):
         return "<%s instance>" % self.__class__.__name__
+    def forget_item(self):
+        """Discards the graph, link matrix and graph measures kept for the
+        last item."""
+        self._graphed_item=None
+        self._item_graph=None
+        self._item_matrix=None
+        self._item_measures=None
     def graph_item(self, item):
+        """Turns the item into a graph. The graph is built only once per
+        item; ranking and every evaluation of the same item share it."""
         if self._graph_builder is None:
             return None
-        return self._graph_builder.create_graph(item)
+        if self._graphed_item is not item:
+            self.forget_item()
+            self._item_graph=self._graph_builder.create_graph(item)
+            self._graphed_item=item
+        return self._item_graph
+    def item_matrix(self, item):
+        """Returns the mapped link matrix of the item's graph, building it
+        only once per item."""
+        item_graph=self.graph_item(item)
+        if item_graph is None:
+            return None
+        if self._item_matrix is None:
+            self._item_matrix=item_graph.as_mapped_link_matrix()
+        return self._item_matrix
+    def item_measures(self, item):
+        """Returns the graph measures of the item listed in 
+        self.graph_measures, computing them only once per item."""
+        item_graph=self.graph_item(item)
+        if item_graph is None:
+            return None
+        if self._item_measures is None:
+            # If ranking already built the link matrix, reuse it
+            self._item_measures=item_graph.compute_measures(
+                                        self._item_matrix, self.graph_measures)
+        return self._item_measures
     def graph_and_rank(self, item):
         """Turn the item into a graph, then a link matrix, and then rank
         it. Returns the ranked list of nodes."""
-        item_graph=self.graph_item(item)
-        logging.log(ULTRADEBUG, "The item graph is %r.", item_graph)
-        item_matrix=item_graph.as_mapped_link_matrix()
+        logging.log(ULTRADEBUG, "The item graph is %r.", self.graph_item(item))
+        item_matrix=self.item_matrix(item)
         if len(item_matrix)==0:
             logging.info("Skipping item %r. It has an empty matrix.", 
                          item)
@@ -74,6 +120,25 @@ class SingleItemWorkflow(object):
             raise CouldNotRank("There was an exception while ranking %r." %
                                 item)
         return ranked_item
+    def rank_item(self, item):
+        """Returns a list of (name, ranked item) tuples, one per 
+        configuration of the ranker if it's a RankerEnsemble. A plain ranker
+        gives a single ranking named None. The configurations of an ensemble
+        that can't rank the item are left out."""
+        if not isinstance(self._ranker, RankerEnsemble):
+            return [(None, self.graph_and_rank(item))]
+        item_matrix=self.item_matrix(item)
+        if len(item_matrix)==0:
+            logging.info("Skipping item %r. It has an empty matrix.", 
+                         item)
+            raise CouldNotRank("Item %r is not rankable." % item)
+        rankings=[(name, ranked) for (name, ranked) 
+                  in self._ranker.evaluate(item_matrix)
+                  if ranked is not None]
+        if len(rankings)==0:
+            raise CouldNotRank("No ranker in %r could rank %r." % 
+                               (self._ranker, item))
+        return rankings
     def include_item(self, item):
         """Should this item be included in the sample? Return a boolean
         specifying so. Override to customize."""
@@ -84,11 +149,17 @@ class SingleItemWorkflow(object):
                           " criteria.", one_item)
             return
         try:
-            ranked_item=self.graph_and_rank(one_item)
+            rankings=self.rank_item(one_item)
         except CouldNotRank:
             return
-        cut_item=[x for x in ranked_item if x[1] >= self._ranking_cutoff]
-        # Unify the result sets
-        self.all_results[one_item.set_id]=cut_item
+        cut_rankings=[(name, [x for x in ranked_item 
+                              if x[1] >= self._ranking_cutoff])
+                      for (name, ranked_item) in rankings]
+        # Unify the result sets. An ensemble's are kept by name.
+        if isinstance(self._ranker, RankerEnsemble):
+            self.all_results[one_item.set_id]=dict(cut_rankings)
+        else:
+            self.all_results[one_item.set_id]=cut_rankings[0][1]
+        self.forget_item()
         return
         
\ No newline at end of file
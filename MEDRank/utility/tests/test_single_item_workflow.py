@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_single_item_workflow.py
+"""
+
+import unittest
+from MEDRank.utility.single_item_workflow import *
+from MEDRank.computation.graph import Graph, CHEAP_GRAPH_MEASURES
+from MEDRank.computation.link import Link
+from MEDRank.computation.node import Node
+from MEDRank.computation.textranker import TextRanker
+from MEDRank.computation.hits_combined_ranker import HITSCombinedRanker
+
+# pylint: disable-msg=C0103,C0111,R0904,W0212
+class countingGraphBuilder(object):
+    """Builds the same three-node cycle for every item, and counts how many
+    times it was asked to."""
+    def __init__(self):
+        self.graphs_built=0
+    def create_graph(self, item):
+        self.graphs_built+=1
+        a_graph=Graph()
+        for i in xrange(3):
+            a_graph.add_relationship(Link(Node(str(i), 'Node%d' % i, 1),
+                                          Node(str((i+1)%3), 
+                                               'Node%d' % ((i+1)%3), 1),
+                                          1.0))
+        a_graph.consolidate_graph()
+        return a_graph
+
+class fakeItem(object):
+    set_id='fake'
+
+class singleItemWorkflowTests(unittest.TestCase):
+    def setUp(self):
+        self.workflow=SingleItemWorkflow(countingGraphBuilder, (), 
+                                         TextRanker, (), 0.0)
+        self.item=object()
+    def testGraphBuiltOncePerItem(self):
+        self.workflow.graph_and_rank(self.item)
+        measures=self.workflow.item_measures(self.item)
+        self.assertTrue(measures is self.workflow.item_measures(self.item))
+        self.assertEqual(1, self.workflow._graph_builder.graphs_built)
+    def testNewItemGetsNewGraph(self):
+        first_graph=self.workflow.graph_item(self.item)
+        second_graph=self.workflow.graph_item(object())
+        self.assertFalse(first_graph is second_graph)
+        self.assertEqual(2, self.workflow._graph_builder.graphs_built)
+    def testForgetItem(self):
+        self.workflow.item_measures(self.item)
+        self.workflow.forget_item()
+        self.workflow.item_measures(self.item)
+        self.assertEqual(2, self.workflow._graph_builder.graphs_built)
+    def testCheapMeasuresOnly(self):
+        self.workflow.graph_measures=CHEAP_GRAPH_MEASURES
+        measures=self.workflow.item_measures(self.item)
+        self.assertEqual(set(CHEAP_GRAPH_MEASURES), 
+                         set(type(x) for x in measures))
+        # Nothing needed the link matrix
+        self.assertTrue(self.workflow._item_matrix is None)
+    def testMeasuresMatchGraph(self):
+        measures=self.workflow.item_measures(self.item)
+        expected=self.workflow.graph_item(self.item).compute_measures()
+        self.assertEqual(expected.as_dict(), measures.as_dict())
+    def testEnsembleResultsKeptByName(self):
+        workflow=SingleItemWorkflow(countingGraphBuilder, (), 
+                                    RankerEnsemble, 
+                                    ([('textrank', TextRanker()),
+                                      ('hits', HITSCombinedRanker())],),
+                                    0.0)
+        workflow.process_item(fakeItem())
+        results=workflow.all_results['fake']
+        self.assertEqual(set(['textrank', 'hits']), set(results))
+        self.assertEqual(3, len(results['textrank']))
+        self.assertEqual(1, workflow._graph_builder.graphs_built)
+    def testPlainRankerResults(self):
+        self.workflow.process_item(fakeItem())
+        self.assertEqual(3, len(self.workflow.all_results['fake']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,11 +8,34 @@ Copyright (c) 2008 Jorge Herskovic. All rights reserved.
 """
 
 import unittest
+import os
+import tempfile
 from MEDRank.utility.workflow import *
 
+# pylint: disable-msg=C0103,C0111,R0904,W0212
 class workflowTests(unittest.TestCase):
     def setUp(self):
-        pass
+        (handle, self.output_name)=tempfile.mkstemp()
+        os.close(handle)
+        self.output_file=open(self.output_name, 'w')
+    def tearDown(self):
+        self.output_file.close()
+        for name in (self.output_name, self.output_name+'.metadata'):
+            if os.path.exists(name):
+                os.remove(name)
+    def testMetadataLeavesTheArticleCacheOut(self):
+        # Skip __init__, which needs the UMLS and MeSH data files
+        workflow=Workflow.__new__(Workflow)
+        workflow._output_file=self.output_file
+        workflow._ranking_cutoff=0.5
+        workflow.forget_article()
+        workflow._article_graph='a graph'
+        workflow.output_metadata()
+        metadata=open(self.output_name+'.metadata').read().split('\n')
+        self.assertEqual('[MEDRank_metadata]', metadata[0])
+        self.assertTrue('ranking_cutoff=0.5' in metadata)
+        self.assertFalse([x for x in metadata if x.startswith('article_')])
+        self.assertFalse([x for x in metadata if x.startswith('graphed_')])
 
 
 if __name__ == '__main__':
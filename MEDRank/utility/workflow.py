@@ -18,6 +18,8 @@ from MEDRank.mesh.tree import Tree
 from MEDRank.file.disk_backed_dict import StringDBDict
 from MEDRank.evaluation.savcc_normalized_matrix import SavccNormalizedMatrix
 from MEDRank.computation.mapped_ranker import MappedRanker
+from MEDRank.computation.ranker_ensemble import RankerEnsemble
+from MEDRank.computation.graph import ALL_GRAPH_MEASURES
 from MEDRank.umls.converter import Converter
 from MEDRank.umls.ranked_converter import RankedConverter
 from MEDRank.umls.concept import Concept
@@ -25,6 +27,7 @@ from MEDRank.mesh.expression import ExpressionList
 from MEDRank.evaluation.common import comprehensive
 from MEDRank.evaluation.recall import TotalRecall
 from MEDRank.evaluation.named_result_set import NamedResultSet
+from MEDRank.evaluation.result_set import ResultSet
 #import time
 
 class CouldNotRank(Exception):
@@ -36,7 +39,9 @@ class Workflow(object):
     reader: an instance of an NLMOutput descendant (that knows how to read an
             output file, basically)
     graph_builder: a graph builder
-    ranker: a Ranker 
+    ranker: a Ranker, or a RankerEnsemble to evaluate several rankers on
+            the same graphs. Each of the ensemble's configurations gets its
+            own columns in the output, prefixed by the configuration's name.
     eval_parameters: Pass an instance of EvaluationParameters, but just fill
                      in the numerical ones. The matrix and tree will be 
                      instantiated and loaded by the Workflow constructor.
@@ -52,7 +57,17 @@ class Workflow(object):
                                 preprocess_umls_mesh_mappings.sh script                            
     output_file: a file object in which you want to place the results of the
                  computation
+    The graph measures reported for each article are the GraphMeasure 
+    classes listed in the graph_measures attribute (by default, all of 
+    them). Set it to MEDRank.computation.graph.CHEAP_GRAPH_MEASURES to skip
+    the distance matrix, or to an empty tuple to skip graph measures 
+    altogether.
     Call the run() method to execute it."""
+    graph_measures=ALL_GRAPH_MEASURES
+    # What's kept about the last article doesn't describe the evaluation, so
+    # output_metadata leaves it out
+    article_cache=('_graphed_article', '_article_graph', '_article_matrix',
+                   '_article_measures')
     def __init__(self, reader, graph_builder, ranker, eval_parameters, 
                  ranking_cutoff,
                  mesh_tree_filename, distance_matrix_filename,
@@ -64,7 +79,10 @@ class Workflow(object):
         self._reader=reader
         logging.debug("My graph builder is: %r", graph_builder)
         self._graph_builder=graph_builder
-        self._ranker=MappedRanker(ranker)
+        if isinstance(ranker, RankerEnsemble):
+            self._ranker=ranker
+        else:
+            self._ranker=MappedRanker(ranker)
         logging.debug("My ranker is: %r", self._ranker)
         self._ranking_cutoff=ranking_cutoff
         logging.debug("My ranking cutoff is: %r", self._ranking_cutoff)
@@ -97,6 +115,7 @@ class Workflow(object):
             Concept.init_storage(StringDBDict(umls_concept_data_filename))
         self._output_file=output_file
         logging.debug("My output file is: %r", self._output_file)
+        self.forget_article()
         return
     def __repr__(self):
         return "<%s instance>" % self.__class__.__name__
@@ -135,6 +154,8 @@ class Workflow(object):
         metadata_filename=self._output_file.name + '.metadata'
         data=[]
         for potential_var, potential_var_value in self.__dict__.iteritems():
+            if potential_var in self.article_cache:
+                continue
             if potential_var[0]=='_' and potential_var[1]!='_':
                 data.append('%s=%r' % (potential_var[1:],
                                        potential_var_value))
@@ -145,15 +166,49 @@ class Workflow(object):
     def convert(self, terms_to_convert):
         """Override for easy customization"""
         return self._umls_converter.convert(terms_to_convert)
+    def forget_article(self):
+        """Discards the graph, link matrix and graph measures kept for the
+        last article."""
+        self._graphed_article=None
+        self._article_graph=None
+        self._article_matrix=None
+        self._article_measures=None
     def graph_article(self, article):
+        """Turns the article into a graph. The graph is built only once per
+        article; ranking and every evaluation of the same article share
+        it."""
         if self._graph_builder is None:
             return None
-        return self._graph_builder.create_graph(article)
+        if self._graphed_article is not article:
+            self.forget_article()
+            self._article_graph=self._graph_builder.create_graph(article)
+            self._graphed_article=article
+        return self._article_graph
+    def article_matrix(self, article):
+        """Returns the mapped link matrix of the article's graph, building it
+        only once per article."""
+        article_graph=self.graph_article(article)
+        if article_graph is None:
+            return None
+        if self._article_matrix is None:
+            self._article_matrix=article_graph.as_mapped_link_matrix()
+        return self._article_matrix
+    def article_measures(self, article):
+        """Returns the graph measures of the article listed in 
+        self.graph_measures, computing them only once per article."""
+        article_graph=self.graph_article(article)
+        if article_graph is None:
+            return None
+        if self._article_measures is None:
+            # If ranking already built the link matrix, reuse it
+            self._article_measures=article_graph.compute_measures(
+                                        self._article_matrix, 
+                                        self.graph_measures)
+        return self._article_measures
     def graph_and_rank(self, article):
         """Turn the article into a graph, then a link matrix, and then rank
         it. Returns the ranked list of nodes."""
-        article_graph=self.graph_article(article)
-        article_matrix=article_graph.as_mapped_link_matrix()
+        article_matrix=self.article_matrix(article)
         if len(article_matrix)==0:
             logging.info("Skipping article %r. It has an empty matrix.", 
                          article)
@@ -166,6 +221,25 @@ class Workflow(object):
             raise CouldNotRank("There was an exception while ranking %r." %
                                 article)
         return ranked_article
+    def rank_article(self, article):
+        """Returns a list of (name, ranked article) tuples, one per 
+        configuration of the ranker if it's a RankerEnsemble. A plain ranker
+        gives a single ranking named None. The configurations of an ensemble
+        that can't rank the article are left out."""
+        if not isinstance(self._ranker, RankerEnsemble):
+            return [(None, self.graph_and_rank(article))]
+        article_matrix=self.article_matrix(article)
+        if len(article_matrix)==0:
+            logging.info("Skipping article %r. It has an empty matrix.", 
+                         article)
+            raise CouldNotRank("Article %r is not rankable." % article)
+        rankings=[(name, ranked) for (name, ranked) 
+                  in self._ranker.evaluate(article_matrix)
+                  if ranked is not None]
+        if len(rankings)==0:
+            raise CouldNotRank("No ranker in %r could rank %r." % 
+                               (self._ranker, article))
+        return rankings
     def flatten_generated_terms(self, gold_standard_terms, generated_terms):
         """Flatten without any further preprocessing - this may be desirable 
         if, for example, all terms after the pagerank cutoff should be 
@@ -173,12 +247,15 @@ class Workflow(object):
         return generated_terms.as_ExpressionList().flatten()
     def perform_evaluation(self, article,
                            evaluator, flat_medline, flattened_terms):
-        results=evaluator.evaluate(flat_medline, flattened_terms)
-        # Get the size of the LinkMatrix - we'll have to build the graph again
-        # but only if we have something to build with.
-        article_graph=self.graph_article(article)
-        if article_graph is not None:
-            results.update(article_graph.compute_measures())
+        return evaluator.evaluate(flat_medline, flattened_terms)
+    def add_article_measures(self, article, results):
+        """Adds the article's graph measures and the graph builder's 
+        measurements to its result set. They describe the article, not a
+        ranking, so they go in the article's row only once no matter how 
+        many rankings are evaluated."""
+        article_measures=self.article_measures(article)
+        if article_measures is not None:
+            results.update(article_measures)
         if self._graph_builder is not None:
             results.update(self._graph_builder.measurements)
         return results
@@ -191,6 +268,41 @@ class Workflow(object):
         flat_converted=converted_terms.as_ExpressionList().flatten()
         tr=TotalRecall().evaluate(flat_gold_standard, flat_converted)
         return tr
+    def evaluate_ranking(self, article, evaluator, ranked_article,
+                         medline_record_mesh_terms):
+        """Evaluates one ranking of the article against its MeSH headings,
+        and returns the result set."""
+        converted_terms=self.convert(ranked_article)
+        cut_terms=converted_terms.terms_higher_than_or_equal_to(
+                            self._ranking_cutoff)
+        logging.debug("Lowest-ranking term is term #%d out of %d"
+                      " (score=%1.5f, highest score=%1.5f)",
+                      len(cut_terms), len(converted_terms),
+                      [x[1] for x in cut_terms][-1],
+                      [x[1] for x in cut_terms][0])
+        flat_medline=medline_record_mesh_terms.flatten()
+        flattened_terms=self.flatten_generated_terms(flat_medline,
+                        cut_terms)
+        flattened_terms=self.limit_length(flat_medline, flattened_terms)
+        eval_result=self.perform_evaluation(article,
+                                            evaluator,
+                                            flat_medline,
+                                            flattened_terms)
+        flattened_major_headings=\
+            medline_record_mesh_terms.major_headings()
+        logging.debug("Original headings: %r Major headings: %r", 
+                        medline_record_mesh_terms,
+                        flattened_major_headings)
+        mh_result_temp=self.perform_evaluation(article, evaluator,
+                                               flattened_major_headings,
+                                               flattened_terms)
+        mh_result=NamedResultSet("mh_", mh_result_temp)
+        # Compute the total recall, too
+        total_recall=self.compute_total_recall(flat_medline, 
+                                               converted_terms)
+        eval_result.add(total_recall)
+        # Unify the result sets
+        return eval_result | mh_result
     def run(self):
         """Perform the evaluation"""
         logging.info("Starting workflow %r run", self)
@@ -205,46 +317,29 @@ class Workflow(object):
                               " criteria.", each_article)
                 continue
             try:
-                ranked_article=self.graph_and_rank(each_article)
+                rankings=self.rank_article(each_article)
             except CouldNotRank:
                 continue
-            converted_terms=self.convert(ranked_article)
-            cut_terms=converted_terms.terms_higher_than_or_equal_to(
-                                self._ranking_cutoff)
-            logging.debug("Lowest-ranking term is term #%d out of %d"
-                          " (score=%1.5f, highest score=%1.5f)",
-                          len(cut_terms), len(converted_terms),
-                          [x[1] for x in cut_terms][-1],
-                          [x[1] for x in cut_terms][0])
             medline_record_mesh_terms=ExpressionList().from_medline(
                     each_article.set_id.article_record().mesh_headings)
             flat_medline=medline_record_mesh_terms.flatten()
-            flattened_terms=self.flatten_generated_terms(flat_medline,
-                            cut_terms)
-            flattened_terms=self.limit_length(flat_medline, flattened_terms)
             if len(flat_medline)==0:
                 logging.warn("No gold standard available for article %r. "
                              "Omitting it from the result set.", each_article)
                 continue
-            eval_result=self.perform_evaluation(each_article,
-                                                evaluator,
-                                                flat_medline,
-                                                flattened_terms)
-            flattened_major_headings=\
-                medline_record_mesh_terms.major_headings()
-            logging.debug("Original headings: %r Major headings: %r", 
-                            medline_record_mesh_terms,
-                            flattened_major_headings)
-            mh_result_temp=self.perform_evaluation(each_article, evaluator,
-                                                   flattened_major_headings,
-                                                   flattened_terms)
-            mh_result=NamedResultSet("mh_", mh_result_temp)
-            # Compute the total recall, too
-            total_recall=self.compute_total_recall(flat_medline, 
-                                                   converted_terms)
-            eval_result.add(total_recall)
-            # Unify the result sets
-            all_results[each_article.set_id]=eval_result | mh_result
+            # Every ranking of the article goes in the same row
+            article_result=ResultSet()
+            for name, ranked_article in rankings:
+                ranking_result=self.evaluate_ranking(each_article, 
+                                        evaluator, ranked_article,
+                                        medline_record_mesh_terms)
+                if name is not None:
+                    ranking_result=NamedResultSet(name+"_", ranking_result)
+                article_result.update(ranking_result)
+            self.add_article_measures(each_article, article_result)
+            all_results[each_article.set_id]=article_result
+        # Don't hold on to the last article's graph
+        self.forget_article()
         logging.info("Writing out results.")
         self.output(all_results)
         self.output_metadata()